@@ -0,0 +1,19 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+serve it with an ASGI server such as ``uvicorn app.asgi:application``.
+
+Django 2.1 has no ASGI handler of its own, see core.asgi.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup(set_prefix=False)
+
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -12,19 +12,31 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.1/howto/deployment/checklist/
 
-# SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = '$dlm$xi(n71c=&a84_zg9vl+-!o)$r(##=ocq6@idn81+ms^d%'
-
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = bool(int(os.environ.get('DEBUG', 0)))
 
-ALLOWED_HOSTS = []
+# SECURITY WARNING: keep the secret key used in production secret!
+# the key committed here is public, it is only used with DEBUG on
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured('SECRET_KEY must be set when DEBUG is off')
+    SECRET_KEY = '$dlm$xi(n71c=&a84_zg9vl+-!o)$r(##=ocq6@idn81+ms^d%'
+
+# comma separated host names the API is served on
+ALLOWED_HOSTS = [
+    host for host in os.environ.get(
+        'ALLOWED_HOSTS', 'localhost,127.0.0.1'
+    ).split(',') if host
+]
 
 # Application definition
 
@@ -43,11 +55,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.HealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PerformanceMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,20 +85,92 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'app.wsgi.application'
+# threads running the views in each process serving app.asgi, slow
+# uploads and downloads are handled by the event loop without them
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+# largest request body app.asgi receives, a larger one is answered with
+# 413 before it is read; enough for an upload chunk of 16 MiB and the
+# DATA_UPLOAD_MAX_MEMORY_SIZE of the other fields of a form
+ASGI_MAX_BODY_SIZE = int(
+    os.environ.get('ASGI_MAX_BODY_SIZE', 16 * 1024 * 1024 + 2621440)
+)
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# connections kept open by the pool of each server process, the threads
+# share them; 0 disables the pool and each thread keeps its connection
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql' if DB_POOL_SIZE
+        else 'django.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds a connection is reused by the requests of a thread,
+        # pooled connections go back to the pool after every request
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE
+        else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            # connections opened beyond SIZE while all are in use
+            'MAX_OVERFLOW': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+            # seconds a request waits for a connection of a full pool
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # seconds after which a connection is replaced
+            'RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+            # seconds a connection may stay idle without being checked
+            'CHECK_INTERVAL': int(os.environ.get('DB_POOL_CHECK_INTERVAL', 30)),
+        },
     }
 }
 
+# the default cache is local to each server process; SHARED_CACHE_BACKEND
+# and SHARED_CACHE_LOCATION configure the 'shared' cache seen by all of
+# them, e.g. django.core.cache.backends.memcached.MemcachedCache and the
+# host:port of memcached, or django.core.cache.backends.db.DatabaseCache
+# and a table made by `manage.py createcachetable`
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+SHARED_CACHE_BACKEND = os.environ.get('SHARED_CACHE_BACKEND')
+if SHARED_CACHE_BACKEND:
+    CACHES['shared'] = {
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', ''),
+    }
+
+# comma separated hosts of read replicas of the default database, the safe
+# list and retrieve requests read from them, see core.routers
+DB_REPLICA_HOSTS = [
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host
+]
+# the replica alias always exists so tests can stand in a second database
+# for it, it only receives reads when DATABASE_REPLICAS lists it
+DATABASE_REPLICAS = []
+for index, host in enumerate(DB_REPLICA_HOSTS or [DATABASES['default']['HOST']]):
+    alias = 'replica' if index == 0 else f'replica_{index + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_{alias}"},
+    }
+    if DB_REPLICA_HOSTS:
+        DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# seconds the reads of a user stay on the primary after they wrote, longer
+# than the replication lag; the cache must be shared by server processes,
+# the checks of core.checks refuse a local one when replicas are used
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE_ALIAS = os.environ.get(
+    'REPLICA_PIN_CACHE_ALIAS', 'shared' if SHARED_CACHE_BACKEND else 'default'
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -103,6 +189,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# the first hasher hashes new passwords, the others check the passwords
+# hashed before it was configured, which are rehashed with the first on
+# the next successful login
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'core.hashers.Argon2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher'
+).split(',')
+# costs of core.hashers.Argon2PasswordHasher, the memory in KiB; checking
+# a password takes about half the CPU time of PBKDF2 and the memory makes
+# guessing it on GPUs costly, `run_benchmark login` times both
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19 * 1024)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)
+)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
@@ -123,6 +230,76 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
+# internal location of the front proxy serving MEDIA_ROOT, user_file
+# downloads are handed off to it with X-Accel-Redirect when it is set
+USER_FILES_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'USER_FILES_ACCEL_REDIRECT_PREFIX'
+)
+# threads generating derivatives of uploaded files in each server process
+USER_FILES_WORKERS = int(os.environ.get('USER_FILES_WORKERS', 2))
+# processes parsing and rendering DXF drawings, 0 runs them in the worker
+USER_FILES_PROCESSES = int(os.environ.get('USER_FILES_PROCESSES', 2))
+# cache of the tag, file_type and user_file list and detail responses, it
+# must be shared by all server processes, such as the 'shared' cache, and
+# caching is disabled when unset
+USER_FILES_CACHE_ALIAS = os.environ.get('USER_FILES_CACHE_ALIAS')
+USER_FILES_CACHE_TIMEOUT = int(os.environ.get('USER_FILES_CACHE_TIMEOUT', 300))
+# largest edge in pixels of the thumbnails generated for uploaded images
+USER_FILES_THUMBNAIL_SIZES = (128, 512)
+# API tokens cached in each server process and for how many seconds,
+# AUTH_TOKEN_CACHE_ALIAS names a cache shared by all processes
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60))
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS')
+# proxies in front of the app appending the client address to
+# X-Forwarded-For, the address the login limiter counts is read from that
+# header only behind them and is REMOTE_ADDR otherwise
+REST_FRAMEWORK = {
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+# failed logins of an email from a client address, or of a client address
+# for any email, after which its logins are refused without checking the
+# password, for LOGIN_BACKOFF seconds doubling with every further failure
+# up to LOGIN_BACKOFF_MAX; failures are forgotten LOGIN_FAILURE_WINDOW
+# seconds after the last one and each server process keeps up to
+# LOGIN_LIMITER_SIZE emails and addresses
+LOGIN_FAILURES_PER_EMAIL = int(os.environ.get('LOGIN_FAILURES_PER_EMAIL', 5))
+LOGIN_FAILURES_PER_ADDRESS = int(
+    os.environ.get('LOGIN_FAILURES_PER_ADDRESS', 50)
+)
+LOGIN_BACKOFF = float(os.environ.get('LOGIN_BACKOFF', 1))
+LOGIN_BACKOFF_MAX = float(os.environ.get('LOGIN_BACKOFF_MAX', 300))
+LOGIN_FAILURE_WINDOW = int(os.environ.get('LOGIN_FAILURE_WINDOW', 900))
+LOGIN_LIMITER_SIZE = int(os.environ.get('LOGIN_LIMITER_SIZE', 100000))
+# seconds the result of the readiness probe at /readyz is reused, so
+# frequent probes do not query the database and caches every time
+HEALTH_CHECK_INTERVAL = int(os.environ.get('HEALTH_CHECK_INTERVAL', 10))
+# comma separated sinks recording the wall time, queries, serializer time
+# and response size of the requests of PERF_METRICS_NAMESPACES, such as
+# core.metrics.LogSink and core.metrics.HistogramSink served at /metrics
+PERF_METRICS_SINKS = [
+    sink for sink in os.environ.get('PERF_METRICS_SINKS', '').split(',')
+    if sink
+]
+PERF_METRICS_NAMESPACES = ('user', 'user_files')
+# directory receiving a cProfile dump of the requests of staff users
+# sending the X-Profile header, profiling is disabled when unset
+PERF_PROFILE_DIR = os.environ.get('PERF_PROFILE_DIR')
+PERF_PROFILE_HEADER = 'HTTP_X_PROFILE'
+# comma separated addresses allowed to scrape /metrics
+INTERNAL_IPS = [
+    ip for ip in os.environ.get('INTERNAL_IPS', '127.0.0.1').split(',') if ip
+]
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
 STATIC_ROOT = '/vol/web/static'
 # 127.0.0.1:8000/static/
 # 127.0.0.1:8000/media/
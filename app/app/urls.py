@@ -17,9 +17,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+
+from core import views as core_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/user_files/', include('user_files.urls')),
+    path('metrics', core_views.metrics, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# runserver serves them on its own, the ASGI server does not
+urlpatterns += staticfiles_urlpatterns()
@@ -0,0 +1,300 @@
+"""ASGI handler running the Django application
+
+Django 2.1 has no ASGI support and its views are synchronous, so views
+still run in a pool of ASGI_THREADS threads. What a slow client makes
+last never holds one of those threads:
+
+- the request body is received by the event loop before the view runs,
+  spooled to a temporary file once it outgrows
+  FILE_UPLOAD_MAX_MEMORY_SIZE, so a chunk or file upload trickling in
+  only costs a coroutine; bodies over ASGI_MAX_BODY_SIZE are refused
+  with 413 before anything is stored
+- streaming responses such as downloads and derivatives are sent by the
+  event loop, the file blocks are read in the default executor of the
+  loop and the next block is only read once the client took the last
+  one
+"""
+import asyncio
+import io
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signals
+from django.core.handlers import base
+from django.core.handlers.wsgi import WSGIRequest, get_script_name
+from django.db import close_old_connections
+from django.urls import set_script_prefix
+
+
+BLOCK_SIZE = 64 * 1024
+
+
+class RequestBodyTooLarge(Exception):
+    """the request body exceeds ASGI_MAX_BODY_SIZE"""
+
+
+def declared_length(scope):
+    """return the Content-Length of the request of a scope, 0 when it is
+    missing or invalid"""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+
+    return 0
+
+
+def build_environ(scope, body, size):
+    """return the WSGI environ of the HTTP request of an ASGI scope
+
+    the path of the scope is decoded text, WSGI expects it as latin-1
+    decoded bytes
+    """
+    path = scope['path'].encode('utf-8').decode('latin-1')
+    root_path = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+    client = scope.get('client') or ('', 0)
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path,
+        'PATH_INFO': path[len(root_path):] if path.startswith(root_path)
+        else path,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        # the whole body was received, its size is known even when it was
+        # sent with a chunked transfer encoding
+        'CONTENT_LENGTH': str(size),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = 'HTTP_' + name
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+
+    return environ
+
+
+def response_headers(response):
+    """return the headers of a response as ASGI expects them"""
+    headers = [
+        (name.encode('latin-1'), str(value).encode('latin-1'))
+        for name, value in response.items()
+    ]
+    headers.extend(
+        (b'Set-Cookie', cookie.output(header='').strip().encode('latin-1'))
+        for cookie in response.cookies.values()
+    )
+
+    return headers
+
+
+class ASGIHandler(base.BaseHandler):
+    """ASGI application serving the Django project
+
+    executor runs the views, ASGI_THREADS threads by default
+    """
+    request_class = WSGIRequest
+
+    def __init__(self, executor=None):
+        super().__init__()
+        self.load_middleware()
+        self.executor = executor or ThreadPoolExecutor(
+            settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']}")
+
+        loop = asyncio.get_event_loop()
+        try:
+            if declared_length(scope) > settings.ASGI_MAX_BODY_SIZE:
+                raise RequestBodyTooLarge
+            received = await self.read_body(receive)
+        except RequestBodyTooLarge:
+            return await self.send_too_large(send)
+        if received is None:
+            return
+        body, size = received
+        try:
+            response = await loop.run_in_executor(
+                self.executor, self.get_response_sync, scope, body, size
+            )
+            await self.send_response(response, receive, send)
+        finally:
+            await loop.run_in_executor(None, body.close)
+
+    async def lifespan(self, receive, send):
+        """acknowledge the startup and shutdown of the server"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def send_too_large(self, send):
+        """refuse a request whose body exceeds ASGI_MAX_BODY_SIZE"""
+        body = json.dumps({
+            'detail': 'Request bodies are limited to '
+                      f'{settings.ASGI_MAX_BODY_SIZE} bytes.'
+        }).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'Content-Type', b'application/json'),
+                        (b'Content-Length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def read_body(self, receive):
+        """return the request body as a file and its size, None when the
+        client disconnects before sending all of it; raise
+        RequestBodyTooLarge once it exceeds ASGI_MAX_BODY_SIZE
+
+        the body is kept in memory up to FILE_UPLOAD_MAX_MEMORY_SIZE bytes,
+        larger bodies are written to a temporary file from the default
+        executor of the loop
+        """
+        loop = asyncio.get_event_loop()
+        body = io.BytesIO()
+        size = 0
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    await loop.run_in_executor(None, body.close)
+                    return None
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                if size > settings.ASGI_MAX_BODY_SIZE:
+                    raise RequestBodyTooLarge
+                if isinstance(body, io.BytesIO):
+                    if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+                        body = await loop.run_in_executor(
+                            None, spool, body, chunk
+                        )
+                    else:
+                        body.write(chunk)
+                elif chunk:
+                    await loop.run_in_executor(None, body.write, chunk)
+                if not message.get('more_body', False):
+                    break
+            await loop.run_in_executor(None, body.seek, 0)
+        except BaseException:
+            body.close()
+            raise
+
+        return body, size
+
+    def get_response_sync(self, scope, body, size):
+        """return the response of the view for the request, in a thread of
+        the executor
+
+        the content of a response that is not streamed is rendered here,
+        which ends the request like the WSGI handler does; a streamed
+        response is closed by the loop once it is sent, from another
+        thread, so the database connections of this thread are released
+        here rather than by the request_finished signal
+        """
+        environ = build_environ(scope, body, size)
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        request = self.request_class(environ)
+        response = self.get_response(request)
+        response._handler_class = self.__class__
+        if response.streaming:
+            close_old_connections()
+        else:
+            response.close()
+
+        return response
+
+    async def send_response(self, response, receive, send):
+        """send the response, a streamed one block by block as long as the
+        client is connected"""
+        loop = asyncio.get_event_loop()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers(response),
+        })
+        if not response.streaming:
+            await send({
+                'type': 'http.response.body', 'body': response.content
+            })
+            return
+
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            read = stream_reader(response)
+            while not disconnected.done():
+                block = await loop.run_in_executor(None, read)
+                if block is None:
+                    break
+                if not block:
+                    continue
+                await send({
+                    'type': 'http.response.body',
+                    'body': block,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+        finally:
+            disconnected.cancel()
+            await loop.run_in_executor(None, response.close)
+
+
+def spool(buffer, chunk):
+    """return a temporary file holding the content of buffer and chunk"""
+    body = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    body.write(buffer.getvalue())
+    body.write(chunk)
+    buffer.close()
+
+    return body
+
+
+def stream_reader(response):
+    """return a function returning the next block of a streaming response,
+    None at the end
+
+    the file of a FileResponse is read by blocks of BLOCK_SIZE rather than
+    the small blocks its iterator reads
+    """
+    f = getattr(response, 'file_to_stream', None)
+    if f is not None:
+        return lambda: f.read(BLOCK_SIZE) or None
+
+    content = iter(response.streaming_content)
+    return lambda: next(content, None)
+
+
+async def wait_disconnect(receive):
+    """return once the client of a request disconnects"""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+CACHE_KEY_PREFIX = 'auth-token:'
+
+
+# fields never cached, a restored instance loads them when they are read
+SECRET_FIELDS = ('password',)
+
+
+def snapshot(instance):
+    """return the values of the concrete fields of a model instance, the
+    SECRET_FIELDS aside"""
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in SECRET_FIELDS
+    }
+
+
+def restore(model, values):
+    """return a new model instance built from a snapshot, the fields
+    missing from it are deferred"""
+    return model.from_db(None, list(values), list(values.values()))
+
+
+class TokenCache:
+    """bounded LRU of authenticated tokens with a time to live
+
+    entries hold plain field values without the password, not model
+    instances, so every request gets its own user object and the entries
+    can be pickled to the shared cache named by AUTH_TOKEN_CACHE_ALIAS;
+    entries are dropped by the
+    signals in core.signals when a token or user changes, other processes
+    only see that in the shared cache and their own LRU entries expire
+    after AUTH_TOKEN_CACHE_TTL seconds
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        """return the shared cache backend, None when not configured"""
+        alias = settings.AUTH_TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        """return the (user values, token values) cached for key"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        shared = self.shared
+        value = shared.get(CACHE_KEY_PREFIX + key) if shared else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._remember(key, value)
+
+        return value
+
+    def set(self, key, value):
+        """cache the (user values, token values) of key"""
+        shared = self.shared
+        if shared:
+            shared.set(
+                CACHE_KEY_PREFIX + key, value, settings.AUTH_TOKEN_CACHE_TTL
+            )
+        self._remember(key, value)
+
+    def _remember(self, key, value):
+        """store an entry in the LRU, evicting the least recently used"""
+        if settings.AUTH_TOKEN_CACHE_SIZE <= 0:
+            return
+        user_id = value[1]['user_id']
+        expires = time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                old_key, (_, old_value) = self._entries.popitem(last=False)
+                self._forget_user_key(old_value[1]['user_id'], old_key)
+
+    def _forget_user_key(self, user_id, key):
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def invalidate(self, *keys):
+        """drop the entries of token keys"""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._forget_user_key(entry[1][1]['user_id'], key)
+        shared = self.shared
+        if shared and keys:
+            shared.delete_many([CACHE_KEY_PREFIX + key for key in keys])
+
+    def invalidate_user(self, user_id):
+        """drop the entries of all tokens of a user"""
+        with self._lock:
+            keys = set(self._user_keys.get(user_id, ()))
+        if self.shared:
+            keys.update(Token.objects.filter(
+                user_id=user_id
+            ).values_list('key', flat=True))
+        self.invalidate(*keys)
+
+    def clear(self):
+        """drop every entry of the LRU and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        """return the counters and size of the LRU"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """token authentication skipping the token and user query for tokens
+    seen recently, see TokenCache"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, (snapshot(user), snapshot(token)))
+            return user, token
+
+        user_values, token_values = cached
+        user = restore(get_user_model(), user_values)
+        token = restore(Token, token_values)
+        token.user = user
+
+        return user, token
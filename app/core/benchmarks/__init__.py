@@ -0,0 +1,7 @@
+"""Benchmarks of the hot query paths on synthetic datasets
+
+run a suite with `python manage.py run_benchmark <suite>`
+"""
+from core.benchmarks.base import SUITES, register  # noqa
+from core.benchmarks import assigned_only, bulk, search, tag_filter  # noqa
+from core.benchmarks import login  # noqa
@@ -0,0 +1,283 @@
+"""Throughput and latency of the API flows on a seeded dataset
+
+the requests go through the WSGI application in this process, with the
+middleware, authentication and connection handling of production, to the
+dataset of `python manage.py seed_dataset`; the user_files created and
+uploaded to are deleted afterwards, `gc_blobs` collects their files
+"""
+import io
+import json
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.models import Max
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, \
+    encode_multipart
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import datasets
+from core.benchmarks.base import percentile
+from core.models import Tag, User_File
+
+
+FLOWS = OrderedDict()
+# user_files a retrieve picks from
+RETRIEVE_SAMPLE = 10000
+UPLOAD_SIZE = 64 * 1024
+
+
+def flow(name):
+    """register a flow under name
+
+    a flow is called with the Context of the run and returns the Request
+    it makes next
+    """
+    def decorator(func):
+        FLOWS[name] = func
+        return func
+
+    return decorator
+
+
+Request = namedtuple('Request', 'method path query body content_type')
+Request.__new__.__defaults__ = ('', b'', '')
+
+
+class Context:
+    """what the flows of a run request, for the first user of a dataset"""
+
+    def __init__(self, prefix, seed=0):
+        self.user = datasets.dataset_users(prefix).get(
+            email=datasets.dataset_email(prefix, 0)
+        )
+        self.token = Token.objects.get_or_create(user=self.user)[0].key
+        self.tag_ids = list(
+            Tag.objects.filter(user=self.user).order_by('id').values_list(
+                'id', flat=True
+            )
+        )
+        self.user_file_ids = list(
+            User_File.objects.filter(user=self.user).order_by('id')
+            .values_list('id', flat=True)[:RETRIEVE_SAMPLE]
+        )
+        self.user_files = User_File.objects.filter(user=self.user).count()
+        self.last_id = User_File.objects.aggregate(last=Max('id'))['last']
+        self.upload_target = User_File.objects.create(
+            user=self.user, title='benchmark upload'
+        )
+        self.seed = seed
+        self.local = threading.local()
+
+    @property
+    def rng(self):
+        """return the random generator of the current thread"""
+        if not hasattr(self.local, 'rng'):
+            self.local.rng = random.Random(
+                f'{self.seed}-{threading.current_thread().name}'
+            )
+        return self.local.rng
+
+    def cleanup(self):
+        """delete the user_files the run created"""
+        User_File.objects.filter(
+            user=self.user, id__gt=self.last_id or 0
+        ).delete()
+
+
+@flow('token-auth')
+def token_auth(context):
+    """obtain a token with the email and password of the user"""
+    return Request('POST', reverse('user:token'), body=urlencode({
+        'email': context.user.email, 'password': datasets.PASSWORD,
+    }).encode(), content_type='application/x-www-form-urlencoded')
+
+
+@flow('list')
+def list_user_files(context):
+    """first page of the user_files"""
+    return Request('GET', reverse('user_files:user_file-list'))
+
+
+@flow('filter')
+def filter_user_files(context):
+    """user_files having any of the most used tags"""
+    ids = ','.join(str(pk) for pk in context.tag_ids[:3])
+    return Request(
+        'GET', reverse('user_files:user_file-list'), urlencode({'tags': ids})
+    )
+
+
+@flow('retrieve')
+def retrieve_user_file(context):
+    """detail of a random user_file"""
+    pk = context.rng.choice(context.user_file_ids)
+    return Request('GET', reverse('user_files:user_file-detail', args=[pk]))
+
+
+@flow('create')
+def create_user_file(context):
+    """create a user_file with two tags"""
+    tags = context.rng.sample(context.tag_ids, min(2, len(context.tag_ids)))
+    return Request(
+        'POST', reverse('user_files:user_file-list'), body=json.dumps({
+            'title': 'benchmark', 'tags': tags, 'file_types': [],
+        }).encode(), content_type='application/json'
+    )
+
+
+@flow('upload')
+def upload_file(context):
+    """upload a file of new content to a user_file, the content is not a
+    drawing or image so no derivatives are generated in the background"""
+    content = io.BytesIO(context.rng.getrandbits(8 * UPLOAD_SIZE).to_bytes(
+        UPLOAD_SIZE, 'little'
+    ))
+    content.name = 'upload.bin'
+    return Request('POST', reverse(
+        'user_files:user_file-upload-file', args=[context.upload_target.id]
+    ), body=encode_multipart(BOUNDARY, {'file': content}),
+        content_type=MULTIPART_CONTENT)
+
+
+def call(application, token, request):
+    """make a request to application, return the status and the seconds it
+    took"""
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': request.path,
+        'QUERY_STRING': request.query,
+        'CONTENT_TYPE': request.content_type,
+        'CONTENT_LENGTH': str(len(request.body)),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(request.body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    start = time.perf_counter()
+    result = application(environ, start_response)
+    try:
+        for chunk in result:
+            pass
+    finally:
+        # ends the request like a WSGI server, closing old connections
+        result.close()
+
+    return statuses[0], time.perf_counter() - start
+
+
+def run_flow(application, context, name, requests, threads):
+    """send requests requests of a flow from threads threads, return the
+    latencies, the number of errors and the wall time"""
+    latencies = []
+    errors = []
+    make_request = FLOWS[name]
+    # the token flow authenticates with the password
+    token = None if name == 'token-auth' else context.token
+
+    def client(count):
+        try:
+            for _ in range(count):
+                status, seconds = call(
+                    application, token, make_request(context)
+                )
+                latencies.append(seconds)
+                if status >= 400:
+                    errors.append(status)
+        finally:
+            connections.close_all()
+
+    shares = [requests // threads + (i < requests % threads)
+              for i in range(threads)]
+    # the threads are named so their random choices repeat across runs
+    workers = [
+        threading.Thread(target=client, args=[count], name=f'{name}-{i}')
+        for i, count in enumerate(shares)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return latencies, len(errors), time.perf_counter() - start
+
+
+def summary(latencies, errors, seconds):
+    """return the throughput and latency percentiles of a flow"""
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / seconds if seconds else 0,
+        'mean_ms': statistics.mean(milliseconds),
+        'p50_ms': percentile(milliseconds, 0.50),
+        'p95_ms': percentile(milliseconds, 0.95),
+        'p99_ms': percentile(milliseconds, 0.99),
+        'max_ms': max(milliseconds),
+    }
+
+
+def git_commit():
+    """return the commit of the code being benchmarked, if known"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(prefix, flows, requests, warmup=10, threads=1, seed=0):
+    """benchmark flows on the dataset named prefix, return the results"""
+    context = Context(prefix, seed=seed)
+    application = WSGIHandler()
+    results = OrderedDict()
+    try:
+        for name in flows:
+            if warmup:
+                run_flow(application, context, name, warmup, 1)
+            results[name] = summary(
+                *run_flow(application, context, name, requests, threads)
+            )
+    finally:
+        context.cleanup()
+
+    return {
+        'commit': git_commit(),
+        'date': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'dataset': prefix,
+        'user_files': context.user_files,
+        'requests': requests,
+        'threads': threads,
+        'flows': results,
+    }
@@ -0,0 +1,24 @@
+from core.benchmarks import datasets
+from core.benchmarks.base import register, time_queryset
+from core.models import Tag, User_File
+
+from user_files import filters
+
+
+@register('assigned_only')
+def assigned_only(size, repeat):
+    """list the tags assigned to a file: JOIN + DISTINCT against EXISTS"""
+    user = datasets.create_user('assigned-only@benchmark.local')
+    datasets.seed_user_files(user, files=size, tags=200, skew=1.2)
+
+    join = Tag.objects.filter(
+        user_file__isnull=False
+    ).filter(user=user).order_by('-name').distinct()
+    exists = filters.filter_assigned(
+        Tag.objects.filter(user=user), User_File.tags.through, 'tag'
+    ).order_by('-name')
+
+    return [
+        ('join + distinct', time_queryset(join, repeat)),
+        ('exists', time_queryset(exists, repeat)),
+    ]
@@ -0,0 +1,41 @@
+import time
+from collections import OrderedDict
+
+
+SUITES = OrderedDict()
+
+
+def register(name):
+    """register a benchmark suite under name
+
+    a suite is called with the dataset size and the number of repetitions
+    and returns a list of (case name, seconds) tuples
+    """
+    def decorator(func):
+        SUITES[name] = func
+        return func
+
+    return decorator
+
+
+def best_of(func, repeat):
+    """return the best wall time in seconds of repeat calls of func"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def percentile(values, fraction):
+    """return the value below which fraction of values lie"""
+    values = sorted(values)
+
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def time_queryset(queryset, repeat):
+    """return the best time to fetch every row of queryset"""
+    return best_of(lambda: list(queryset.all()), repeat)
@@ -0,0 +1,46 @@
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.benchmarks import datasets
+from core.benchmarks.base import register, best_of
+from core.models import Tag, File_type
+
+from user_files.bulk import MAX_ITEMS, batches
+
+
+@register('bulk_create')
+def bulk_create(size, repeat):
+    """create size user_files with one POST each against bulk POSTs"""
+    user = datasets.create_user('bulk-create@benchmark.local')
+    datasets.seed_user_files(user, files=0, tags=100, file_types=10)
+    tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+    file_type_ids = list(
+        File_type.objects.filter(user=user).values_list('id', flat=True)
+    )
+    payload = [
+        {
+            'title': f'file {i}',
+            'link': f'/files/{i}',
+            'tags': [tag_ids[i % len(tag_ids)], tag_ids[i * 7 % len(tag_ids)]],
+            'file_types': [file_type_ids[i % len(file_type_ids)]],
+        }
+        for i in range(size)
+    ]
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+    list_url = reverse('user_files:user_file-list')
+    bulk_url = reverse('user_files:user_file-bulk')
+
+    def individually():
+        for item in payload:
+            client.post(list_url, item, format='json')
+
+    def in_bulk():
+        for batch in batches(payload, MAX_ITEMS):
+            client.post(bulk_url, batch, format='json')
+
+    return [
+        ('one POST per user_file', best_of(individually, repeat)),
+        ('bulk POST', best_of(in_bulk, repeat)),
+    ]
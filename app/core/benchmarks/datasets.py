@@ -0,0 +1,157 @@
+import random
+import re
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+
+from core import usage
+from core.models import Tag, File_type, User_File
+
+from user_files import search
+from user_files.bulk import batches
+
+
+BATCH_SIZE = 5000
+# password of the users of the datasets
+PASSWORD = 'benchmark'
+
+
+def skewed_sample(rng, population, weights, k):
+    """return up to k distinct items of population drawn by weight"""
+    return set(rng.choices(population, weights=weights, k=k))
+
+
+def zipf_weights(size, skew):
+    """weights making the first items the most frequently drawn"""
+    return [1 / (rank + 1) ** skew for rank in range(size)]
+
+
+def bulk_create(model, objs):
+    """insert objs in batches of BATCH_SIZE without materializing them all,
+    the backend splits batches further when it limits query parameters"""
+    objs = iter(objs)
+    batch = list(islice(objs, BATCH_SIZE))
+    while batch:
+        model.objects.bulk_create(batch)
+        batch = list(islice(objs, BATCH_SIZE))
+
+
+def create_user(email):
+    """create a user owning a benchmark dataset"""
+    return get_user_model().objects.create_user(email, PASSWORD)
+
+
+def seed_user_files(user, files, tags=100, file_types=10, tags_per_file=3,
+                    file_types_per_file=1, skew=1.0, seed=0):
+    """create a deterministic dataset of user_files for user
+
+    tags and file_types are assigned with a zipf distribution, so a few of
+    them are attached to most files like in real accounts
+    """
+    rng = random.Random(seed)
+    bulk_create(Tag, (
+        Tag(user=user, name=f'tag {i}') for i in range(tags)
+    ))
+    bulk_create(File_type, (
+        File_type(user=user, type=f'type {i}') for i in range(file_types)
+    ))
+    bulk_create(User_File, (
+        User_File(user=user, title=f'file {i}', link=f'/files/{i}')
+        for i in range(files)
+    ))
+
+    tag_ids = list(
+        Tag.objects.filter(user=user).order_by('id').values_list(
+            'id', flat=True
+        )
+    )
+    file_type_ids = list(
+        File_type.objects.filter(user=user).order_by('id').values_list(
+            'id', flat=True
+        )
+    )
+    user_file_ids = list(
+        User_File.objects.filter(user=user).order_by('id').values_list(
+            'id', flat=True
+        )
+    )
+    tag_weights = zipf_weights(len(tag_ids), skew)
+    file_type_weights = zipf_weights(len(file_type_ids), skew)
+
+    tag_links = []
+    file_type_links = []
+    for user_file_id in user_file_ids:
+        # the links are inserted as they are drawn so datasets of millions
+        # of user_files are not held in memory
+        if len(tag_links) >= BATCH_SIZE:
+            bulk_create(User_File.tags.through, tag_links)
+            tag_links = []
+        if len(file_type_links) >= BATCH_SIZE:
+            bulk_create(User_File.file_types.through, file_type_links)
+            file_type_links = []
+        if tag_ids and tags_per_file:
+            tag_links.extend(
+                User_File.tags.through(user_file_id=user_file_id, tag_id=pk)
+                for pk in skewed_sample(
+                    rng, tag_ids, tag_weights, tags_per_file
+                )
+            )
+        if file_type_ids and file_types_per_file:
+            file_type_links.extend(
+                User_File.file_types.through(
+                    user_file_id=user_file_id, file_type_id=pk
+                )
+                for pk in skewed_sample(
+                    rng, file_type_ids, file_type_weights,
+                    file_types_per_file
+                )
+            )
+    bulk_create(User_File.tags.through, tag_links)
+    bulk_create(User_File.file_types.through, file_type_links)
+
+    return user
+
+
+def dataset_email(prefix, index):
+    """return the email of a user of a dataset"""
+    return f'{prefix}-{index}@benchmark.local'
+
+
+def dataset_users(prefix):
+    """return the users of the dataset named prefix, the emails of other
+    datasets may start with it, see dataset_email"""
+    return get_user_model().objects.filter(
+        email__regex=rf'^{re.escape(prefix)}-\d+@benchmark\.local$'
+    )
+
+
+def seed_dataset(prefix, users, files, seed=0, **options):
+    """create users users owning files user_files each, see
+    seed_user_files for options; the same arguments always create the same
+    data, every user is seeded with seed plus its index
+
+    rows inserted by bulk_create skip the signals, so the usage counters
+    and search vectors are computed once for the whole dataset
+    """
+    created = []
+    for index in range(users):
+        user = create_user(dataset_email(prefix, index))
+        seed_user_files(user, files, seed=seed + index, **options)
+        created.append(user)
+
+    user_ids = [user.id for user in created]
+    usage.recount_users(user_ids)
+    for model in (Tag, File_type):
+        ids = model.objects.filter(user_id__in=user_ids).values_list(
+            'id', flat=True
+        )
+        for batch in batches(ids, BATCH_SIZE):
+            usage.recount(model, batch)
+    if search.uses_postgres():
+        ids = User_File.objects.filter(user_id__in=user_ids).values_list(
+            'id', flat=True
+        )
+        for batch in batches(ids, BATCH_SIZE):
+            search.update_vectors(User_File, batch)
+
+    return created
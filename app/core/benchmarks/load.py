@@ -0,0 +1,233 @@
+"""Load test of fast metadata requests while slow clients upload chunks
+
+the server runs in this process on a pool of a few threads, either the
+ASGI handler under uvicorn or the WSGI application under a server handing
+each connection to a thread of the pool like a threaded WSGI worker does;
+the dataset is committed since the server threads use their own database
+connections, and deleted afterwards; SQLite fails some of the concurrent
+chunk writes with "database is locked", run it on PostgreSQL to count the
+slow uploads
+"""
+import asyncio
+import http.client
+import os
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+import uvicorn
+
+from core.asgi import ASGIHandler
+from core.benchmarks import datasets
+from core.benchmarks.base import percentile
+from core.models import User_File, User_FileUpload
+
+from user_files import uploads
+
+
+SERVERS = ('asgi', 'wsgi')
+HOST = '127.0.0.1'
+
+
+def free_port():
+    """return a TCP port nobody listens on"""
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """request handler not logging every request"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI server handling the connections in a pool of threads"""
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(
+            self.process_request_thread, request, client_address
+        )
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class WSGIServerThread(threading.Thread):
+    """serve the WSGI application in a background thread"""
+
+    def __init__(self, port, threads):
+        super().__init__(daemon=True)
+        self.server = PooledWSGIServer(
+            (HOST, port), QuietRequestHandler, threads=threads
+        )
+        self.server.set_app(WSGIHandler())
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ASGIServerThread(threading.Thread):
+    """serve the ASGI handler with uvicorn in a background thread"""
+
+    def __init__(self, port, threads):
+        super().__init__(daemon=True)
+        self.handler = ASGIHandler(executor=ThreadPoolExecutor(threads))
+        self.server = uvicorn.Server(uvicorn.Config(
+            self.handler, host=HOST, port=port, loop='asyncio',
+            lifespan='off', log_level='warning'
+        ))
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        # signals can only be handled in the main thread
+        self.server.install_signal_handlers = lambda: None
+        loop.run_until_complete(self.server.serve())
+        loop.close()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join()
+        self.handler.executor.shutdown(wait=False)
+
+
+def wait_listening(port, timeout=10):
+    """wait until the server accepts connections"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def slow_upload(port, token, url, size, seconds):
+    """PUT a chunk of size bytes spread over seconds, return the status"""
+    conn = http.client.HTTPConnection(HOST, port, timeout=seconds + 60)
+    try:
+        conn.putrequest('PUT', url)
+        conn.putheader('Authorization', f'Token {token}')
+        conn.putheader('Content-Type', 'application/octet-stream')
+        conn.putheader('Content-Length', str(size))
+        conn.putheader('Upload-Offset', '0')
+        conn.endheaders()
+        pieces = 20
+        piece = os.urandom(size // pieces)
+        for i in range(pieces):
+            time.sleep(seconds / pieces)
+            conn.send(piece if i < pieces - 1 else
+                      piece + b'\0' * (size - pieces * len(piece)))
+
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def timed_get(port, token, url):
+    """GET url on a new connection, return the status and the latency"""
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(HOST, port, timeout=60)
+    try:
+        conn.request('GET', url, headers={'Authorization': f'Token {token}'})
+        res = conn.getresponse()
+        res.read()
+    finally:
+        conn.close()
+
+    return res.status, time.perf_counter() - start
+
+
+def run(server, threads, slow_clients, slow_seconds, requests,
+        chunk_size=64 * 1024):
+    """run the load test against server, return a list of (measure,
+    value) tuples"""
+    # not <prefix>-<index>, the email of a seed_dataset user
+    user = datasets.create_user(f'load.{os.getpid()}@benchmark.local')
+    try:
+        datasets.seed_user_files(user, files=50, tags=20)
+        token = Token.objects.create(user=user).key
+        user_file = User_File.objects.filter(user=user).first()
+        chunk_urls = []
+        for _ in range(slow_clients):
+            upload = uploads.start_upload(
+                user_file, 'drawing.dxf', chunk_size
+            )
+            chunk_urls.append(reverse(
+                'user_files:user_file-upload-chunk',
+                args=[user_file.id, upload.id]
+            ))
+
+        return measure(
+            server, threads, token, chunk_urls, chunk_size, slow_seconds,
+            requests, reverse('user_files:tag-list')
+        )
+    finally:
+        for upload in User_FileUpload.objects.filter(user_file__user=user):
+            if os.path.exists(uploads.part_path(upload)):
+                os.remove(uploads.part_path(upload))
+        user.delete()
+
+
+def measure(server, threads, token, chunk_urls, chunk_size, slow_seconds,
+            requests, fast_url):
+    """time requests GETs of fast_url while every url of chunk_urls
+    receives a slow chunk"""
+    port = free_port()
+    thread = (ASGIServerThread if server == 'asgi' else WSGIServerThread)(
+        port, threads
+    )
+    thread.start()
+    try:
+        wait_listening(port)
+        # warm up the token cache and the connections of the server
+        timed_get(port, token, fast_url)
+        with ThreadPoolExecutor(len(chunk_urls) or 1) as clients:
+            slow = [
+                clients.submit(
+                    slow_upload, port, token, url, chunk_size, slow_seconds
+                )
+                for url in chunk_urls
+            ]
+            # let the slow clients connect first
+            time.sleep(min(slow_seconds / 4, 0.5))
+            latencies = []
+            errors = 0
+            for _ in range(requests):
+                status, seconds = timed_get(port, token, fast_url)
+                latencies.append(seconds)
+                errors += status != 200
+            slow_ok = sum(future.result() == 200 for future in slow)
+    finally:
+        thread.stop()
+
+    return [
+        ('fast requests p50 (ms)', statistics.median(latencies) * 1000),
+        ('fast requests p95 (ms)', percentile(latencies, 0.95) * 1000),
+        ('fast requests max (ms)', max(latencies) * 1000),
+        ('fast request errors', errors),
+        ('slow uploads completed', slow_ok),
+    ]
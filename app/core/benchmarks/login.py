@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import datasets
+from core.benchmarks.base import best_of, register
+from core.throttling import login_limiter
+
+from user.views import CreateTokenView
+
+
+def per_call(func, calls, repeat):
+    """return the best time of one of calls calls of func"""
+    def run():
+        for _ in range(calls):
+            func()
+
+    return best_of(run, repeat) / calls
+
+
+@register('login')
+def login(size, repeat):
+    """time checking a password with every configured hasher, a token
+    request and a login refused by the limiter, size // 1000 times each;
+    one login a case takes is 1 / seconds logins per second of one core"""
+    calls = max(size // 1000, 1)
+    results = []
+    for path in settings.PASSWORD_HASHERS:
+        hasher = import_string(path)()
+        try:
+            encoded = hasher.encode(datasets.PASSWORD, hasher.salt())
+        except ValueError:
+            # the library of the hasher is not installed
+            continue
+        results.append((f'check password, {hasher.algorithm}', per_call(
+            lambda: hasher.verify(datasets.PASSWORD, encoded), calls, repeat
+        )))
+
+    user = datasets.create_user('login@benchmark.local')
+    view = CreateTokenView.as_view()
+    factory = APIRequestFactory()
+    url = reverse('user:token')
+
+    def token_request(password):
+        return view(factory.post(
+            url, {'email': user.email, 'password': password}
+        ))
+
+    login_limiter.clear()
+    try:
+        token_request(datasets.PASSWORD)
+        results.append(('token request, existing token', per_call(
+            lambda: token_request(datasets.PASSWORD), calls, repeat
+        )))
+        for _ in range(settings.LOGIN_FAILURES_PER_EMAIL):
+            token_request('wrong')
+        results.append(('token request, backed off', per_call(
+            lambda: token_request('wrong'), calls, repeat
+        )))
+    finally:
+        login_limiter.clear()
+
+    return results
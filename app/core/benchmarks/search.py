@@ -0,0 +1,26 @@
+from core.benchmarks import datasets
+from core.benchmarks.base import register, time_queryset
+from core.models import User_File
+
+from user_files import search
+
+
+QUERIES = ('file 12', 'tag 7', 'type', 'fil')
+
+
+@register('search')
+def search_user_files(size, repeat):
+    """fetch the first page of ranked search results"""
+    user = datasets.create_user('search@benchmark.local')
+    datasets.seed_user_files(user, files=size, tags=200, tags_per_file=3)
+    search.update_vectors(
+        User_File, User_File.objects.filter(user=user).values_list(
+            'id', flat=True
+        )
+    )
+    user_files = User_File.objects.filter(user=user)
+
+    return [
+        (f'q={q!r}', time_queryset(search.search(user_files, q)[:100], repeat))
+        for q in QUERIES
+    ]
@@ -0,0 +1,40 @@
+from core.benchmarks import datasets
+from core.benchmarks.base import register, time_queryset
+from core.models import Tag, User_File
+
+from user_files import filters
+
+
+TAG_COUNTS = (1, 2, 5, 10, 20)
+
+
+@register('tag_filter')
+def tag_filter(size, repeat):
+    """filter user_files by 1 to 20 tags in any and all modes"""
+    user = datasets.create_user('tag-filter@benchmark.local')
+    datasets.seed_user_files(
+        user, files=size, tags=200, tags_per_file=5, skew=0.8
+    )
+    tag_ids = list(
+        Tag.objects.filter(user=user).order_by('id').values_list(
+            'id', flat=True
+        )
+    )
+    user_files = User_File.objects.filter(user=user)
+
+    results = []
+    for count in TAG_COUNTS:
+        ids = tag_ids[:count]
+        join = user_files.filter(tags__id__in=ids).distinct()
+        results.append(
+            (f'join + distinct, {count} tags', time_queryset(join, repeat))
+        )
+        for match in filters.MATCH_MODES:
+            queryset = filters.filter_related(
+                user_files, User_File.tags.through, 'tag', ids, match
+            )
+            results.append(
+                (f'{match}, {count} tags', time_queryset(queryset, repeat))
+            )
+
+    return results
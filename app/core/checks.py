@@ -0,0 +1,53 @@
+"""System checks of the settings the server processes rely on
+
+They run with the management commands and when gunicorn starts, see
+gunicorn.conf.py, so a misconfigured deployment refuses to start.
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+# backends keeping their keys in each server process, or not at all
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_local_cache(alias):
+    """return whether the cache alias is not shared by server processes"""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+
+    return backend is None or backend in LOCAL_CACHE_BACKENDS
+
+
+@register()
+def check_replica_pin_cache(app_configs, **kwargs):
+    """the pin set by a write in one process must reach the next read of
+    the user in every other process"""
+    if settings.DATABASE_REPLICAS and \
+            is_local_cache(settings.REPLICA_PIN_CACHE_ALIAS):
+        return [Error(
+            'REPLICA_PIN_CACHE_ALIAS names a cache local to each server '
+            'process, users would not read their own writes.',
+            hint='Set SHARED_CACHE_BACKEND when DB_REPLICA_HOSTS is set.',
+            id='core.E001',
+        )]
+
+    return []
+
+
+@register()
+def check_user_files_cache(app_configs, **kwargs):
+    """a write in one process must invalidate the responses cached for
+    the user in every other process"""
+    alias = settings.USER_FILES_CACHE_ALIAS
+    if alias and is_local_cache(alias):
+        return [Error(
+            'USER_FILES_CACHE_ALIAS names a cache local to each server '
+            'process, other processes would serve stale responses.',
+            hint="Set SHARED_CACHE_BACKEND and name the 'shared' cache.",
+            id='core.E002',
+        )]
+
+    return []
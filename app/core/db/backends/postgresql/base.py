@@ -0,0 +1,17 @@
+from django.db.backends.postgresql import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """PostgreSQL backend sharing a pool of connections between threads"""
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # only the wrapper that opened a pooled connection went through
+        # the setup of the postgresql backend
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+
+        return connection
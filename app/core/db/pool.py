@@ -0,0 +1,242 @@
+"""In-process pool of database connections
+
+Django keeps one connection per thread, closed at the end of a request
+or reused for CONN_MAX_AGE seconds. With a pool the connections are
+shared by the threads of a process: a request takes one when it first
+queries and hands it back when Django closes it at the end of the
+request, so CONN_MAX_AGE must be 0.
+"""
+import os
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """no connection was returned to a full pool in time"""
+
+
+def check_connection(connection):
+    """raise when a DB-API connection cannot run a query"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    finally:
+        cursor.close()
+
+
+def close_quietly(connection):
+    """close a connection that may already be broken"""
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """thread safe pool of DB-API connections
+
+    up to size connections are kept open, max_overflow more are opened
+    when they are all in use and closed once returned; when the pool is
+    full acquire waits up to timeout seconds for a connection. A
+    connection idle for check_interval seconds is checked before it is
+    handed out and one opened recycle seconds ago is replaced.
+    """
+
+    def __init__(self, size, max_overflow=0, timeout=30, recycle=3600,
+                 check_interval=30, check=check_connection):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.check_interval = check_interval
+        self.check = check
+        self.condition = threading.Condition()
+        # (connection, opened at, returned at) of the idle connections,
+        # the last returned is handed out first
+        self.idle = []
+        self.opened_at = {}
+        self.opened = 0
+        self.metrics = {
+            'acquired': 0,
+            'created': 0,
+            'closed': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'timeouts': 0,
+            'failed_checks': 0,
+        }
+
+    def acquire(self, connect):
+        """return a connection, connect() opens a new one"""
+        start = time.monotonic()
+        entry = self.take(start)
+        now = time.monotonic()
+        if entry is not None:
+            connection, opened_at, returned_at = entry
+            if now - opened_at >= self.recycle:
+                entry = self.discard(connection, release_slot=False)
+            elif now - returned_at >= self.check_interval:
+                try:
+                    self.check(connection)
+                except Exception:
+                    self.count('failed_checks')
+                    entry = self.discard(connection, release_slot=False)
+        if entry is None:
+            try:
+                connection = connect()
+            except BaseException:
+                with self.condition:
+                    self.opened -= 1
+                    self.condition.notify()
+                raise
+            opened_at = now
+            self.count('created')
+
+        with self.condition:
+            self.opened_at[id(connection)] = opened_at
+
+        return connection
+
+    def take(self, start):
+        """return an idle entry, or None after reserving a slot for a new
+        connection; wait while the pool is full"""
+        deadline = start + self.timeout
+        waited = False
+        with self.condition:
+            while not self.idle and \
+                    self.opened >= self.size + self.max_overflow:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No database connection was available within '
+                        f'{self.timeout} seconds'
+                    )
+                waited = True
+                self.condition.wait(remaining)
+
+            wait = time.monotonic() - start
+            self.metrics['acquired'] += 1
+            self.metrics['waits'] += waited
+            self.metrics['wait_seconds'] += wait
+            self.metrics['max_wait_seconds'] = max(
+                self.metrics['max_wait_seconds'], wait
+            )
+            if self.idle:
+                return self.idle.pop()
+            self.opened += 1
+
+        return None
+
+    def release(self, connection, discard=False):
+        """give back a connection, closing it when discard is set, the
+        pool keeps enough connections or it is due for recycling"""
+        now = time.monotonic()
+        with self.condition:
+            opened_at = self.opened_at.pop(id(connection), now)
+            keep = not discard and len(self.idle) < self.size and \
+                now - opened_at < self.recycle
+            if keep:
+                self.idle.append((connection, opened_at, now))
+                self.condition.notify()
+                return
+        self.discard(connection)
+
+    def discard(self, connection, release_slot=True):
+        """close a connection, the slot is kept for its replacement unless
+        release_slot is set"""
+        close_quietly(connection)
+        with self.condition:
+            self.metrics['closed'] += 1
+            if release_slot:
+                self.opened -= 1
+                self.condition.notify()
+
+    def close(self):
+        """close the idle connections"""
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for connection, opened_at, returned_at in idle:
+            self.discard(connection)
+
+    def count(self, metric):
+        """increment a metric"""
+        with self.condition:
+            self.metrics[metric] += 1
+
+    def stats(self):
+        """return the state and metrics of the pool"""
+        with self.condition:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self.opened,
+                'idle': len(self.idle),
+                'in_use': self.opened - len(self.idle),
+                **self.metrics,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """return the pool of the connections to a database
+
+    a forked process gets pools of its own, the connections opened by its
+    parent are left alone rather than closed under the parent's feet
+    """
+    key = (alias, os.getpid(), repr(sorted(conn_params.items())))
+    with _pools_lock:
+        if key not in _pools:
+            options = settings_dict.get('POOL', {})
+            _pools[key] = ConnectionPool(
+                size=options.get('SIZE', 5),
+                max_overflow=options.get('MAX_OVERFLOW', 10),
+                timeout=options.get('TIMEOUT', 30),
+                recycle=options.get('RECYCLE', 3600),
+                check_interval=options.get('CHECK_INTERVAL', 30),
+            )
+
+        return _pools[key]
+
+
+def pool_stats():
+    """return the stats of the pools of this process by database alias"""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [(key[0], pool) for key, pool in _pools.items()
+                 if key[1] == pid]
+
+    return {alias: pool.stats() for alias, pool in pools}
+
+
+class PooledDatabaseWrapperMixin:
+    """database wrapper taking its connections from a ConnectionPool
+
+    the POOL dict of the database settings configures the pool with the
+    SIZE, MAX_OVERFLOW, TIMEOUT, RECYCLE and CHECK_INTERVAL keys
+    """
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self.alias, self.settings_dict, conn_params)
+        wrapper = super(PooledDatabaseWrapperMixin, self)
+
+        return self.pool.acquire(
+            lambda: wrapper.get_new_connection(conn_params)
+        )
+
+    def _close(self):
+        """end the transaction left open and give the connection back,
+        a connection failing to do so is closed"""
+        connection = self.connection
+        try:
+            connection.rollback()
+        except Exception:
+            self.pool.release(connection, discard=True)
+        else:
+            self.pool.release(connection)
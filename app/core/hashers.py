@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with the costs of the PASSWORD_ARGON2_* settings
+
+    a password hashed with other costs is rehashed with these on the next
+    login, like passwords of the hashers listed after this one
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
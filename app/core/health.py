@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+
+_lock = threading.Lock()
+_last_check = None
+_last_result = None
+
+
+def check_databases():
+    """run a trivial query on every configured database"""
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def check_caches():
+    """write and read a key in the caches shared by the server processes"""
+    aliases = {
+        settings.USER_FILES_CACHE_ALIAS, settings.AUTH_TOKEN_CACHE_ALIAS
+    }
+    for alias in filter(None, aliases):
+        cache = caches[alias]
+        cache.set('readyz', 1, timeout=60)
+        if cache.get('readyz') != 1:
+            raise RuntimeError(f'cache {alias} does not keep keys')
+
+
+CHECKS = (
+    ('database', check_databases),
+    ('cache', check_caches),
+)
+
+
+def run_checks():
+    """return whether every check passed and the outcome of each"""
+    results = {}
+    for name, check in CHECKS:
+        try:
+            check()
+            results[name] = 'ok'
+        except Exception as exc:
+            results[name] = f'{exc.__class__.__name__}: {exc}'
+
+    return all(result == 'ok' for result in results.values()), results
+
+
+def readiness():
+    """return the result of run_checks, computed at most once every
+    HEALTH_CHECK_INTERVAL seconds by each server process"""
+    global _last_check, _last_result
+    with _lock:
+        now = time.monotonic()
+        if _last_check is None or \
+                now - _last_check >= settings.HEALTH_CHECK_INTERVAL:
+            _last_result = run_checks()
+            _last_check = now
+
+        return _last_result
+
+
+def reset():
+    """forget the last readiness result"""
+    global _last_check, _last_result
+    with _lock:
+        _last_check = _last_result = None
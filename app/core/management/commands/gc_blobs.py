@@ -0,0 +1,125 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Blob, User_FileUpload
+from core.storage import BLOB_DIR, content_storage
+
+from user_files.uploads import part_path
+
+
+class Command(BaseCommand):
+    """Django command to delete the stored blobs no user_file references
+    and the uploads abandoned before completion"""
+    help = ('Delete unreferenced blobs older than the grace period and '
+            'incomplete uploads older than the upload expiry')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Seconds a blob file is kept after it was last written'
+        )
+        parser.add_argument(
+            '--upload-expiry', type=int, default=24 * 3600,
+            help='Seconds an incomplete upload is kept after it was last '
+                 'written'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        self.cutoff = time.time() - options['grace']
+        self.upload_expiry = options['upload_expiry']
+        self.dry_run = options['dry_run']
+        released = self.collect_released()
+        orphans = self.collect_orphans()
+        uploads = self.collect_uploads()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {released} unreferenced and {orphans} orphan blobs '
+            f'and {uploads} abandoned uploads'
+        ))
+
+    def expired(self, path):
+        """return whether the file at path is past the grace period"""
+        return os.path.getmtime(path) < self.cutoff
+
+    def remove(self, path):
+        """delete the file at path unless running dry"""
+        if not self.dry_run and os.path.exists(path):
+            os.remove(path)
+
+    def collect_released(self):
+        """delete the blobs whose reference count dropped to zero"""
+        removed = 0
+        pks = Blob.objects.filter(refcount__lte=0).values_list(
+            'pk', flat=True
+        )
+        for pk in list(pks):
+            with transaction.atomic():
+                blob = Blob.objects.select_for_update().filter(
+                    pk=pk, refcount__lte=0
+                ).first()
+                if blob is None:
+                    continue
+                path = content_storage.path(blob.name)
+                if os.path.exists(path) and not self.expired(path):
+                    continue
+                self.remove(path)
+                if not self.dry_run:
+                    blob.delete()
+                removed += 1
+
+        return removed
+
+    def collect_orphans(self):
+        """delete the files left without a blob row by interrupted saves"""
+        removed = 0
+        root = content_storage.path(BLOB_DIR)
+        for directory, _, filenames in os.walk(root):
+            names = {}
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                relpath = os.path.relpath(path, root).replace(os.sep, '/')
+                names[f'{BLOB_DIR}/{relpath}'] = path
+            known = set(Blob.objects.filter(
+                name__in=list(names)
+            ).values_list('name', flat=True))
+            for name, path in names.items():
+                if name not in known and self.expired(path):
+                    self.remove(path)
+                    removed += 1
+
+        return removed
+
+    def collect_uploads(self):
+        """delete the incomplete uploads not written to for upload_expiry
+        seconds, their part files go with them, see core.signals"""
+        removed = 0
+        cutoff = time.time() - self.upload_expiry
+        pks = User_FileUpload.objects.filter(
+            completed=False,
+            created_on__lt=timezone.now() - timedelta(
+                seconds=self.upload_expiry
+            )
+        ).values_list('pk', flat=True)
+        for pk in list(pks):
+            with transaction.atomic():
+                # a chunk being written holds the lock of the upload
+                upload = User_FileUpload.objects.select_for_update().filter(
+                    pk=pk, completed=False
+                ).first()
+                if upload is None:
+                    continue
+                path = part_path(upload)
+                if os.path.exists(path) and os.path.getmtime(path) >= cutoff:
+                    continue
+                if not self.dry_run:
+                    upload.delete()
+                removed += 1
+
+        return removed
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import load
+
+
+class Command(BaseCommand):
+    """Django command to time fast requests while slow clients upload"""
+    help = ('Serve the API in this process and time metadata requests '
+            'while slow clients hold upload connections open')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server', choices=load.SERVERS, action='append',
+            help='Server to test, both by default'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Threads running the views'
+        )
+        parser.add_argument('--slow-clients', type=int, default=16)
+        parser.add_argument(
+            '--slow-seconds', type=float, default=5,
+            help='Seconds every slow client takes to send its chunk'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        for server in options['server'] or load.SERVERS:
+            results = load.run(
+                server,
+                threads=options['threads'],
+                slow_clients=options['slow_clients'],
+                slow_seconds=options['slow_seconds'],
+                requests=options['requests'],
+            )
+            self.stdout.write(
+                f"{server} ({options['threads']} threads, "
+                f"{options['slow_clients']} slow clients)"
+            )
+            for name, value in results:
+                self.stdout.write(f'  {name:<40} {value:10.2f}')
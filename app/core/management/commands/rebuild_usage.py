@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import usage
+
+
+class Command(BaseCommand):
+    """Django command to recompute or check the usage counters"""
+    help = 'Recompute the usage counters, or report the drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report the counters not matching the data'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options['check']:
+            drifted = 0
+            for name, stored, actual in usage.drift():
+                drifted += 1
+                self.stdout.write(f'{name}: {stored} != {actual}')
+            if drifted:
+                raise CommandError(f'{drifted} usage counters drifted')
+            self.stdout.write(self.style.SUCCESS('Usage counters are exact'))
+            return
+
+        with transaction.atomic():
+            usage.rebuild()
+        self.stdout.write(self.style.SUCCESS('Usage counters rebuilt'))
@@ -0,0 +1,66 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import api
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API flows on a seeded dataset"""
+    help = ('Send the requests of API flows through the WSGI application '
+            'and report their throughput and latency percentiles')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Dataset created by seed_dataset'
+        )
+        parser.add_argument(
+            '--flow', choices=list(api.FLOWS), action='append',
+            help='Flow to run, all of them by default'
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Requests of every flow sent before timing it'
+        )
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='File to write the results to as JSON'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING(
+                'DEBUG is on, queries are recorded and timings are slower'
+            ))
+        results = api.run(
+            options['prefix'],
+            options['flow'] or list(api.FLOWS),
+            requests=options['requests'],
+            warmup=options['warmup'],
+            threads=options['threads'],
+            seed=options['seed'],
+        )
+
+        commit = results['commit'] or 'no commit'
+        self.stdout.write(
+            f"{results['dataset']} ({results['user_files']} user_files, "
+            f"{results['threads']} threads, {commit})"
+        )
+        self.stdout.write(
+            f"  {'flow':<12} {'rps':>10} {'p50 ms':>10} {'p95 ms':>10} "
+            f"{'p99 ms':>10} {'errors':>8}"
+        )
+        for name, flow in results['flows'].items():
+            self.stdout.write(
+                f"  {name:<12} {flow['throughput_rps']:10.1f} "
+                f"{flow['p50_ms']:10.2f} {flow['p95_ms']:10.2f} "
+                f"{flow['p99_ms']:10.2f} {flow['errors']:8}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    """Django command to run a benchmark suite on a synthetic dataset"""
+    help = 'Run a benchmark suite, the dataset it seeds is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=list(benchmarks.SUITES))
+        parser.add_argument('--size', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        suite = benchmarks.SUITES[options['suite']]
+        with transaction.atomic():
+            results = suite(size=options['size'], repeat=options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{options['suite']} (size={options['size']})")
+        for name, seconds in results:
+            self.stdout.write(f'  {name:<40} {seconds * 1000:10.2f} ms')
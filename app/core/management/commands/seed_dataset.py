@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.benchmarks import datasets
+
+
+class Command(BaseCommand):
+    """Django command to create a deterministic synthetic dataset"""
+    help = ('Create users owning user_files with skewed tags and '
+            'file_types, the same options always create the same data')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Name of the dataset, its users are <prefix>-<n>@'
+                 'benchmark.local'
+        )
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument(
+            '--files', type=int, default=100000,
+            help='User_files of every user'
+        )
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--file-types', type=int, default=10)
+        parser.add_argument('--tags-per-file', type=int, default=3)
+        parser.add_argument('--file-types-per-file', type=int, default=1)
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='Zipf exponent of the tag and file_type distributions'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Delete the dataset of the same name first'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        prefix = options['prefix']
+        with transaction.atomic():
+            existing = datasets.dataset_users(prefix)
+            if existing.exists():
+                if not options['replace']:
+                    raise CommandError(
+                        f'dataset {prefix} exists, use --replace'
+                    )
+                existing.delete()
+            users = datasets.seed_dataset(
+                prefix, options['users'], options['files'],
+                seed=options['seed'],
+                tags=options['tags'],
+                file_types=options['file_types'],
+                tags_per_file=options['tags_per_file'],
+                file_types_per_file=options['file_types_per_file'],
+                skew=options['skew'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dataset {prefix}: {len(users)} users with "
+            f"{options['files']} user_files each"
+        ))
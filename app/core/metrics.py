@@ -0,0 +1,303 @@
+"""Performance measures of the API requests
+
+PerformanceMiddleware measures the requests of the views in the URL
+namespaces of PERF_METRICS_NAMESPACES: wall time, number and time of the
+database queries, time spent in serializers and size of the response.
+Every measure is recorded by the sinks of PERF_METRICS_SINKS, the
+middleware removes itself when there are none and profiling is off.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from rest_framework.exceptions import APIException
+
+from core.authentication import CachedTokenAuthentication, token_cache
+from core.db.pool import pool_stats
+from core.throttling import login_limiter
+
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the buckets of the request duration histogram
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_local = threading.local()
+
+
+class Measure:
+    """what a request cost, queries are counted while it is current"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view = None
+        self.method = None
+        self.status = None
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.size = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """database execute wrapper timing the queries"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def timed(self, method):
+        """return method adding the time it takes to the serializer time"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.serializer_seconds += time.perf_counter() - start
+
+        return wrapper
+
+    def finish(self, request, response):
+        """set what is known once the response is returned"""
+        self.seconds = time.perf_counter() - self.start
+        self.view = request.resolver_match.view_name
+        self.method = request.method
+        self.status = response.status_code
+        if response.streaming:
+            self.size = int(response.get('Content-Length', 0))
+        else:
+            self.size = len(response.content)
+
+
+def current():
+    """return the measure of the request of this thread, if any"""
+    return getattr(_local, 'measure', None)
+
+
+@contextmanager
+def measuring():
+    """measure the request handled inside the block, the queries of every
+    database are counted"""
+    measure = Measure()
+    _local.measure = measure
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(measure))
+            yield measure
+    finally:
+        _local.measure = None
+
+
+def measured(request):
+    """return whether the view of a request is in PERF_METRICS_NAMESPACES"""
+    match = request.resolver_match
+    return match is not None and bool(match.namespaces) and \
+        match.namespaces[0] in settings.PERF_METRICS_NAMESPACES
+
+
+def timed_serializer(serializer):
+    """return serializer adding the time it spends validating and
+    representing data to the measure of the request"""
+    measure = current()
+    if measure is not None:
+        for name in ('run_validation', 'to_representation'):
+            setattr(serializer, name, measure.timed(getattr(serializer, name)))
+
+    return serializer
+
+
+class SerializerTimingMixin:
+    """measure the time spent in the serializers of a view, those of
+    BulkModelMixin included"""
+
+    def get_serializer(self, *args, **kwargs):
+        return timed_serializer(super().get_serializer(*args, **kwargs))
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        return timed_serializer(super().get_bulk_serializer(*args, **kwargs))
+
+
+def label_value(value):
+    """escape a Prometheus label value"""
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def labels(**values):
+    """return the Prometheus labels of values"""
+    return '{' + ','.join(
+        f'{name}="{label_value(value)}"' for name, value in values.items()
+    ) + '}'
+
+
+class Histograms:
+    """request measures aggregated by view, method and status"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, measure):
+        """add a measure to the series of its view, method and status"""
+        key = (measure.view, measure.method, measure.status)
+        index = bisect_left(self.buckets, measure.seconds)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'count': 0,
+                    'seconds': 0.0,
+                    'queries': 0,
+                    'db_seconds': 0.0,
+                    'serializer_seconds': 0.0,
+                    'bytes': 0,
+                }
+            series['buckets'][index] += 1
+            series['count'] += 1
+            series['seconds'] += measure.seconds
+            series['queries'] += measure.queries
+            series['db_seconds'] += measure.db_seconds
+            series['serializer_seconds'] += measure.serializer_seconds
+            series['bytes'] += measure.size
+
+    def clear(self):
+        """forget every measure"""
+        with self.lock:
+            self.series = {}
+
+    def render(self):
+        """return the series in the Prometheus text format"""
+        with self.lock:
+            series = sorted(
+                (key, dict(values, buckets=list(values['buckets'])))
+                for key, values in self.series.items()
+            )
+
+        lines = [
+            '# HELP api_request_duration_seconds Wall time of the requests.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for (view, method, status), values in series:
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, values['buckets']):
+                cumulative += count
+                lines.append(
+                    'api_request_duration_seconds_bucket' + labels(
+                        view=view, method=method, status=status, le=bound
+                    ) + f' {cumulative}'
+                )
+            key = labels(view=view, method=method, status=status)
+            lines.append(f'api_request_duration_seconds_sum{key} '
+                         f'{values["seconds"]}')
+            lines.append(f'api_request_duration_seconds_count{key} '
+                         f'{values["count"]}')
+
+        for name, field, description in (
+                ('api_request_db_queries_total', 'queries',
+                 'Database queries of the requests.'),
+                ('api_request_db_seconds_total', 'db_seconds',
+                 'Time spent in database queries.'),
+                ('api_request_serializer_seconds_total', 'serializer_seconds',
+                 'Time spent in serializers.'),
+                ('api_response_bytes_total', 'bytes',
+                 'Size of the response bodies.')):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for (view, method, status), values in series:
+                key = labels(view=view, method=method, status=status)
+                lines.append(f'{name}{key} {values[field]}')
+
+        return lines
+
+
+histograms = Histograms()
+
+
+class LogSink:
+    """write a line per request to the core.metrics logger"""
+
+    def record(self, measure):
+        logger.info(
+            'view=%s method=%s status=%s wall_ms=%.1f queries=%d db_ms=%.1f '
+            'serializer_ms=%.1f bytes=%d',
+            measure.view, measure.method, measure.status,
+            measure.seconds * 1000, measure.queries,
+            measure.db_seconds * 1000, measure.serializer_seconds * 1000,
+            measure.size
+        )
+
+
+class HistogramSink:
+    """aggregate the measures in the histograms served at /metrics
+
+    every server process keeps histograms of its own, a scrape only sees
+    the requests of the process answering it
+    """
+
+    def record(self, measure):
+        histograms.observe(measure)
+
+
+def get_sinks():
+    """return instances of the sinks of PERF_METRICS_SINKS"""
+    return [import_string(path)() for path in settings.PERF_METRICS_SINKS]
+
+
+def render():
+    """return the histograms and the stats of the token cache, the login
+    limiter and the connection pools of this process in the Prometheus
+    text format"""
+    lines = histograms.render()
+    for name, value in token_cache.stats().items():
+        lines.append(f'# TYPE auth_token_cache_{name} gauge')
+        lines.append(f'auth_token_cache_{name} {value}')
+    for name, value in login_limiter.stats().items():
+        lines.append(f'# TYPE auth_login_limiter_{name} gauge')
+        lines.append(f'auth_login_limiter_{name} {value}')
+    pools = sorted(pool_stats().items())
+    names = sorted(pools[0][1]) if pools else []
+    for name in names:
+        lines.append(f'# TYPE db_pool_{name} gauge')
+        for alias, stats in pools:
+            lines.append(f'db_pool_{name}{labels(alias=alias)} {stats[name]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def profiled(request):
+    """return whether a request asks for a profile and comes from a staff
+    user, authenticated by session or token"""
+    if settings.PERF_PROFILE_HEADER not in request.META:
+        return False
+    user = request.user
+    if not user.is_authenticated:
+        try:
+            user = (CachedTokenAuthentication().authenticate(request) or
+                    (user, None))[0]
+        except APIException:
+            return False
+
+    return user.is_staff
+
+
+def dump_profile(profile):
+    """write a profile to PERF_PROFILE_DIR and return the file name"""
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof'
+    os.makedirs(settings.PERF_PROFILE_DIR, exist_ok=True)
+    profile.dump_stats(os.path.join(settings.PERF_PROFILE_DIR, name))
+
+    return name
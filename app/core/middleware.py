@@ -0,0 +1,78 @@
+import cProfile
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from core import health, metrics
+
+
+HEALTHZ_PATH = '/healthz'
+READYZ_PATH = '/readyz'
+# response header naming the profile file written in PERF_PROFILE_DIR
+PROFILE_HEADER = 'X-Profile'
+
+
+class HealthCheckMiddleware:
+    """answer the liveness and readiness probes of the orchestrator
+
+    it comes first so probes skip the other middleware, the host they use
+    is not checked against ALLOWED_HOSTS; /healthz only tells the process
+    serves requests, /readyz also checks the database and caches
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info == HEALTHZ_PATH:
+            return JsonResponse({'status': 'ok'})
+        if request.path_info == READYZ_PATH:
+            ready, checks = health.readiness()
+            return JsonResponse(
+                {'status': 'ok' if ready else 'unavailable',
+                 'checks': checks},
+                status=200 if ready else 503
+            )
+
+        return self.get_response(request)
+
+
+class PerformanceMiddleware:
+    """measure the API requests and profile those asking for it, see
+    core.metrics
+
+    it comes after the authentication middleware so staff users logged in
+    with a session may ask for profiles too; when no sink is set and
+    PERF_PROFILE_DIR is not, it is left out of the middleware chain
+    """
+
+    def __init__(self, get_response):
+        self.sinks = metrics.get_sinks()
+        if not self.sinks and not settings.PERF_PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = None
+        if settings.PERF_PROFILE_DIR and metrics.profiled(request):
+            profile = cProfile.Profile()
+
+        with metrics.measuring() as measure:
+            if profile is None:
+                response = self.get_response(request)
+            else:
+                profile.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profile.disable()
+
+        if profile is not None:
+            response[PROFILE_HEADER] = metrics.dump_profile(profile)
+        if self.sinks and metrics.measured(request):
+            measure.finish(request, response)
+            for sink in self.sinks:
+                sink.record(measure)
+
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_user_file_file'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file_type',
+            index=models.Index(fields=['user', 'type'], name='core_filetype_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user_file',
+            index=models.Index(fields=['user', 'created_on'], name='core_userfile_user_created_idx'),
+        ),
+        # reverse lookups (tag/file_type -> user_files) on the auto-created
+        # m2m tables, which only get a unique (user_file, target) index
+        migrations.RunSQL(
+            ['CREATE INDEX core_userfile_tags_rev_idx '
+             'ON core_user_file_tags (tag_id, user_file_id)'],
+            reverse_sql=['DROP INDEX core_userfile_tags_rev_idx'],
+        ),
+        migrations.RunSQL(
+            ['CREATE INDEX core_userfile_ftypes_rev_idx '
+             'ON core_user_file_file_types (file_type_id, user_file_id)'],
+            reverse_sql=['DROP INDEX core_userfile_ftypes_rev_idx'],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User_FileUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('user_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='core.User_File')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:35
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_fileupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='user_file',
+            name='file',
+            field=models.FileField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.userfile_file_path),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:37
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Derivative',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('thumbnail', 'Thumbnail')], max_length=32)),
+                ('size', models.PositiveIntegerField()),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('file', models.FileField(upload_to=core.models.derivative_file_path)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('user_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='core.User_File')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='derivative',
+            unique_together={('user_file', 'kind', 'size')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_derivative'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DxfMetadata',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=16)),
+                ('units', models.PositiveSmallIntegerField(default=0)),
+                ('layers', models.TextField(default='[]')),
+                ('entity_counts', models.TextField(default='{}')),
+                ('extmin_x', models.FloatField(null=True)),
+                ('extmin_y', models.FloatField(null=True)),
+                ('extmax_x', models.FloatField(null=True)),
+                ('extmax_y', models.FloatField(null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('user_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dxf_metadata', to='core.User_File')),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:49
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# the search vectors, their GIN index and the trigram indexes of title and
+# link for typo matching only exist on PostgreSQL, other databases use the
+# LIKE fallback of user_files.search
+FORWARD_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX core_userfile_search_idx '
+    'ON core_user_file USING gin (search_vector)',
+    'CREATE INDEX core_userfile_title_trgm_idx '
+    'ON core_user_file USING gin (title gin_trgm_ops)',
+    'CREATE INDEX core_userfile_link_trgm_idx '
+    'ON core_user_file USING gin (link gin_trgm_ops)',
+    """
+    UPDATE core_user_file SET search_vector =
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(t.name, ' ') FROM core_tag t
+            JOIN core_user_file_tags ut ON ut.tag_id = t.id
+            WHERE ut.user_file_id = core_user_file.id
+        ), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(f.type, ' ') FROM core_file_type f
+            JOIN core_user_file_file_types uf ON uf.file_type_id = f.id
+            WHERE uf.user_file_id = core_user_file.id
+        ), '')), 'B') ||
+        setweight(to_tsvector('simple', regexp_replace(
+            coalesce(link, ''), '[^[:alnum:]]+', ' ', 'g'
+        )), 'C')
+    """,
+]
+REVERSE_SQL = [
+    'DROP INDEX core_userfile_search_idx',
+    'DROP INDEX core_userfile_title_trgm_idx',
+    'DROP INDEX core_userfile_link_trgm_idx',
+]
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_dxfmetadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user_file',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_on_postgres(FORWARD_SQL),
+            run_on_postgres(REVERSE_SQL),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.storage import content_storage
+
+
+def count_usage(apps, schema_editor):
+    """fill the counters of the existing data, file sizes come from the
+    blobs since the files were not measured before; the files uploaded
+    before the blobs existed are measured in storage"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserUsage = apps.get_model('core', 'UserUsage')
+    User_File = apps.get_model('core', 'User_File')
+    Blob = apps.get_model('core', 'Blob')
+    User_File.objects.update(file_size=Coalesce(Subquery(
+        Blob.objects.filter(name=OuterRef('file')).values('size')[:1]
+    ), 0))
+    unmeasured = User_File.objects.exclude(file='').exclude(
+        file__isnull=True
+    ).exclude(file__in=Blob.objects.values('name')).values_list('id', 'file')
+    for pk, name in list(unmeasured):
+        try:
+            size = content_storage.size(name)
+        except OSError:
+            continue
+        User_File.objects.filter(pk=pk).update(file_size=size)
+    UserUsage.objects.bulk_create(
+        UserUsage(user_id=user_id)
+        for user_id in User.objects.values_list('id', flat=True)
+    )
+    for model_name, field, column in (('Tag', 'tags', 'tag_id'),
+                                      ('File_type', 'file_types',
+                                       'file_type_id')):
+        through = getattr(User_File, field).through
+        apps.get_model('core', model_name).objects.update(
+            usage_count=Coalesce(Subquery(
+                through.objects.filter(**{column: OuterRef('pk')})
+                .order_by().values(column).annotate(count=Count('id'))
+                .values('count')
+            ), 0)
+        )
+    files = User_File.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by().values('user_id')
+    UserUsage.objects.update(
+        file_count=Coalesce(Subquery(
+            files.annotate(count=Count('id')).values('count')
+        ), 0),
+        byte_count=Coalesce(Subquery(
+            files.annotate(total=Sum('file_size')).values('total')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_file_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserUsage',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('file_count', models.IntegerField(default=0)),
+                ('byte_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='file_type',
+            name='usage_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user_file',
+            name='file_size',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
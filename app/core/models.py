@@ -1,3 +1,4 @@
+import json
 import uuid
 import os
 
@@ -6,6 +7,9 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+
+from core.storage import content_storage, parse_blob_name
 
 
 def userfile_file_path(instance, filename):
@@ -16,6 +20,14 @@ def userfile_file_path(instance, filename):
     return os.path.join('uploads/user_files', filename)
 
 
+def derivative_file_path(instance, filename):
+    """generate file_path for the derivative of a userfile file"""
+    ext = filename.split('.')[-1]
+    filename = f'{instance.kind}-{instance.size}.{ext}'
+
+    return os.path.join('derivatives', str(instance.user_file_id), filename)
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -37,6 +49,41 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def get_by_natural_key(self, email):
+        """return the user of email with its API token, so a login reuses
+        the token without another query"""
+        return self.select_related('auth_token').get(
+            **{self.model.USERNAME_FIELD: email}
+        )
+
+
+class BlobManager(models.Manager):
+
+    def retain(self, name):
+        """add a reference to the blob stored under name"""
+        digest = parse_blob_name(name)
+        if digest is None:
+            return
+        if self.filter(name=name).update(refcount=models.F('refcount') + 1):
+            return
+        blob, created = self.get_or_create(
+            name=name,
+            defaults={
+                'digest': digest,
+                'size': content_storage.size(name),
+                'refcount': 1,
+            }
+        )
+        if not created:
+            self.filter(pk=blob.pk).update(
+                refcount=models.F('refcount') + 1
+            )
+
+    def release(self, name):
+        """drop a reference to the blob stored under name"""
+        if parse_blob_name(name) is not None:
+            self.filter(name=name).update(refcount=models.F('refcount') - 1)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """Custom user model that supports using email instead of username"""
@@ -50,6 +97,22 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class UserUsage(models.Model):
+    """number of user_files and bytes they store for a user, maintained
+    by core.usage"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage'
+    )
+    file_count = models.IntegerField(default=0)
+    byte_count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id} {self.file_count} {self.byte_count}'
+
+
 class Tag(models.Model):
     """tag to be used for a user_file"""
     name = models.CharField(max_length=255)
@@ -57,6 +120,16 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # user_files having the tag, maintained by core.usage
+    usage_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                name='core_tag_user_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -69,6 +142,16 @@ class File_type(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # user_files having the file_type, maintained by core.usage
+    usage_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'type'],
+                name='core_filetype_user_type_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.type
@@ -85,7 +168,114 @@ class User_File(models.Model):
     link = models.CharField(max_length=255, blank=True)
     file_types = models.ManyToManyField('File_type')
     tags = models.ManyToManyField('Tag')
-    file = models.FileField(null=True, upload_to=userfile_file_path)
+    file = models.FileField(
+        null=True,
+        upload_to=userfile_file_path,
+        storage=content_storage
+    )
+    # size in bytes of the file, kept by the signals in core.signals
+    file_size = models.BigIntegerField(default=0, editable=False)
+    # title, link, tag and file_type names, maintained by user_files.search
+    # on PostgreSQL only
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'created_on'],
+                name='core_userfile_user_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class User_FileUpload(models.Model):
+    """resumable chunked upload of the file of a user_file"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_file = models.ForeignKey(
+        'User_File',
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    filename = models.CharField(max_length=255)
+    # storage name the file is written to, chunks go to `<name>.part`
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.filename
+
+
+class Blob(models.Model):
+    """file content stored once and shared by the user_files having it"""
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    objects = BlobManager()
+
+    def __str__(self):
+        return self.name
+
+
+class Derivative(models.Model):
+    """a smaller rendition of the file of a user_file"""
+    THUMBNAIL = 'thumbnail'
+    KIND_CHOICES = ((THUMBNAIL, 'Thumbnail'),)
+
+    user_file = models.ForeignKey(
+        'User_File',
+        on_delete=models.CASCADE,
+        related_name='derivatives'
+    )
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    # largest edge in pixels
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(upload_to=derivative_file_path)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (('user_file', 'kind', 'size'),)
+
+    def __str__(self):
+        return f'{self.kind} {self.size}'
+
+
+class DxfMetadata(models.Model):
+    """summary of the DXF drawing stored as the file of a user_file"""
+    user_file = models.OneToOneField(
+        'User_File',
+        on_delete=models.CASCADE,
+        related_name='dxf_metadata'
+    )
+    version = models.CharField(max_length=16)
+    # $INSUNITS code of the drawing, 0 when unitless
+    units = models.PositiveSmallIntegerField(default=0)
+    # json encoded list of layer names and {entity type: count}
+    layers = models.TextField(default='[]')
+    entity_counts = models.TextField(default='{}')
+    extmin_x = models.FloatField(null=True)
+    extmin_y = models.FloatField(null=True)
+    extmax_x = models.FloatField(null=True)
+    extmax_y = models.FloatField(null=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def layer_names(self):
+        return json.loads(self.layers)
+
+    @property
+    def entity_count_by_type(self):
+        return json.loads(self.entity_counts)
+
+    def __str__(self):
+        return f'{self.user_file_id} {self.version}'
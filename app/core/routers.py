@@ -0,0 +1,109 @@
+"""Routing of the reads of safe requests to read replicas
+
+Reads go to the primary unless the view of the current request uses
+ReplicaReadMixin; the flag is kept per thread, every request runs in a
+thread of its own under both app.wsgi and app.asgi.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+_state = threading.local()
+
+
+def replica_reads():
+    """return whether the reads of the current thread may use a replica"""
+    return getattr(_state, 'replica', False)
+
+
+def set_replica_reads(enabled):
+    """let the reads of the current thread use a replica or not"""
+    _state.replica = enabled
+
+
+def pin_key(user_id):
+    """return the cache key pinning a user to the primary"""
+    return f'replica-pin:{user_id}'
+
+
+def pin_primary(user_id):
+    """send the reads of a user to the primary for REPLICA_PIN_SECONDS, so
+    they see their own writes before the replicas catch up"""
+    if settings.DATABASE_REPLICAS and settings.REPLICA_PIN_SECONDS > 0:
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].set(
+            pin_key(user_id), 1, settings.REPLICA_PIN_SECONDS
+        )
+
+
+def is_pinned(user_id):
+    """return whether the reads of a user go to the primary"""
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS].get(
+        pin_key(user_id)
+    ) is not None
+
+
+class ReplicaRouter:
+    """route the reads of replica requests to a random replica of
+    DATABASE_REPLICAS and every write to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and replica_reads():
+            return random.choice(settings.DATABASE_REPLICAS)
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """the replicas hold the same rows as the primary"""
+        return True
+
+
+class ReplicaReadMixin:
+    """read from a replica in the safe requests of replica_actions
+
+    views without actions use replicas for every safe request; the user is
+    authenticated on the primary and a user who just wrote keeps reading
+    from the primary for REPLICA_PIN_SECONDS
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            set_replica_reads(False)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.reads_from_replica(request):
+            set_replica_reads(True)
+
+    def reads_from_replica(self, request):
+        """return whether request may read from a replica"""
+        action = getattr(self, 'action', None)
+        if not settings.DATABASE_REPLICAS or \
+                request.method not in SAFE_METHODS:
+            return False
+        if action is not None and action not in self.replica_actions:
+            return False
+
+        return not is_pinned(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """pin the reads of a user who wrote to the primary"""
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if request.method not in SAFE_METHODS and \
+                response.status_code < 400 and \
+                request.user.is_authenticated:
+            pin_primary(request.user.pk)
+
+        return response
@@ -0,0 +1,157 @@
+import os
+
+from django.db.models.signals import pre_save, post_save, pre_delete, \
+    post_delete, m2m_changed
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core import usage
+from core.authentication import token_cache
+from core.models import User_File, Blob, Derivative, UserUsage, \
+    User_FileUpload
+
+from user_files.uploads import part_path
+
+
+def file_changed(update_fields):
+    """return whether a save with update_fields may write the file"""
+    return update_fields is None or 'file' in update_fields
+
+
+def file_size(instance):
+    """return the size of the file of a user_file, 0 without a file"""
+    if not instance.file:
+        return 0
+    try:
+        return instance.file.size
+    except OSError:
+        return 0
+
+
+@receiver(pre_save, sender=User_File)
+def remember_stored_file(sender, instance, update_fields=None, **kwargs):
+    """keep the file name and size stored before the save to compare them
+    after and measure the file being saved"""
+    instance._stored_file = None
+    instance._stored_file_size = 0
+    if not file_changed(update_fields):
+        return
+    if instance.pk:
+        stored = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('file', 'file_size').first()
+        if stored:
+            instance._stored_file, instance._stored_file_size = stored
+    instance.file_size = file_size(instance)
+
+
+@receiver(post_save, sender=User_File)
+def count_blob_references(sender, instance, update_fields=None, **kwargs):
+    """move the reference of the user_file to the blob it now stores"""
+    if not file_changed(update_fields):
+        return
+    stored = getattr(instance, '_stored_file', None) or ''
+    current = instance.file.name or ''
+    if stored != current:
+        Blob.objects.release(stored)
+        Blob.objects.retain(current)
+
+
+@receiver(pre_delete, sender=User_File)
+def release_blob(sender, instance, **kwargs):
+    """drop the reference of a deleted user_file to its blob"""
+    Blob.objects.release(instance.file.name)
+
+
+@receiver(post_save, sender=User_File)
+def count_user_usage(sender, instance, created, update_fields=None,
+                     **kwargs):
+    """count a new user_file and the bytes of a new file"""
+    if created:
+        usage.add_user_usage(
+            instance.user_id, files=1, size=instance.file_size
+        )
+    elif file_changed(update_fields):
+        usage.add_user_usage(
+            instance.user_id,
+            size=instance.file_size - instance._stored_file_size
+        )
+
+
+@receiver(pre_delete, sender=User_File)
+def uncount_user_usage(sender, instance, **kwargs):
+    """uncount a deleted user_file from its user, tags and file_types,
+    their links are deleted without m2m_changed signals"""
+    usage.add_user_usage(
+        instance.user_id, files=-1, size=-instance.file_size
+    )
+    for through, (model, column) in usage.RELATIONS.items():
+        usage.add_usage(model, usage.related_ids(through, instance.id), -1)
+
+
+@receiver(m2m_changed, sender=User_File.tags.through)
+@receiver(m2m_changed, sender=User_File.file_types.through)
+def count_relation_usage(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """count the user_files assigned to tags and file_types
+
+    instance is the user_file and pk_set the tag or file_type ids, or the
+    other way around when reverse; removals count the links that actually
+    exist before they are deleted
+    """
+    model, column = usage.RELATIONS[sender]
+    if not reverse:
+        if action == 'post_add':
+            usage.add_usage(model, pk_set, 1)
+        elif action in ('pre_remove', 'pre_clear'):
+            instance._usage_removed = usage.related_ids(
+                sender, instance.id, pk_set
+            )
+        elif action in ('post_remove', 'post_clear'):
+            usage.add_usage(model, instance._usage_removed, -1)
+    else:
+        if action == 'post_add':
+            usage.add_usage(model, [instance.id], len(pk_set))
+        elif action in ('pre_remove', 'pre_clear'):
+            instance._usage_removed = usage.user_file_count(
+                sender, instance.id, pk_set
+            )
+        elif action in ('post_remove', 'post_clear'):
+            usage.add_usage(model, [instance.id], -instance._usage_removed)
+
+
+@receiver(post_delete, sender=Derivative)
+def delete_derivative_file(sender, instance, **kwargs):
+    """derivative files belong to a single row, remove them with it"""
+    instance.file.delete(save=False)
+
+
+@receiver(post_delete, sender=User_FileUpload)
+def delete_upload_part(sender, instance, **kwargs):
+    """remove the chunks of an upload deleted before it was completed"""
+    path = part_path(instance)
+    if not instance.completed and os.path.exists(path):
+        os.remove(path)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """forget a changed or deleted token"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, created=False, **kwargs):
+    """forget the tokens of a changed, deactivated or deleted user"""
+    if not created:
+        token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def create_user_usage(sender, instance, created, raw=False, **kwargs):
+    """start the usage counters of a new user"""
+    if created and not raw:
+        UserUsage.objects.create(user=instance)
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+BLOB_DIR = 'uploads/blobs'
+BLOCK_SIZE = 64 * 1024
+BLOB_NAME_RE = re.compile(
+    r'^' + BLOB_DIR + r'/[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})'
+    r'(?P<ext>\.[0-9a-z]+)?$'
+)
+
+
+def blob_name(digest, ext=''):
+    """return the storage name of the blob holding content of digest"""
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def parse_blob_name(name):
+    """return the digest of a blob storage name, None for other names"""
+    match = BLOB_NAME_RE.match(name or '')
+
+    return match.group('digest') if match else None
+
+
+def normalized_ext(name):
+    """return the lowercased extension of name, kept on blob names so the
+    type of the content stays known"""
+    ext = os.path.splitext(name)[1].lower()
+
+    return ext if re.match(r'^\.[0-9a-z]+$', ext) else ''
+
+
+def file_digest(path):
+    """return the sha256 hex digest of the file at path"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """file system storage keeping one file per distinct content
+
+    files are named after the sha256 of their content, computed while the
+    upload is written, so saving content that is already stored only
+    touches the existing blob; the file of a blob is never deleted through
+    the storage since other user_files may share it, unreferenced blobs
+    are removed by the `gc_blobs` command
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """the name is only used for its extension, see _save"""
+        return name
+
+    def _save(self, name, content):
+        ext = normalized_ext(name)
+        if hasattr(content, 'temporary_file_path'):
+            return self.adopt(content.temporary_file_path(), ext)
+
+        tmp_path = self._tmp_path()
+        digest = hashlib.sha256()
+        with open(tmp_path, 'wb') as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+                digest.update(chunk)
+
+        return self._store(tmp_path, digest.hexdigest(), ext)
+
+    def adopt(self, path, ext='', digest=None):
+        """move the local file at path into the storage, return its name
+
+        digest is the sha256 of the file when the caller already knows it
+        """
+        if digest is None:
+            digest = file_digest(path)
+
+        return self._store(path, digest, ext)
+
+    def delete(self, name):
+        """only files outside of the blob store are deleted right away"""
+        if parse_blob_name(name) is None:
+            super().delete(name)
+
+    def _tmp_path(self):
+        """return a new temporary file path next to the blobs"""
+        directory = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory)
+        os.close(fd)
+
+        return path
+
+    def _store(self, path, digest, ext):
+        """move the file at path to the blob of digest unless it exists"""
+        name = blob_name(digest, ext)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(path)
+            # a recent mtime keeps the blob out of reach of gc_blobs until
+            # the user_file referencing it is saved
+            os.utime(full_path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(path, full_path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+
+        return name
+
+
+content_storage = ContentAddressedStorage()
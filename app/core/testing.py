@@ -0,0 +1,135 @@
+"""Query count assertions for the tests of the API
+
+QueryBudgetMixin calls every endpoint of a URL namespace with the data
+grown to several sizes and fails when an endpoint issues more queries
+than its budget or when its query count grows with the data, so N+1
+queries are caught before they ship.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+
+
+def count_queries(func, *args, **kwargs):
+    """return the number of queries executed while calling func"""
+    with CaptureQueriesContext(connection) as context:
+        func(*args, **kwargs)
+
+    return len(context.captured_queries)
+
+
+class QueryCountMixin:
+    """assertions on the number of queries issued by an endpoint"""
+
+    def assertConstantQueries(self, request, grow, sizes=(1, 5, 20)):
+        """assert request() issues the same number of queries after
+        grow(size) has been called for every size"""
+        counts = []
+        for size in sizes:
+            grow(size)
+            counts.append(count_queries(request))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'query count grows with the data: {dict(zip(sizes, counts))}'
+        )
+
+
+def view_methods(callback):
+    """return the HTTP methods a view answers, HEAD and OPTIONS aside"""
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return {method.upper() for method in actions}
+    view_class = callback.cls
+
+    return {
+        method.upper() for method in view_class.http_method_names
+        if method not in ('head', 'options') and hasattr(view_class, method)
+    }
+
+
+def endpoints(namespace):
+    """return the (url name, method) of every endpoint of a URL namespace,
+    the format suffix routes share the name of the route they extend"""
+    found = set()
+    patterns = list(get_resolver().namespace_dict[namespace][1].url_patterns)
+    while patterns:
+        pattern = patterns.pop()
+        if isinstance(pattern, URLResolver):
+            patterns.extend(pattern.url_patterns)
+        elif pattern.name:
+            found.update(
+                (pattern.name, method)
+                for method in view_methods(pattern.callback)
+            )
+
+    return found
+
+
+class QueryBudgetMixin(QueryCountMixin):
+    """check the query count of every endpoint of namespace
+
+    query_budgets maps the (url name, method) of each endpoint to the most
+    queries a request to it may issue. The data is grown with grow(size)
+    for every size of sizes, then endpoint_request(name, method) prepares
+    a request and returns a function making it; the rows written while
+    preparing and making it are rolled back, only the queries of the
+    request are counted.
+    """
+    namespace = None
+    sizes = (10, 100, 1000)
+    query_budgets = {}
+
+    def grow(self, size):
+        """add data until there are size rows of each kind"""
+        raise NotImplementedError
+
+    def endpoint_request(self, name, method):
+        """return a function requesting the endpoint"""
+        raise NotImplementedError
+
+    def count_request(self, name, method):
+        """return the number of queries of a request to an endpoint"""
+        with transaction.atomic():
+            request = self.endpoint_request(name, method)
+            with CaptureQueriesContext(connection) as context:
+                response = request()
+            transaction.set_rollback(True)
+        response.close()
+        self.assertLess(
+            response.status_code, 400,
+            f'{method} {name} failed: {getattr(response, "data", None)}'
+        )
+
+        return len(context.captured_queries)
+
+    def test_every_endpoint_has_a_budget(self):
+        """test a query budget is declared for every endpoint"""
+        self.assertEqual(
+            sorted(endpoints(self.namespace) - set(self.query_budgets)), [],
+            'endpoints without a query budget'
+        )
+
+    def test_query_budgets(self):
+        """test no endpoint issues more queries than its budget or more
+        queries when there is more data"""
+        counts = defaultdict(dict)
+        for size in self.sizes:
+            self.grow(size)
+            for name, method in sorted(self.query_budgets):
+                counts[name, method][size] = self.count_request(name, method)
+
+        failures = []
+        for (name, method), by_size in sorted(counts.items()):
+            budget = self.query_budgets[name, method]
+            if max(by_size.values()) > budget:
+                failures.append(
+                    f'{method} {name}: {by_size} queries, budget {budget}'
+                )
+            elif len(set(by_size.values())) > 1:
+                failures.append(
+                    f'{method} {name}: {by_size} queries grow with the data'
+                )
+        self.assertFalse(failures, '\n' + '\n'.join(failures))
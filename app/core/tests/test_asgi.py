@@ -0,0 +1,267 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import Executor, Future
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import signals
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ASGIHandler, build_environ
+from core.models import User_File, User_FileUpload
+
+from user_files import uploads
+
+
+class InlineExecutor(Executor):
+    """run the views in the thread of the test, which owns the
+    connection to the test database"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+        return future
+
+
+class ASGIHandlerTests(TestCase):
+    """Test serving the API with the ASGI handler"""
+
+    def setUp(self):
+        # like the test client, keep the connection of the test case open
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        self.addCleanup(
+            signals.request_started.connect, close_old_connections
+        )
+        self.addCleanup(
+            signals.request_finished.connect, close_old_connections
+        )
+        # the handler releases the connections of the view thread itself
+        # for streamed responses
+        patcher = patch('core.asgi.close_old_connections')
+        self.close_old_connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.handler = ASGIHandler(executor=InlineExecutor())
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.user_file = User_File.objects.create(
+            user=self.user, title='plan'
+        )
+
+    def request(self, method, path, body=(), headers=(), disconnect=None):
+        """run a request through the handler, the body is sent in the
+        given chunks; return the sent messages
+
+        disconnect is the number of response messages after which the
+        client goes away
+        """
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': method,
+            'path': path,
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+                *headers,
+            ],
+        }
+        messages = [
+            {'type': 'http.request', 'body': chunk, 'more_body': True}
+            for chunk in body
+        ] + [{'type': 'http.request', 'body': b''}]
+        sent = []
+        loop = asyncio.new_event_loop()
+        gone = asyncio.Event(loop=loop)
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if disconnect is not None and len(sent) >= disconnect:
+                gone.set()
+                # let the handler notice the disconnection
+                await asyncio.sleep(0)
+
+        try:
+            loop.run_until_complete(self.handler(scope, receive, send))
+        finally:
+            loop.close()
+
+        return sent
+
+    def content(self, sent):
+        """return the status and the body of the sent messages"""
+        return sent[0]['status'], b''.join(
+            message.get('body', b'') for message in sent[1:]
+        )
+
+    def test_metadata_request(self):
+        """test a JSON response is sent in one message"""
+        sent = self.request('GET', reverse('user_files:user_file-list'))
+        status, body = self.content(sent)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(
+            json.loads(body.decode())['results'][0]['id'], self.user_file.id
+        )
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_upload_chunk_received_in_pieces(self):
+        """test a chunk sent in pieces and spooled to disk is written"""
+        content = b'0123456789' * 5
+        upload = uploads.start_upload(
+            self.user_file, 'drawing.dxf', len(content)
+        )
+        self.addCleanup(os.remove, uploads.part_path(upload))
+        url = reverse(
+            'user_files:user_file-upload-chunk',
+            args=[self.user_file.id, upload.id]
+        )
+
+        sent = self.request(
+            'PUT', url,
+            body=[content[i:i + 7] for i in range(0, len(content), 7)],
+            headers=[(b'upload-offset', b'0'),
+                     (b'content-type', b'application/octet-stream')]
+        )
+
+        self.assertEqual(sent[0]['status'], 200)
+        upload = User_FileUpload.objects.get(id=upload.id)
+        self.assertEqual(upload.offset, len(content))
+        with open(uploads.part_path(upload), 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_disconnect_before_body(self):
+        """test nothing runs when the client leaves during the body"""
+        scope = {'type': 'http', 'method': 'PUT', 'path': '/', 'headers': []}
+        messages = [
+            {'type': 'http.request', 'body': b'01', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(self.handler(scope, receive, send))
+        loop.close()
+
+        self.assertEqual(sent, [])
+
+    @override_settings(ASGI_MAX_BODY_SIZE=10)
+    def test_body_too_large(self):
+        """test a body over the limit is refused once it is exceeded"""
+        url = reverse('user_files:user_file-list')
+
+        sent = self.request('POST', url, body=[b'012345', b'6789', b'!'])
+
+        self.assertEqual(sent[0]['status'], 413)
+        self.assertEqual(User_File.objects.count(), 1)
+
+    @override_settings(ASGI_MAX_BODY_SIZE=10)
+    def test_declared_length_too_large(self):
+        """test a body declared over the limit is refused unread"""
+        scope = {'type': 'http', 'method': 'PUT', 'path': '/',
+                 'headers': [(b'content-length', b'11')]}
+        sent = []
+
+        async def receive():
+            raise AssertionError('the body was read')
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(self.handler(scope, receive, send))
+        loop.close()
+
+        self.assertEqual(sent[0]['status'], 413)
+
+    def test_download_streamed(self):
+        """test a download is sent in blocks and a range is honoured"""
+        content = os.urandom(200 * 1024)
+        self.user_file.file.save('drawing.dxf', ContentFile(content))
+        self.addCleanup(os.remove, self.user_file.file.path)
+        url = reverse('user_files:user_file-download',
+                      args=[self.user_file.id])
+
+        sent = self.request('GET', url)
+        status, body = self.content(sent)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, content)
+        self.assertGreater(len(sent), 3)
+
+        sent = self.request('GET', url, headers=[(b'range', b'bytes=10-19')])
+        status, body = self.content(sent)
+        self.assertEqual(status, 206)
+        self.assertEqual(body, content[10:20])
+
+    def test_streamed_response_releases_connections(self):
+        """test the view thread releases its database connections before
+        a streamed response is sent"""
+        self.user_file.file.save('drawing.dxf', ContentFile(b'content'))
+        self.addCleanup(os.remove, self.user_file.file.path)
+        url = reverse('user_files:user_file-download',
+                      args=[self.user_file.id])
+        threads = []
+        self.close_old_connections.side_effect = \
+            lambda: threads.append(threading.current_thread())
+
+        self.request('GET', url)
+
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_download_stops_on_disconnect(self):
+        """test the file is no longer read once the client is gone"""
+        self.user_file.file.save(
+            'drawing.dxf', ContentFile(os.urandom(1024 * 1024))
+        )
+        self.addCleanup(os.remove, self.user_file.file.path)
+        url = reverse('user_files:user_file-download',
+                      args=[self.user_file.id])
+
+        sent = self.request('GET', url, disconnect=3)
+
+        self.assertLess(len(sent), 6)
+
+    def test_build_environ(self):
+        """test the environ follows the WSGI conventions"""
+        environ = build_environ({
+            'method': 'POST',
+            'path': '/api/café',
+            'query_string': b'a=1',
+            'headers': [(b'x-tag', b'a'), (b'x-tag', b'b'),
+                        (b'content-type', b'text/plain'),
+                        (b'content-length', b'99')],
+        }, None, 3)
+
+        self.assertEqual(environ['PATH_INFO'], '/api/cafÃ©')
+        self.assertEqual(environ['QUERY_STRING'], 'a=1')
+        self.assertEqual(environ['HTTP_X_TAG'], 'a,b')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['CONTENT_LENGTH'], '3')
@@ -0,0 +1,154 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import CachedTokenAuthentication, token_cache
+
+
+ME_URL = reverse('user:me')
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+    },
+}
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating tokens through the token cache"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.auth = CachedTokenAuthentication()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_cached_token_skips_query(self):
+        """test a token seen before is authenticated without queries"""
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.user, user)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['misses'], 1)
+
+    def test_cached_users_are_copies(self):
+        """test every request gets its own user object"""
+        self.auth.authenticate_credentials(self.token.key)
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        first.name = 'changed'
+        second, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, '')
+
+    def test_deleted_token_is_rejected(self):
+        """test deleting a token drops it from the cache"""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_deactivated_user_is_rejected(self):
+        """test deactivating a user drops their tokens from the cache"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_changed_user_is_reloaded(self):
+        """test the cached user is refreshed after the user is updated"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(ME_URL)
+        client.patch(ME_URL, {'name': 'new name'})
+
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+
+    def test_update_does_not_restore_stale_fields(self):
+        """test updating the user does not write back a cached copy made
+        before a change by another process"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(ME_URL)
+        # a change made by another process skips the signals of this one
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('newpass')
+        )
+
+        res = client.patch(ME_URL, {'name': 'new name'})
+
+        self.assertEqual(res.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass'))
+        self.assertEqual(self.user.name, 'new name')
+
+    @override_settings(CACHES=SHARED_CACHES, AUTH_TOKEN_CACHE_ALIAS='tokens')
+    def test_password_not_cached(self):
+        """test the password is kept out of the cached entries"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        user_values, _ = token_cache.shared.get(f'auth-token:{self.token.key}')
+        self.assertNotIn('password', user_values)
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertTrue(user.check_password('testpass'))
+
+    @override_settings(AUTH_TOKEN_CACHE_SIZE=1)
+    def test_least_recently_used_is_evicted(self):
+        """test the cache keeps at most AUTH_TOKEN_CACHE_SIZE tokens"""
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        other_token = Token.objects.create(user=other)
+        self.auth.authenticate_credentials(self.token.key)
+        self.auth.authenticate_credentials(other_token.key)
+
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(token_cache.stats()['size'], 1)
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_expired_token_is_reloaded(self):
+        """test entries older than AUTH_TOKEN_CACHE_TTL are not used"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @override_settings(CACHES=SHARED_CACHES, AUTH_TOKEN_CACHE_ALIAS='tokens')
+    def test_shared_cache(self):
+        """test tokens cached by another process are found in the shared
+        cache and dropped from it on delete"""
+        self.auth.authenticate_credentials(self.token.key)
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(token_cache.stats()['shared_hits'], 1)
+
+        key = self.token.key
+        self.token.delete()
+        token_cache.clear()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase, override_settings
+
+from core import checks
+
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+SHARED_CACHES = {
+    **LOCAL_CACHES,
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache',
+    },
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SystemCheckTests(SimpleTestCase):
+    """Test the system checks of the settings"""
+
+    @override_settings(DATABASE_REPLICAS=['replica'],
+                       REPLICA_PIN_CACHE_ALIAS='default')
+    def test_local_replica_pin_cache(self):
+        """test replicas need a pin cache shared by the processes"""
+        errors = checks.check_replica_pin_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(DATABASE_REPLICAS=['replica'], CACHES=SHARED_CACHES,
+                       REPLICA_PIN_CACHE_ALIAS='shared')
+    def test_shared_replica_pin_cache(self):
+        """test a shared pin cache passes the check"""
+        self.assertEqual(checks.check_replica_pin_cache(None), [])
+
+    @override_settings(DATABASE_REPLICAS=[],
+                       REPLICA_PIN_CACHE_ALIAS='default')
+    def test_no_replicas(self):
+        """test the pin cache may be local without replicas"""
+        self.assertEqual(checks.check_replica_pin_cache(None), [])
+
+    @override_settings(USER_FILES_CACHE_ALIAS='default')
+    def test_local_user_files_cache(self):
+        """test the response cache must be shared by the processes"""
+        errors = checks.check_user_files_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+
+    @override_settings(CACHES=SHARED_CACHES, USER_FILES_CACHE_ALIAS='shared')
+    def test_shared_user_files_cache(self):
+        """test a shared response cache passes the check"""
+        self.assertEqual(checks.check_user_files_cache(None), [])
+
+    @override_settings(USER_FILES_CACHE_ALIAS=None)
+    def test_user_files_cache_disabled(self):
+        """test no cache is needed when caching is disabled"""
+        self.assertEqual(checks.check_user_files_cache(None), [])
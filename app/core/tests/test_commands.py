@@ -1,8 +1,24 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import usage
+from core.benchmarks import api, datasets
+from core.models import Blob, User_File, User_FileUpload
+
+from user_files import uploads
 
 
 class CommandsTestCase(TestCase):
@@ -23,3 +39,179 @@ class CommandsTestCase(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_run_benchmark(self):
+        """Test running a benchmark suite leaves no data behind"""
+        out = StringIO()
+        call_command(
+            'run_benchmark', 'assigned_only',
+            size=20, repeat=1, stdout=out
+        )
+
+        self.assertIn('exists', out.getvalue())
+        self.assertFalse(User_File.objects.exists())
+
+    def test_run_benchmark_login(self):
+        """Test the login suite times every configured hasher"""
+        out = StringIO()
+        call_command('run_benchmark', 'login', size=1, repeat=1, stdout=out)
+
+        self.assertIn('check password, argon2', out.getvalue())
+        self.assertIn('token request, backed off', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_gc_blobs(self):
+        """Test collecting blobs removes only unreferenced ones"""
+        user = get_user_model().objects.create_user(
+            'test@pashadev.com', 'test123'
+        )
+        kept = User_File.objects.create(user=user, title='kept')
+        kept.file.save('kept.dxf', ContentFile(b'kept'))
+        released = User_File.objects.create(user=user, title='released')
+        released.file.save('released.dxf', ContentFile(b'released'))
+        released_path = released.file.path
+        released.delete()
+
+        call_command('gc_blobs', grace=-1, stdout=StringIO())
+
+        self.assertFalse(os.path.exists(released_path))
+        self.assertTrue(os.path.exists(kept.file.path))
+        self.assertEqual(
+            list(Blob.objects.values_list('name', flat=True)),
+            [kept.file.name]
+        )
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_gc_blobs_abandoned_uploads(self):
+        """Test collecting blobs expires the abandoned uploads only"""
+        user = get_user_model().objects.create_user(
+            'test@pashadev.com', 'test123'
+        )
+        user_file = User_File.objects.create(user=user, title='plan')
+        active = uploads.start_upload(user_file, 'active.dxf', 10)
+        abandoned = uploads.start_upload(user_file, 'abandoned.dxf', 10)
+        User_FileUpload.objects.filter(pk=abandoned.pk).update(
+            created_on=timezone.now() - timedelta(days=2)
+        )
+        os.utime(uploads.part_path(abandoned), (0, 0))
+
+        call_command('gc_blobs', stdout=StringIO())
+
+        self.assertFalse(os.path.exists(uploads.part_path(abandoned)))
+        self.assertEqual(
+            list(User_FileUpload.objects.values_list('pk', flat=True)),
+            [active.pk]
+        )
+        user_file.delete()
+        self.assertFalse(os.path.exists(uploads.part_path(active)))
+
+
+def dataset_links(prefix):
+    """return the tag names of every user_file of a dataset by title"""
+    links = User_File.tags.through.objects.filter(
+        user_file__user__email__startswith=f'{prefix}-'
+    ).values_list('user_file__user__email', 'user_file__title', 'tag__name')
+
+    return sorted(
+        (email.replace(prefix, ''), title, tag)
+        for email, title, tag in links
+    )
+
+
+class SeedDatasetTests(TestCase):
+    """Test seeding synthetic datasets"""
+
+    def seed(self, prefix, **options):
+        options = {'users': 2, 'files': 30, 'tags': 10, 'file_types': 3,
+                   **options}
+        call_command(
+            'seed_dataset', prefix=prefix, stdout=StringIO(), **options
+        )
+
+    def test_seed_dataset(self):
+        """Test the rows and counters of a dataset"""
+        self.seed('first')
+
+        users = get_user_model().objects.filter(
+            email__endswith='@benchmark.local'
+        )
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(
+            User_File.objects.filter(user__in=users).count(), 60
+        )
+        self.assertEqual(list(usage.drift()), [])
+
+    def test_seed_dataset_deterministic(self):
+        """Test the same options create the same dataset"""
+        self.seed('first')
+        self.seed('second')
+        self.seed('third', seed=1)
+
+        self.assertEqual(dataset_links('first'), dataset_links('second'))
+        self.assertNotEqual(dataset_links('first'), dataset_links('third'))
+
+    def test_seed_dataset_existing(self):
+        """Test an existing dataset is only replaced when asked to"""
+        self.seed('first')
+
+        with self.assertRaises(CommandError):
+            self.seed('first')
+        self.seed('first', replace=True, files=5)
+
+        self.assertEqual(
+            User_File.objects.filter(
+                user__email__startswith='first-'
+            ).count(), 10
+        )
+
+    def test_seed_dataset_prefix_of_other(self):
+        """Test the datasets named after the start of another are apart"""
+        self.seed('bench-large')
+        datasets.create_user('load.1234@benchmark.local')
+
+        self.seed('bench')
+        self.seed('load')
+        self.seed('bench', replace=True, files=5)
+
+        self.assertEqual(
+            User_File.objects.filter(
+                user__email__startswith='bench-large-'
+            ).count(), 60
+        )
+        self.assertTrue(get_user_model().objects.filter(
+            email='load.1234@benchmark.local'
+        ).exists())
+
+
+class RunApiBenchmarkTests(TransactionTestCase):
+    """Test benchmarking the API flows through the WSGI application, the
+    requests commit so they cannot run in a test transaction"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        call_command(
+            'seed_dataset', prefix='bench', files=20, tags=5, file_types=2,
+            stdout=StringIO()
+        )
+
+    def test_run_api_benchmark(self):
+        """Test every flow succeeds and the results are written as JSON"""
+        output = os.path.join(self.tmp, 'results.json')
+
+        with override_settings(MEDIA_ROOT=self.tmp):
+            call_command(
+                'run_api_benchmark', requests=4, warmup=1,
+                output=output, stdout=StringIO(), stderr=StringIO()
+            )
+
+        with open(output) as results_file:
+            results = json.load(results_file)
+        self.assertEqual(list(results['flows']), list(api.FLOWS))
+        for name, flow in results['flows'].items():
+            self.assertEqual(flow['requests'], 4, name)
+            self.assertEqual(flow['errors'], 0, name)
+            self.assertLessEqual(flow['p50_ms'], flow['p99_ms'], name)
+        self.assertEqual(results['user_files'], 20)
+        self.assertEqual(User_File.objects.count(), 20)
@@ -0,0 +1,50 @@
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+
+from core import health
+
+
+class HealthCheckTests(TestCase):
+    """Test the liveness and readiness probes"""
+
+    def setUp(self):
+        health.reset()
+        self.addCleanup(health.reset)
+
+    def test_healthz(self):
+        """test the liveness probe answers on any host"""
+        res = self.client.get('/healthz', HTTP_HOST='10.0.0.5')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    def test_readyz(self):
+        """test the readiness probe reports every check"""
+        res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res.json()['checks'], {'database': 'ok', 'cache': 'ok'}
+        )
+
+    @override_settings(HEALTH_CHECK_INTERVAL=60)
+    def test_readyz_reuses_result(self):
+        """test successive probes check the database once"""
+        check = Mock()
+        with patch('core.health.CHECKS', [('database', check)]):
+            self.client.get('/readyz')
+            with self.assertNumQueries(0):
+                self.client.get('/readyz')
+
+        self.assertEqual(check.call_count, 1)
+
+    def test_readyz_unavailable(self):
+        """test a failing check makes the probe fail"""
+        check = Mock(side_effect=OSError('refused'))
+        with patch('core.health.CHECKS', [('database', check)]):
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['status'], 'unavailable')
+        self.assertEqual(res.json()['checks']['database'], 'OSError: refused')
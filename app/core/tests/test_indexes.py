@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag, File_type, User_File
+
+
+def seed_user(email, size):
+    """create a user owning size tags, file_types and user_files with
+    every user_file assigned to one tag and one file_type"""
+    user = get_user_model().objects.create_user(email, 'test123')
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag {i}') for i in range(size)
+    )
+    File_type.objects.bulk_create(
+        File_type(user=user, type=f'type {i}') for i in range(size)
+    )
+    User_File.objects.bulk_create(
+        User_File(user=user, title=f'file {i}') for i in range(size)
+    )
+    tags = list(Tag.objects.filter(user=user))
+    file_types = list(File_type.objects.filter(user=user))
+    user_files = list(User_File.objects.filter(user=user))
+    User_File.tags.through.objects.bulk_create(
+        User_File.tags.through(user_file=user_file, tag=tags[i])
+        for i, user_file in enumerate(user_files)
+    )
+    User_File.file_types.through.objects.bulk_create(
+        User_File.file_types.through(
+            user_file=user_file, file_type=file_types[i]
+        )
+        for i, user_file in enumerate(user_files)
+    )
+
+    return user
+
+
+class IndexUsageTests(TestCase):
+    """Test the query planner uses the composite indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_user('test@pashadev.com', 300)
+        seed_user('other@pashadev.com', 300)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # the seeded tables are small enough for a sequential scan
+            # to win, only the choice between indexes is under test
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        """assert the plan of queryset uses index_name"""
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_tags_by_user_ordered_by_name(self):
+        """test listing a user's tags uses the (user, name) index"""
+        queryset = Tag.objects.filter(user=self.user).order_by('-name')
+
+        self.assertUsesIndex(queryset, 'core_tag_user_name_idx')
+
+    def test_file_types_by_user_ordered_by_type(self):
+        """test listing a user's file_types uses the (user, type) index"""
+        queryset = File_type.objects.filter(
+            user=self.user
+        ).order_by('-type')
+
+        self.assertUsesIndex(queryset, 'core_filetype_user_type_idx')
+
+    def test_user_files_by_user_ordered_by_created_on(self):
+        """test listing a user's files uses the (user, created_on) index"""
+        queryset = User_File.objects.filter(
+            user=self.user
+        ).order_by('-created_on')
+
+        self.assertUsesIndex(queryset, 'core_userfile_user_created_idx')
+
+    def test_user_files_by_tag(self):
+        """test looking up the files of a tag uses the reverse index"""
+        tag = Tag.objects.filter(user=self.user).first()
+        queryset = User_File.tags.through.objects.filter(
+            tag=tag
+        ).values('user_file_id')
+
+        self.assertUsesIndex(queryset, 'core_userfile_tags_rev_idx')
+
+    def test_user_files_by_file_type(self):
+        """test looking up the files of a file_type uses the reverse index"""
+        file_type = File_type.objects.filter(user=self.user).first()
+        queryset = User_File.file_types.through.objects.filter(
+            file_type=file_type
+        ).values('user_file_id')
+
+        self.assertUsesIndex(queryset, 'core_userfile_ftypes_rev_idx')
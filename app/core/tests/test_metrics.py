@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.middleware import PerformanceMiddleware
+from core.models import Tag
+
+
+TAGS_URL = reverse('user_files:tag-list')
+ME_URL = reverse('user:me')
+METRICS_URL = reverse('metrics')
+
+
+class RecordingSink:
+    """sink keeping the measures it records"""
+    measures = []
+
+    def record(self, measure):
+        self.measures.append(measure)
+
+
+@override_settings(PERF_METRICS_SINKS=[
+    'core.metrics.HistogramSink', 'core.tests.test_metrics.RecordingSink'
+])
+class PerformanceMiddlewareTests(TestCase):
+    """Test the measures of the API requests"""
+
+    def setUp(self):
+        RecordingSink.measures = []
+        metrics.histograms.clear()
+        self.addCleanup(metrics.histograms.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_request_measured(self):
+        """test the queries, serializer time and size of a request"""
+        Tag.objects.create(user=self.user, name='kitchen')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL)
+
+        measure, = RecordingSink.measures
+        self.assertEqual(measure.view, 'user_files:tag-list')
+        self.assertEqual(measure.method, 'GET')
+        self.assertEqual(measure.status, 200)
+        self.assertEqual(measure.queries, len(queries))
+        self.assertGreater(measure.db_seconds, 0)
+        self.assertGreater(measure.serializer_seconds, 0)
+        self.assertGreaterEqual(measure.seconds, measure.db_seconds)
+        self.assertEqual(measure.size, len(res.content))
+
+    def test_other_namespaces_not_measured(self):
+        """test requests outside PERF_METRICS_NAMESPACES are not recorded"""
+        self.client.get('/admin/login/')
+
+        self.assertEqual(RecordingSink.measures, [])
+
+    def test_metrics_endpoint(self):
+        """test the histograms are served in the Prometheus format"""
+        self.client.get(ME_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        body = res.content.decode()
+        self.assertIn(
+            'api_request_duration_seconds_count{view="user:me",'
+            'method="GET",status="200"} 1', body
+        )
+        self.assertIn('auth_token_cache_hits', body)
+        self.assertIn('auth_login_limiter_blocked', body)
+
+    def test_metrics_endpoint_internal_only(self):
+        """test /metrics refuses addresses not in INTERNAL_IPS"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.5')
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_log_sink(self):
+        """test the log sink writes a line per request"""
+        with override_settings(PERF_METRICS_SINKS=['core.metrics.LogSink']):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            with self.assertLogs('core.metrics', 'INFO') as logs:
+                client.get(ME_URL)
+
+        self.assertIn('view=user:me method=GET status=200', logs.output[0])
+
+    @override_settings(PERF_METRICS_SINKS=[], PERF_PROFILE_DIR=None)
+    def test_disabled(self):
+        """test the middleware leaves the chain when it has nothing to do"""
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: None)
+
+
+class HistogramsTests(TestCase):
+    """Test the aggregation of the measures"""
+
+    def test_buckets_cumulative(self):
+        """test a request is counted in every bucket above its duration"""
+        histograms = metrics.Histograms(buckets=(0.01, 0.1))
+        measure = metrics.Measure()
+        measure.view, measure.method, measure.status = 'user:me', 'GET', 200
+        measure.seconds = 0.05
+        histograms.observe(measure)
+
+        lines = histograms.render()
+
+        labels = 'view="user:me",method="GET",status="200"'
+        self.assertIn(f'api_request_duration_seconds_bucket{{{labels},'
+                      f'le="0.01"}} 0', lines)
+        self.assertIn(f'api_request_duration_seconds_bucket{{{labels},'
+                      f'le="0.1"}} 1', lines)
+        self.assertIn(f'api_request_duration_seconds_bucket{{{labels},'
+                      f'le="+Inf"}} 1', lines)
+
+
+class ProfileTests(TestCase):
+    """Test staff users can profile their requests"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def get_me(self):
+        """request the user with a token asking for a profile"""
+        with override_settings(PERF_PROFILE_DIR=self.profile_dir):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            return client.get(ME_URL, HTTP_X_PROFILE='1')
+
+    def test_staff_request_profiled(self):
+        """test the profile of a staff request is written"""
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.get_me()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.profile_dir, res['X-Profile']))
+        )
+
+    def test_other_users_not_profiled(self):
+        """test the header is ignored for users who are not staff"""
+        res = self.get_me()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.has_header('X-Profile'))
+        self.assertEqual(os.listdir(self.profile_dir), [])
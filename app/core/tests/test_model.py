@@ -1,6 +1,9 @@
+import hashlib
+import tempfile
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -85,3 +88,54 @@ class ModelTests(TestCase):
 
         exp_path = f'uploads/user_files/{uuid}.dxf'
         self.assertEqual(file_path, exp_path)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BlobTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+
+    def sample_file(self, content, name='drawing.dxf'):
+        """create a user_file storing content"""
+        user_file = models.User_File.objects.create(
+            user=self.user, title='file'
+        )
+        user_file.file.save(name, ContentFile(content))
+
+        return user_file
+
+    def test_identical_content_stored_once(self):
+        """test user_files with the same content share one blob"""
+        user_file1 = self.sample_file(b'same content')
+        user_file2 = self.sample_file(b'same content')
+
+        self.assertEqual(user_file1.file.name, user_file2.file.name)
+        blob = models.Blob.objects.get(name=user_file1.file.name)
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.size, len(b'same content'))
+        self.assertEqual(
+            blob.digest, hashlib.sha256(b'same content').hexdigest()
+        )
+
+    def test_delete_user_file_releases_blob(self):
+        """test deleting a user_file drops the refcount of its blob"""
+        user_file1 = self.sample_file(b'same content')
+        self.sample_file(b'same content')
+
+        user_file1.delete()
+
+        blob = models.Blob.objects.get()
+        self.assertEqual(blob.refcount, 1)
+
+    def test_replace_file_moves_reference(self):
+        """test replacing the file of a user_file moves its reference"""
+        user_file = self.sample_file(b'first content')
+        first = user_file.file.name
+
+        user_file.file.save('drawing.dxf', ContentFile(b'second content'))
+
+        self.assertEqual(models.Blob.objects.get(name=first).refcount, 0)
+        self.assertEqual(
+            models.Blob.objects.get(name=user_file.file.name).refcount, 1
+        )
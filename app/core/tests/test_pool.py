@@ -0,0 +1,216 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.db.backends.sqlite3 import base as sqlite3
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PooledDatabaseWrapperMixin, \
+    PoolTimeout
+
+
+class FakeConnection:
+    """DB-API connection recording whether it was closed"""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the pool of database connections"""
+
+    def test_connection_reused(self):
+        """test a returned connection is handed out again"""
+        pool = ConnectionPool(size=2)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+
+        second = pool.acquire(FakeConnection)
+
+        self.assertIs(second, first)
+        self.assertEqual(pool.stats()['created'], 1)
+        self.assertEqual(pool.stats()['acquired'], 2)
+
+    def test_overflow_closed_on_release(self):
+        """test connections beyond the size are closed once returned"""
+        pool = ConnectionPool(size=1, max_overflow=1)
+        first = pool.acquire(FakeConnection)
+        second = pool.acquire(FakeConnection)
+
+        pool.release(first)
+        pool.release(second)
+
+        self.assertFalse(first.closed)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['opened'], 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_full_pool_times_out(self):
+        """test acquiring from a full pool fails after the timeout"""
+        pool = ConnectionPool(size=1, timeout=0.05)
+        pool.acquire(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_wait_for_released_connection(self):
+        """test a request waits for a connection and the wait is counted"""
+        pool = ConnectionPool(size=1, timeout=5)
+        first = pool.acquire(FakeConnection)
+        timer = threading.Timer(0.05, pool.release, [first])
+        timer.start()
+
+        second = pool.acquire(FakeConnection)
+        timer.join()
+
+        self.assertIs(second, first)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreaterEqual(stats['max_wait_seconds'], 0.04)
+        self.assertGreaterEqual(stats['wait_seconds'], 0.04)
+
+    def test_broken_connection_replaced(self):
+        """test an idle connection failing its check is replaced"""
+        def check(connection):
+            raise OSError('server closed the connection')
+
+        pool = ConnectionPool(size=1, check_interval=0, check=check)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+
+        second = pool.acquire(FakeConnection)
+
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+        self.assertEqual(pool.stats()['opened'], 1)
+
+    def test_old_connection_recycled(self):
+        """test a connection older than recycle is not reused"""
+        pool = ConnectionPool(size=1, recycle=0)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['opened'], 0)
+
+    def test_failed_connect_frees_slot(self):
+        """test a connection that cannot be opened does not fill the pool"""
+        def connect():
+            raise OSError('refused')
+
+        pool = ConnectionPool(size=1, timeout=0.05)
+        with self.assertRaises(OSError):
+            pool.acquire(connect)
+
+        self.assertIsInstance(pool.acquire(FakeConnection), FakeConnection)
+
+
+class PooledSQLiteWrapper(PooledDatabaseWrapperMixin,
+                          sqlite3.DatabaseWrapper):
+    """SQLite backend with pooled connections"""
+
+
+class PooledWrapperTests(SimpleTestCase):
+    """Test database wrappers reuse pooled connections"""
+
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.settings_dict = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+            'ATOMIC_REQUESTS': False,
+            'AUTOCOMMIT': True,
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {},
+            'TIME_ZONE': None,
+            'USER': '',
+            'PASSWORD': '',
+            'HOST': '',
+            'PORT': '',
+            'TEST': {},
+            'POOL': {'SIZE': 1, 'MAX_OVERFLOW': 0, 'TIMEOUT': 1},
+        }
+
+    def query(self, wrapper):
+        """run a query like a request would"""
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_connection_reused_across_requests(self):
+        """test the connection closed at the end of a request goes back to
+        the pool and serves the next request of any thread"""
+        wrapper = PooledSQLiteWrapper(self.settings_dict, 'pooled')
+        self.query(wrapper)
+        first = wrapper.connection
+        # what close_old_connections does at the end of a request
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNone(wrapper.connection)
+
+        connections = []
+
+        def request():
+            other = PooledSQLiteWrapper(self.settings_dict, 'pooled')
+            self.query(other)
+            connections.append(other.connection)
+            other.close_if_unusable_or_obsolete()
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(connections, [first])
+        stats = wrapper.pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['acquired'], 2)
+        self.assertEqual(stats['idle'], 1)
+        wrapper.pool.close()
+
+    def test_transaction_rolled_back_on_release(self):
+        """test a transaction left open is not seen by the next request"""
+        wrapper = PooledSQLiteWrapper(self.settings_dict, 'pooled')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id integer)')
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute('INSERT INTO item VALUES (1)')
+        wrapper.close()
+
+        wrapper = PooledSQLiteWrapper(self.settings_dict, 'pooled')
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM item')
+            self.assertEqual(cursor.fetchone(), (0,))
+        wrapper.close()
+        wrapper.pool.close()
+
+    def test_pool_wait_counted(self):
+        """test a request waiting for the connection of another one"""
+        acquired = threading.Event()
+
+        def request():
+            wrapper = PooledSQLiteWrapper(self.settings_dict, 'pooled')
+            self.query(wrapper)
+            acquired.set()
+            time.sleep(0.05)
+            wrapper.close()
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        acquired.wait()
+        other = PooledSQLiteWrapper(self.settings_dict, 'pooled')
+        start = time.monotonic()
+        self.query(other)
+        thread.join()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertEqual(other.pool.stats()['waits'], 1)
+        other.close()
+        other.pool.close()
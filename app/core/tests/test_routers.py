@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, UserUsage
+
+
+TAGS_URL = reverse('user_files:tag-list')
+USAGE_URL = reverse('user:usage')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    """Test safe requests read from the replica database
+
+    the replica is a second database holding other rows than the primary,
+    which tells where each read went
+    """
+    multi_db = True
+
+    def setUp(self):
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        # rows are copied to the replica without sending signals, like
+        # replication does
+        get_user_model().objects.using('replica').bulk_create(
+            [get_user_model().objects.get(id=self.user.id)]
+        )
+        Tag.objects.create(user=self.user, name='primary')
+        Tag.objects.using('replica').bulk_create(
+            [Tag(user_id=self.user.id, name='replica')]
+        )
+
+    def tag_names(self):
+        """return the names of the listed tags"""
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [tag['name'] for tag in res.data['results']]
+
+    def test_list_reads_from_replica(self):
+        """test a list request reads from the replica"""
+        self.assertEqual(self.tag_names(), ['replica'])
+
+    def test_writes_go_to_primary(self):
+        """test a create request writes to the primary only"""
+        res = self.client.post(TAGS_URL, {'name': 'kitchen'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Tag.objects.filter(name='kitchen').exists())
+        self.assertFalse(
+            Tag.objects.using('replica').filter(name='kitchen').exists()
+        )
+
+    def test_write_pins_user_to_primary(self):
+        """test the user who wrote reads their writes from the primary"""
+        self.client.post(TAGS_URL, {'name': 'kitchen'})
+
+        self.assertEqual(self.tag_names(), ['primary', 'kitchen'])
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_write_without_pin(self):
+        """test no pin is kept when REPLICA_PIN_SECONDS is 0"""
+        self.client.post(TAGS_URL, {'name': 'kitchen'})
+
+        self.assertEqual(self.tag_names(), ['replica'])
+
+    def test_other_users_not_pinned(self):
+        """test a write only pins the user who made it"""
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+        client.post(TAGS_URL, {'name': 'kitchen'})
+
+        self.assertEqual(self.tag_names(), ['replica'])
+
+    def test_view_without_actions_reads_from_replica(self):
+        """test the usage counters are read from the replica"""
+        UserUsage.objects.using('replica').bulk_create(
+            [UserUsage(user_id=self.user.id, file_count=7)]
+        )
+
+        res = self.client.get(USAGE_URL)
+
+        self.assertEqual(res.data['file_count'], 7)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """test every read goes to the primary without replicas"""
+        self.assertEqual(self.tag_names(), ['primary'])
+
+    def test_reads_outside_requests(self):
+        """test reads outside of replica requests go to the primary"""
+        self.tag_names()
+
+        self.assertEqual(
+            list(Tag.objects.values_list('name', flat=True)), ['primary']
+        )
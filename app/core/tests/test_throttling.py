@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from core.throttling import LoginLimiter
+
+
+@override_settings(
+    LOGIN_FAILURES_PER_EMAIL=2, LOGIN_FAILURES_PER_ADDRESS=4,
+    LOGIN_BACKOFF=1, LOGIN_BACKOFF_MAX=5, LOGIN_FAILURE_WINDOW=60,
+    LOGIN_LIMITER_SIZE=10
+)
+@patch('core.throttling.time.monotonic')
+class LoginLimiterTests(SimpleTestCase):
+    """Test the backoff of failed logins"""
+
+    def setUp(self):
+        self.limiter = LoginLimiter()
+
+    def fail(self, key, times):
+        for _ in range(times):
+            self.limiter.failed([key])
+
+    def test_backoff_doubles(self, monotonic):
+        """Test the wait doubles with every failure up to the maximum"""
+        monotonic.return_value = 100
+        waits = []
+        for _ in range(5):
+            self.limiter.failed(['email:test@pashadev.com'])
+            waits.append(self.limiter.wait(['email:test@pashadev.com']))
+
+        self.assertEqual(waits, [0, 1, 2, 4, 5])
+        self.assertEqual(self.limiter.stats()['blocked'], 4)
+
+    def test_address_limit(self, monotonic):
+        """Test addresses are allowed more failures than emails"""
+        monotonic.return_value = 100
+        self.fail('address:10.0.0.5', 3)
+
+        self.assertEqual(self.limiter.wait(['address:10.0.0.5']), 0)
+        self.fail('address:10.0.0.5', 1)
+        self.assertEqual(self.limiter.wait(['address:10.0.0.5']), 1)
+
+    def test_failures_forgotten(self, monotonic):
+        """Test failures older than the window are forgotten"""
+        monotonic.return_value = 100
+        self.fail('email:test@pashadev.com', 2)
+        monotonic.return_value = 161
+
+        self.assertEqual(self.limiter.wait(['email:test@pashadev.com']), 0)
+        self.limiter.failed(['email:test@pashadev.com'])
+        self.assertEqual(self.limiter.wait(['email:test@pashadev.com']), 0)
+
+    def test_size_bounded(self, monotonic):
+        """Test the least recently failed keys are evicted"""
+        monotonic.return_value = 100
+        self.fail('email:first@pashadev.com', 2)
+        for index in range(10):
+            self.limiter.failed([f'email:test{index}@pashadev.com'])
+
+        self.assertEqual(self.limiter.stats()['size'], 10)
+        self.assertEqual(self.limiter.wait(['email:first@pashadev.com']), 0)
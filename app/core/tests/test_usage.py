@@ -0,0 +1,103 @@
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core import usage
+from core.models import Tag, File_type, User_File, UserUsage
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UsageCounterTests(TestCase):
+    """Test the usage counters follow the user_files"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='room')
+        self.file_type = File_type.objects.create(user=self.user, type='DWG')
+        self.user_file = User_File.objects.create(
+            user=self.user, title='plan'
+        )
+
+    def assertCounts(self, tag, file_type, files, size):
+        """assert the stored counters and that they match the data"""
+        self.tag.refresh_from_db()
+        self.file_type.refresh_from_db()
+        user_usage = UserUsage.objects.get(user=self.user)
+        self.assertEqual(self.tag.usage_count, tag)
+        self.assertEqual(self.file_type.usage_count, file_type)
+        self.assertEqual(user_usage.file_count, files)
+        self.assertEqual(user_usage.byte_count, size)
+        self.assertEqual(list(usage.drift()), [])
+
+    def test_assign_and_remove(self):
+        """test adding and removing tags from both sides"""
+        self.user_file.tags.add(self.tag)
+        self.user_file.file_types.add(self.file_type)
+        other = User_File.objects.create(user=self.user, title='house')
+        self.tag.user_file_set.add(other, self.user_file)
+        self.assertCounts(tag=2, file_type=1, files=2, size=0)
+
+        # removing an unassigned tag changes nothing
+        other.tags.remove(self.tag, Tag.objects.create(user=self.user))
+        self.user_file.file_types.clear()
+        self.assertCounts(tag=1, file_type=0, files=2, size=0)
+
+        self.tag.user_file_set.clear()
+        self.assertCounts(tag=0, file_type=0, files=2, size=0)
+
+    def test_delete_user_file(self):
+        """test a deleted user_file is uncounted from its tags"""
+        self.user_file.tags.add(self.tag)
+        self.user_file.file_types.add(self.file_type)
+
+        self.user_file.delete()
+
+        self.assertCounts(tag=0, file_type=0, files=0, size=0)
+
+    def test_file_bytes(self):
+        """test the bytes of saved, replaced and deleted files"""
+        self.user_file.file.save('plan.dwg', ContentFile(b'x' * 100))
+        self.assertCounts(tag=0, file_type=0, files=1, size=100)
+
+        self.user_file.file.save('plan.dwg', ContentFile(b'y' * 30))
+        User_File.objects.create(user=self.user, title='copy').file.save(
+            'copy.dwg', ContentFile(b'y' * 30)
+        )
+        self.assertCounts(tag=0, file_type=0, files=2, size=60)
+
+        self.user_file.delete()
+        self.assertCounts(tag=0, file_type=0, files=1, size=30)
+
+    def test_rebuild_usage_command(self):
+        """test the command reports drifted counters and rebuilds them"""
+        self.user_file.tags.add(self.tag)
+        Tag.objects.filter(id=self.tag.id).update(usage_count=5)
+        UserUsage.objects.filter(user=self.user).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_usage', check=True, stdout=StringIO())
+        call_command('rebuild_usage', stdout=StringIO())
+
+        self.assertCounts(tag=1, file_type=0, files=1, size=0)
+
+    def test_rebuild_measures_files(self):
+        """test files stored without their size are measured again"""
+        self.user_file.file.save('plan.dwg', ContentFile(b'x' * 100))
+        User_File.objects.filter(id=self.user_file.id).update(file_size=0)
+        UserUsage.objects.filter(user=self.user).update(byte_count=0)
+
+        self.assertIn(
+            (f'user_file {self.user_file.id} file_size', 0, 100),
+            list(usage.drift())
+        )
+        call_command('rebuild_usage', stdout=StringIO())
+
+        self.assertCounts(tag=0, file_type=0, files=1, size=100)
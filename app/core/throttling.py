@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+def failure_limit(key):
+    """return the failures allowed to a key before it is blocked"""
+    if key.startswith('address:'):
+        return settings.LOGIN_FAILURES_PER_ADDRESS
+
+    return settings.LOGIN_FAILURES_PER_EMAIL
+
+
+class LoginLimiter:
+    """bounded LRU of the failed logins of emails from a client address
+    and of client addresses
+
+    once a key failed as many times as its limit, its logins are refused
+    until a backoff doubling with every further failure has passed, so
+    floods of wrong passwords are answered without hashing them; the
+    failures are counted by each server process, a flood spread across
+    processes is slowed down by each of them
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key: (failures, time of the last failure, blocked until)
+        self._entries = OrderedDict()
+        self.blocked = 0
+
+    def _entry(self, key, now):
+        """return the live entry of key, dropping it once forgotten"""
+        entry = self._entries.get(key)
+        if entry is not None and (
+                now - entry[1] > settings.LOGIN_FAILURE_WINDOW and
+                now >= entry[2]):
+            del self._entries[key]
+            entry = None
+
+        return entry
+
+    def wait(self, keys):
+        """return the seconds before keys may log in again, 0 when they
+        may now"""
+        now = time.monotonic()
+        with self._lock:
+            seconds = max(
+                [entry[2] - now for entry in (
+                    self._entry(key, now) for key in keys
+                ) if entry is not None] + [0]
+            )
+            if seconds > 0:
+                self.blocked += 1
+
+        return seconds
+
+    def failed(self, keys):
+        """count a failed login of keys"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entry(key, now)
+                failures = entry[0] + 1 if entry else 1
+                blocked_until = now
+                excess = failures - failure_limit(key)
+                if excess >= 0:
+                    blocked_until += min(
+                        settings.LOGIN_BACKOFF * 2 ** excess,
+                        settings.LOGIN_BACKOFF_MAX
+                    )
+                self._entries[key] = (failures, now, blocked_until)
+                self._entries.move_to_end(key)
+            while len(self._entries) > settings.LOGIN_LIMITER_SIZE:
+                self._entries.popitem(last=False)
+
+    def succeeded(self, keys):
+        """forget the failures of keys"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """forget every failure and reset the counter"""
+        with self._lock:
+            self._entries.clear()
+            self.blocked = 0
+
+    def stats(self):
+        """return the refused logins and the size of the LRU"""
+        with self._lock:
+            return {'blocked': self.blocked, 'size': len(self._entries)}
+
+
+login_limiter = LoginLimiter()
+
+
+def client_address(request):
+    """return the address of the client of request, X-Forwarded-For is
+    only trusted behind the NUM_PROXIES of the REST_FRAMEWORK settings"""
+    return BaseThrottle().get_ident(request) if request is not None else ''
+
+
+def email_key(email, request):
+    """return the limiter key of the logins of an email from the client of
+    request; keyed by client, failures from elsewhere cannot lock the
+    owner of the email out"""
+    return f'email:{str(email).strip().lower()}|{client_address(request)}'
+
+
+def address_key(request):
+    """return the limiter key of the logins from the client of request"""
+    return f'address:{client_address(request)}'
+
+
+class LoginThrottle(BaseThrottle):
+    """refuse the logins of emails and addresses backed off by the
+    login_limiter before their password is checked"""
+
+    def allow_request(self, request, view):
+        keys = [address_key(request)]
+        email = request.data.get('email') if hasattr(
+            request.data, 'get'
+        ) else None
+        if email:
+            keys.append(email_key(email, request))
+        self.seconds = login_limiter.wait(keys)
+
+        return self.seconds <= 0
+
+    def wait(self):
+        return self.seconds
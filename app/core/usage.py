@@ -0,0 +1,188 @@
+"""Denormalized usage counters
+
+Tag.usage_count and File_type.usage_count count the user_files having
+them, UserUsage the user_files of a user and the bytes of their files.
+The signals in core.signals apply every change as an `UPDATE ... SET
+count = count + n` in the transaction making it; writes bypassing the
+signals recount the rows they touched and `rebuild_usage` recomputes or
+checks every counter, measuring User_File.file_size again from storage.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import Tag, File_type, User_File, UserUsage
+
+
+# related model counted by usage_count and the column of the through table
+# pointing to it
+RELATIONS = {
+    User_File.tags.through: (Tag, 'tag_id'),
+    User_File.file_types.through: (File_type, 'file_type_id'),
+}
+
+
+def add_user_usage(user_id, files=0, size=0):
+    """add files and size bytes to the usage of a user"""
+    if files or size:
+        UserUsage.objects.filter(user_id=user_id).update(
+            file_count=F('file_count') + files,
+            byte_count=F('byte_count') + size,
+        )
+
+
+def add_usage(model, ids, delta):
+    """add delta to the usage_count of the tags or file_types of ids"""
+    ids = list(ids)
+    if ids and delta:
+        model.objects.filter(id__in=ids).update(
+            usage_count=F('usage_count') + delta
+        )
+
+
+def related_ids(through, user_file_id, ids=None):
+    """return the ids of the tags or file_types of a user_file, only the
+    ones among ids when given"""
+    model, column = RELATIONS[through]
+    links = through.objects.filter(user_file_id=user_file_id)
+    if ids is not None:
+        links = links.filter(**{f'{column}__in': ids})
+
+    return list(links.values_list(column, flat=True))
+
+
+def user_file_count(through, target_id, user_file_ids=None):
+    """return the number of user_files linked to a tag or file_type, only
+    the ones among user_file_ids when given"""
+    model, column = RELATIONS[through]
+    links = through.objects.filter(**{column: target_id})
+    if user_file_ids is not None:
+        links = links.filter(user_file_id__in=user_file_ids)
+
+    return links.count()
+
+
+def usage_count_expression(model):
+    """return the expression computing the usage_count of model rows"""
+    through, column = next(
+        (through, column) for through, (target, column) in RELATIONS.items()
+        if target is model
+    )
+
+    return Coalesce(Subquery(
+        through.objects.filter(**{column: OuterRef('pk')}).order_by()
+        .values(column).annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def user_usage_expressions():
+    """return the expressions computing the counters of UserUsage rows"""
+    files = User_File.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by().values('user_id')
+
+    return {
+        'file_count': Coalesce(Subquery(
+            files.annotate(count=Count('id')).values('count')
+        ), 0),
+        'byte_count': Coalesce(Subquery(
+            files.annotate(total=Sum('file_size')).values('total')
+        ), 0),
+    }
+
+
+def recount(model, ids):
+    """recompute the usage_count of the tags or file_types of ids"""
+    ids = list(ids)
+    if ids:
+        model.objects.filter(id__in=ids).update(
+            usage_count=usage_count_expression(model)
+        )
+
+
+def recount_users(user_ids):
+    """recompute the UserUsage of the users of user_ids"""
+    user_ids = list(user_ids)
+    if user_ids:
+        UserUsage.objects.filter(user_id__in=user_ids).update(
+            **user_usage_expressions()
+        )
+
+
+def user_usage(user):
+    """return the UserUsage of user, counted now when it is missing"""
+    usage = UserUsage.objects.filter(user=user).first()
+    if usage is not None:
+        return usage
+
+    usage, created = UserUsage.objects.get_or_create(user=user)
+    if created:
+        recount_users([user.pk])
+        usage.refresh_from_db()
+
+    return usage
+
+
+def stored_size(name):
+    """return the size of a stored user_file file, 0 when it is missing"""
+    try:
+        return User_File._meta.get_field('file').storage.size(name)
+    except OSError:
+        return 0
+
+
+def file_sizes():
+    """yield the id, file_size and size in storage of the user_files
+    having a file"""
+    user_files = User_File.objects.exclude(file='').exclude(
+        file__isnull=True
+    ).values_list('id', 'file', 'file_size').order_by('id')
+    for pk, name, size in user_files.iterator():
+        yield pk, size, stored_size(name)
+
+
+def rebuild():
+    """create the missing UserUsage rows, measure the files again and
+    recompute every counter"""
+    remeasured = [(pk, actual) for pk, size, actual in file_sizes()
+                  if size != actual]
+    for pk, actual in remeasured:
+        User_File.objects.filter(pk=pk).update(file_size=actual)
+    UserUsage.objects.bulk_create(
+        UserUsage(user_id=user_id)
+        for user_id in get_user_model().objects.filter(
+            usage__isnull=True
+        ).values_list('id', flat=True)
+    )
+    for model in (Tag, File_type):
+        model.objects.update(usage_count=usage_count_expression(model))
+    UserUsage.objects.update(**user_usage_expressions())
+
+
+def drift():
+    """yield a (description, stored, actual) tuple for every counter that
+    does not match the data"""
+    for pk, size, actual in file_sizes():
+        if size != actual:
+            yield f'user_file {pk} file_size', size, actual
+    for model in (Tag, File_type):
+        for obj in model.objects.annotate(
+            actual=usage_count_expression(model)
+        ).exclude(usage_count=F('actual')).order_by('id'):
+            yield (f'{model.__name__} {obj.pk} usage_count',
+                   obj.usage_count, obj.actual)
+
+    usages = UserUsage.objects.annotate(**{
+        f'actual_{name}': expression
+        for name, expression in user_usage_expressions().items()
+    }).order_by('user_id')
+    for usage in usages:
+        for name in ('file_count', 'byte_count'):
+            stored = getattr(usage, name)
+            actual = getattr(usage, f'actual_{name}')
+            if stored != actual:
+                yield f'user {usage.user_id} {name}', stored, actual
+    for user_id in get_user_model().objects.filter(
+        usage__isnull=True
+    ).values_list('id', flat=True):
+        yield f'user {user_id} usage', None, 'missing'
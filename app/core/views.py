@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core import metrics as core_metrics
+
+
+def metrics(request):
+    """serve the request histograms and the token cache and connection
+    pool stats of this process to Prometheus, from INTERNAL_IPS only"""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        core_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,58 @@
+"""
+gunicorn configuration of the production server, read from the working
+directory by `gunicorn` and overridden by the environment.
+
+Workers are uvicorn workers serving app.asgi by default, each running the
+views in ASGI_THREADS threads; GUNICORN_WORKER_CLASS=gthread serves
+app.wsgi with GUNICORN_THREADS threads per worker instead.
+"""
+
+import multiprocessing
+import os
+
+import django
+from django import db
+from django.core import management
+
+
+ASGI_WORKER_CLASS = 'uvicorn.workers.UvicornWorker'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', ASGI_WORKER_CLASS)
+wsgi_app = ('app.asgi:application' if worker_class == ASGI_WORKER_CLASS
+            else 'app.wsgi:application')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# the application is imported once in the master, workers are forked with
+# it loaded which saves memory and startup time; the thread and process
+# pools of user_files.workers are created on first use in each worker
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# workers are replaced after this many requests, bounding leaks
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def on_starting(server):
+    """refuse to start when the system checks report errors, such as a
+    cache the workers must share being local to each of them"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup(set_prefix=False)
+    management.call_command('check')
+
+
+def post_fork(server, worker):
+    """drop the database connections the master may have opened while
+    loading the application, a socket must not be shared by processes"""
+    db.connections.close_all()
@@ -2,6 +2,9 @@ from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
+from core.models import UserUsage
+from core.throttling import login_limiter, email_key, address_key
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the users object"""
@@ -39,15 +42,29 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validate and authenticate the user"""
         email = attrs.get('email')
         password = attrs.get('password')
+        request = self.context.get('request')
 
         user = authenticate(
-            request=self.context.get('request'),
+            request=request,
             username=email,
             password=password
         )
         if not user:
+            login_limiter.failed(
+                [email_key(email, request), address_key(request)]
+            )
             msg = _('Unable to authenticate with provided credentials')
             raise serializers.ValidationError(msg, code='authorization')
+        login_limiter.succeeded([email_key(email, request)])
 
         attrs['user'] = user
         return attrs
+
+
+class UserUsageSerializer(serializers.ModelSerializer):
+    """Serializer for the usage counters of a user"""
+
+    class Meta:
+        model = UserUsage
+        fields = ('file_count', 'byte_count')
+        read_only_fields = ('file_count', 'byte_count')
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import usage
+from core.models import User_File
+from core.testing import QueryBudgetMixin
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the query count of every user endpoint"""
+    namespace = 'user'
+    query_budgets = {
+        ('create', 'POST'): 3,
+        ('token', 'POST'): 5,
+        ('me', 'GET'): 0,
+        ('me', 'PUT'): 4,
+        ('me', 'PATCH'): 4,
+        ('usage', 'GET'): 1,
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.seeded = 0
+
+    def grow(self, size):
+        """give the user size user_files and other users as many"""
+        new = range(self.seeded, size)
+        User_File.objects.bulk_create(
+            User_File(user=self.user, title=f'file {i}') for i in new
+        )
+        get_user_model().objects.bulk_create(
+            get_user_model()(email=f'user{i}@pashadev.com') for i in new
+        )
+        usage.recount_users([self.user.id])
+        self.seeded = size
+
+    def endpoint_request(self, name, method):
+        url = reverse(f'user:{name}')
+        if name == 'create':
+            return lambda: self.client.post(url, {
+                'email': 'new@pashadev.com', 'password': 'testpass',
+                'name': 'new'
+            })
+        if name == 'token':
+            return lambda: APIClient().post(url, {
+                'email': 'test@pashadev.com', 'password': 'testpass'
+            })
+        if method == 'GET':
+            return lambda: self.client.get(url)
+
+        return lambda: getattr(self.client, method.lower())(url, {
+            'email': 'test@pashadev.com', 'password': 'testpass',
+            'name': 'renamed'
+        })
@@ -1,13 +1,20 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.authentication import token_cache
+from core.models import User_File
+from core.throttling import login_limiter
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+USAGE_URL = reverse('user:usage')
 
 
 def create_user(**params):
@@ -20,6 +27,8 @@ class PublicUserApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        login_limiter.clear()
+        self.addCleanup(login_limiter.clear)
 
     def test_create_valid_user_success(self):
         """Test creating using with a valid payload is successful"""
@@ -88,6 +97,86 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_token_reused(self):
+        """Test that the existing token is returned in a single query"""
+        payload = {'email': 'test@londonappdev.com', 'password': 'testpass'}
+        create_user(**payload)
+        first = self.client.post(TOKEN_URL, payload)
+        token_cache.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.data['token'], first.data['token'])
+        self.assertEqual(Token.objects.count(), 1)
+        self.assertIsNotNone(token_cache.get(res.data['token']))
+
+    def test_create_token_rehashes_password(self):
+        """Test that a password of an older hasher is rehashed on login"""
+        user = create_user(email='test@londonappdev.com')
+        user.password = make_password('testpass', hasher='pbkdf2_sha256')
+        user.save()
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@londonappdev.com', 'password': 'testpass'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password('testpass'))
+
+    @override_settings(LOGIN_FAILURES_PER_EMAIL=2)
+    def test_create_token_backed_off(self):
+        """Test that logins of an email failing too often from a client
+        are refused without checking the password, only for that client"""
+        payload = {'email': 'test@londonappdev.com', 'password': 'testpass'}
+        create_user(**payload)
+        wrong = {'email': 'test@londonappdev.com', 'password': 'wrong'}
+        for _ in range(2):
+            self.client.post(TOKEN_URL, wrong)
+
+        with self.assertNumQueries(0):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        other = self.client.post(TOKEN_URL, {
+            'email': 'other@londonappdev.com', 'password': 'testpass'
+        })
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+        elsewhere = self.client.post(
+            TOKEN_URL, payload, REMOTE_ADDR='10.0.0.5'
+        )
+        self.assertEqual(elsewhere.status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_FAILURES_PER_ADDRESS=2)
+    def test_create_token_address_backed_off(self):
+        """Test that a client failing logins of many emails is refused"""
+        for index in range(2):
+            self.client.post(TOKEN_URL, {
+                'email': f'test{index}@londonappdev.com', 'password': 'wrong'
+            })
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@londonappdev.com', 'password': 'wrong'
+        }, HTTP_X_FORWARDED_FOR='10.0.0.5')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(LOGIN_FAILURES_PER_EMAIL=2)
+    def test_create_token_success_resets_failures(self):
+        """Test that a successful login forgets the failures of the email"""
+        payload = {'email': 'test@londonappdev.com', 'password': 'testpass'}
+        create_user(**payload)
+        wrong = {'email': 'test@londonappdev.com', 'password': 'wrong'}
+        self.client.post(TOKEN_URL, wrong)
+        self.client.post(TOKEN_URL, payload)
+
+        res = self.client.post(TOKEN_URL, wrong)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_user_unauthorized(self):
         """Test that authentication required for users"""
         res = self.client.get(ME_URL)
@@ -133,3 +222,12 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_usage(self):
+        """Test retrieving the files and bytes stored by the user"""
+        User_File.objects.create(user=self.user, title='plan')
+
+        res = self.client.get(USAGE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'file_count': 1, 'byte_count': 0})
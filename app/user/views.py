@@ -1,12 +1,23 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework import generics, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+from core import usage
+from core.authentication import CachedTokenAuthentication, snapshot, \
+    token_cache
+from core.metrics import SerializerTimingMixin
+from core.routers import ReplicaReadMixin
+from core.throttling import LoginThrottle
+from user.serializers import UserSerializer, AuthTokenSerializer, \
+    UserUsageSerializer
 
 
 # API view is created on the basis of the serializer
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(SerializerTimingMixin, generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
 
@@ -15,13 +26,48 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for the user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginThrottle,)
 
+    def post(self, request, *args, **kwargs):
+        """return the token of the user, the existing one is reused as
+        it was fetched with the user and cached for the next requests"""
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        try:
+            token = user.auth_token
+        except ObjectDoesNotExist:
+            token = Token.objects.get_or_create(user=user)[0]
+        token_cache.set(token.key, (snapshot(user), snapshot(token)))
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+        return Response({'token': token.key})
+
+
+class ManageUserView(SerializerTimingMixin,
+                     generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_object(self):
+        """return the user, reloaded for updates as the authenticated one
+        may come from the token cache of this process and be stale"""
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+
+class UserUsageView(SerializerTimingMixin,
+                    ReplicaReadMixin,
+                    generics.RetrieveAPIView):
+    """Show the files and bytes stored by the authenticated user"""
+    serializer_class = UserUsageSerializer
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        return usage.user_usage(self.request.user)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UserFilesConfig(AppConfig):
     name = 'user_files'
+
+    def ready(self):
+        from user_files import signals  # noqa
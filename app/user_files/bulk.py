@@ -0,0 +1,343 @@
+from itertools import islice
+
+from django.db import connections, router, transaction
+from django.db.models import Case, F, Value, When
+
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core import usage
+from core.models import User_File
+from user_files import search
+from user_files.cache import invalidate_user
+
+
+MAX_ITEMS = 10000
+# rows handed to bulk_create at a time, which splits them further on
+# backends limiting query parameters, and ids looked up per statement
+BATCH_SIZE = 5000
+NOT_FOUND = {'detail': 'Not found.'}
+
+
+def batches(items, size):
+    """yield lists of up to size items"""
+    items = iter(items)
+    batch = list(islice(items, size))
+    while batch:
+        yield batch
+        batch = list(islice(items, size))
+
+
+def batch_size(model, params_per_item):
+    """return how many items fit in a statement on the database of model"""
+    limit = connections[router.db_for_write(model)].features.max_query_params
+    if limit is None:
+        return BATCH_SIZE
+
+    return max(1, min(BATCH_SIZE, limit // params_per_item))
+
+
+def existing_ids(queryset, ids):
+    """return the subset of ids found in queryset"""
+    found = set()
+    for batch in batches(sorted(ids), batch_size(queryset.model, 1)):
+        found.update(
+            queryset.filter(id__in=batch).values_list('id', flat=True)
+        )
+
+    return found
+
+
+def unique(values):
+    """return values without duplicates, in their order"""
+    return list(dict.fromkeys(values))
+
+
+def validate_items(serializer, items):
+    """run serializer on each item, return the validated data and the
+    errors by item index"""
+    valid = {}
+    errors = {}
+    for index, item in enumerate(items):
+        try:
+            valid[index] = serializer.run_validation(item)
+        except serializers.ValidationError as exc:
+            errors[index] = exc.detail
+
+    return valid, errors
+
+
+def check_related(user, valid, errors, relations):
+    """check the related ids of the validated items belong to user
+
+    each relation is looked up once for all items, items referencing
+    unknown ids move from valid to errors
+    """
+    for field, model in relations.items():
+        wanted = {pk for data in valid.values() for pk in data.get(field, ())}
+        found = existing_ids(model.objects.filter(user=user), wanted)
+        for index, data in list(valid.items()):
+            missing = [pk for pk in data.get(field, ()) if pk not in found]
+            if missing:
+                errors.setdefault(index, {})[field] = [
+                    f'Invalid pk "{pk}" - object does not exist.'
+                    for pk in missing
+                ]
+                del valid[index]
+
+
+def insert_objects(model, objs):
+    """insert objs and set their primary keys
+
+    backends not returning the ids of bulk inserts get one insert per row,
+    still within the transaction of the caller
+    """
+    connection = connections[router.db_for_write(model)]
+    if not connection.features.can_return_ids_from_bulk_insert:
+        for obj in objs:
+            obj.save(force_insert=True)
+        return
+    for batch in batches(objs, BATCH_SIZE):
+        model.objects.bulk_create(batch)
+
+
+def set_relations(model, field, values):
+    """replace the related ids of field for each {object id: ids} of values
+    with one delete and bulk inserts of the through rows, return the ids
+    of the related objects gaining or losing links"""
+    m2m = model._meta.get_field(field)
+    through = m2m.remote_field.through
+    source = through._meta.get_field(m2m.m2m_field_name()).attname
+    target = through._meta.get_field(m2m.m2m_reverse_field_name()).attname
+    changed = {pk for ids in values.values() for pk in ids}
+    for batch in batches(values, batch_size(through, 1)):
+        links = through.objects.filter(**{f'{source}__in': batch})
+        changed.update(links.values_list(target, flat=True))
+        links.delete()
+    rows = (
+        through(**{source: obj_id, target: pk})
+        for obj_id, ids in values.items()
+        for pk in unique(ids)
+    )
+    for batch in batches(rows, BATCH_SIZE):
+        through.objects.bulk_create(batch)
+
+    return changed
+
+
+def update_objects(model, updates):
+    """apply the {object id: {field: value}} of updates with one UPDATE
+    per batch setting every field with CASE WHEN id = ..."""
+    fields = unique(field for data in updates.values() for field in data)
+    if not fields:
+        return
+    size = batch_size(model, 2 * len(fields) + 1)
+    for batch in batches(updates, size):
+        model.objects.filter(id__in=batch).update(**{
+            field: Case(
+                *[
+                    When(id=obj_id, then=Value(updates[obj_id][field]))
+                    for obj_id in batch if field in updates[obj_id]
+                ],
+                default=F(field),
+                output_field=model._meta.get_field(field)
+            )
+            for field in fields
+        })
+
+
+def bulk_create(model, user, valid, relations):
+    """insert the validated items for user, return their ids by index"""
+    objs = {}
+    for index, data in valid.items():
+        attrs = {
+            name: value for name, value in data.items()
+            if name not in relations
+        }
+        objs[index] = model(user=user, **attrs)
+    insert_objects(model, list(objs.values()))
+    for field, related_model in relations.items():
+        usage.recount(related_model, set_relations(model, field, {
+            obj.id: valid[index][field]
+            for index, obj in objs.items() if field in valid[index]
+        }))
+
+    return {index: obj.id for index, obj in objs.items()}
+
+
+def bulk_update(model, valid, relations):
+    """apply the validated {index: (id, data)} partial updates"""
+    update_objects(model, {
+        obj_id: {
+            name: value for name, value in data.items()
+            if name not in relations
+        }
+        for obj_id, data in valid.values()
+    })
+    for field, related_model in relations.items():
+        usage.recount(related_model, set_relations(model, field, {
+            obj_id: data[field]
+            for obj_id, data in valid.values() if field in data
+        }))
+
+
+def item_ids(items, errors, queryset):
+    """return the {index: id} of items naming objects of queryset, items
+    without a valid or known id or repeating one go to errors"""
+    ids = {}
+    seen = set()
+    for index, item in enumerate(items):
+        pk = item.get('id') if isinstance(item, dict) else item
+        if isinstance(pk, bool) or not isinstance(pk, int):
+            errors[index] = {'id': ['A valid integer is required.']}
+        elif pk in seen:
+            errors[index] = {'id': ['This id is repeated in the request.']}
+        else:
+            ids[index] = pk
+            seen.add(pk)
+    found = existing_ids(queryset, ids.values())
+    for index, pk in list(ids.items()):
+        if pk not in found:
+            errors[index] = NOT_FOUND
+            del ids[index]
+
+    return ids
+
+
+def build_results(items, done, errors, success, data):
+    """return the per item results in the order of the request"""
+    results = []
+    for index in range(len(items)):
+        if index in errors:
+            code = status.HTTP_404_NOT_FOUND if errors[index] is NOT_FOUND \
+                else status.HTTP_400_BAD_REQUEST
+            results.append({'status': code, 'errors': errors[index]})
+        else:
+            results.append({
+                'status': success,
+                'data': data.get(done[index]),
+            })
+
+    return results
+
+
+def response_status(errors, success, count):
+    """return the status of the whole bulk request"""
+    if not errors:
+        # the response always has a body
+        return status.HTTP_200_OK if success == status.HTTP_204_NO_CONTENT \
+            else success
+    if len(errors) == count:
+        return status.HTTP_400_BAD_REQUEST
+
+    return status.HTTP_207_MULTI_STATUS
+
+
+class BulkModelMixin:
+    """create, partially update or delete many objects of the user at once
+
+    POST `bulk/` takes a list of objects, PATCH a list of objects with their
+    id and DELETE a list of ids; every item gets its own status and data or
+    errors in the response, valid items are applied even when others fail
+    """
+    # serializer validating one item, related ids are plain integers that
+    # are checked for all items at once, see check_related
+    bulk_serializer_class = None
+    # m2m fields mapped to the model of the related objects
+    bulk_relations = {}
+
+    def get_bulk_serializer(self, partial=False):
+        return self.bulk_serializer_class(
+            context=self.get_serializer_context(),
+            partial=partial
+        )
+
+    def bulk_output(self, ids):
+        """return the serialized objects of ids by id"""
+        data = {}
+        model = self.get_queryset().model
+        for batch in batches(ids, batch_size(model, 1)):
+            queryset = self.get_queryset().filter(id__in=batch)
+            data.update(
+                (item['id'], item)
+                for item in self.get_serializer(queryset, many=True).data
+            )
+
+        return data
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False,
+            url_path='bulk', url_name='bulk')
+    def bulk(self, request):
+        """apply a list of creations, partial updates or deletions"""
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'detail': 'Expected a list of items.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > MAX_ITEMS:
+            return Response(
+                {'detail': f'Bulk requests are limited to {MAX_ITEMS} items.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        model = self.get_queryset().model
+        user = request.user
+        errors = {}
+        with transaction.atomic():
+            if request.method == 'POST':
+                success = status.HTTP_201_CREATED
+                valid, errors = validate_items(
+                    self.get_bulk_serializer(), items
+                )
+                check_related(user, valid, errors, self.bulk_relations)
+                done = bulk_create(model, user, valid, self.bulk_relations)
+                search.update_vectors(model, done.values())
+            elif request.method == 'PATCH':
+                success = status.HTTP_200_OK
+                done = item_ids(
+                    items, errors, model.objects.filter(user=user)
+                )
+                valid, item_errors = validate_items(
+                    self.get_bulk_serializer(partial=True),
+                    [items[index] for index in done]
+                )
+                indexes = list(done)
+                errors.update(
+                    (indexes[position], error)
+                    for position, error in item_errors.items()
+                )
+                valid = {indexes[position]: data
+                         for position, data in valid.items()}
+                check_related(user, valid, errors, self.bulk_relations)
+                bulk_update(model, {
+                    index: (done[index], data)
+                    for index, data in valid.items()
+                }, self.bulk_relations)
+                search.update_vectors(
+                    model, [done[index] for index in valid]
+                )
+            else:
+                success = status.HTTP_204_NO_CONTENT
+                done = item_ids(
+                    items, errors, model.objects.filter(user=user)
+                )
+                for batch in batches(done.values(), batch_size(model, 1)):
+                    model.objects.filter(id__in=batch).delete()
+            if model is User_File:
+                # rows inserted by bulk_create skip the counting signals
+                usage.recount_users([user.id])
+            invalidate_user(user.id)
+
+        done = {
+            index: obj_id for index, obj_id in done.items()
+            if index not in errors
+        }
+        data = {} if request.method == 'DELETE' else \
+            self.bulk_output(done.values())
+
+        return Response(
+            build_results(items, done, errors, success, data),
+            status=response_status(errors, success, len(items))
+        )
@@ -0,0 +1,119 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'user-files:version:{}'
+RESPONSE_KEY = 'user-files:response:{}'
+
+
+def get_cache():
+    """return the cache of responses, None when caching is disabled"""
+    alias = settings.USER_FILES_CACHE_ALIAS
+
+    return caches[alias] if alias else None
+
+
+def get_version(cache, user_id):
+    """return the (token, timestamp) version of the data of a user"""
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, (uuid.uuid4().hex, int(time.time())), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(user_id):
+    """give the data of a user a new version, the responses cached under
+    the previous one are never read again and expire on their own"""
+    cache = get_cache()
+    if cache is None:
+        return
+    key = VERSION_KEY.format(user_id)
+    stamp = int(time.time())
+    previous = cache.get(key)
+    if previous is not None:
+        # Last-Modified has a one second resolution, a change must move it
+        stamp = max(stamp, previous[1] + 1)
+    cache.set(key, (uuid.uuid4().hex, stamp), None)
+
+
+def invalidate_user(user_id):
+    """invalidate the cached responses of a user
+
+    the version is bumped again on commit, a request reading the data
+    before the commit could otherwise cache it under the new version
+    """
+    if user_id is None or get_cache() is None:
+        return
+    bump_version(user_id)
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+def cached_response(view, handler, request, *args, **kwargs):
+    """return the response of handler from the cache of the user
+
+    requests whose ETag or Last-Modified validator is still current get a
+    304 without running the handler, fresh responses are cached for
+    USER_FILES_CACHE_TIMEOUT seconds under the current version of the data
+    of the user, the query string and the path
+    """
+    cache = get_cache()
+    if cache is None:
+        return handler(request, *args, **kwargs)
+
+    token, stamp = get_version(cache, request.user.pk)
+    digest = hashlib.sha1('\n'.join((
+        str(request.user.pk), token, type(view).__name__,
+        request.build_absolute_uri()
+    )).encode()).hexdigest()
+    etag = quote_etag(digest)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=stamp
+    )
+    if response is None:
+        data = cache.get(RESPONSE_KEY.format(digest))
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(
+                RESPONSE_KEY.format(digest),
+                response.data,
+                settings.USER_FILES_CACHE_TIMEOUT
+            )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stamp)
+
+    return response
+
+
+class CachedListMixin:
+    """serve list responses from the cache of the user"""
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            self, super().list, request, *args, **kwargs
+        )
+
+
+class CachedRetrieveMixin:
+    """serve retrieve responses from the cache of the user"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            self, super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, features
+
+from core.models import Derivative, DxfMetadata, User_File
+from user_files import dxf, workers
+
+
+IMAGE_EXTENSIONS = (
+    '.bmp', '.gif', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp',
+)
+
+
+def is_image(name):
+    """return whether a stored file is an image by its extension"""
+    return os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def is_dxf(name):
+    """return whether a stored file is a DXF drawing by its extension"""
+    return os.path.splitext(name or '')[1].lower() == '.dxf'
+
+
+def output_format():
+    """return the Pillow format and extension of the thumbnails"""
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+
+    return 'JPEG', 'jpg'
+
+
+def schedule(user_file):
+    """drop the derivatives of user_file and generate new ones in the
+    background when its file is an image or a DXF drawing"""
+    user_file.derivatives.all().delete()
+    DxfMetadata.objects.filter(user_file=user_file).delete()
+    if is_image(user_file.file.name):
+        workers.submit(generate_thumbnails, user_file.pk)
+    elif is_dxf(user_file.file.name):
+        workers.submit(generate_dxf_preview, user_file.pk)
+
+
+def generate_thumbnails(user_file_id):
+    """store a thumbnail of the image of a user_file for every size of
+    USER_FILES_THUMBNAIL_SIZES"""
+    user_file = User_File.objects.only('id', 'file').filter(
+        pk=user_file_id
+    ).first()
+    if user_file is None or not is_image(user_file.file.name):
+        return
+
+    sizes = thumbnail_sizes()
+    with user_file.file.open('rb') as f:
+        image = Image.open(f)
+        # JPEG images are decoded straight at the smallest scale (1/2 to
+        # 1/8) still larger than the biggest thumbnail
+        image.draft('RGB', (sizes[0], sizes[0]))
+        image = image.convert('RGB')
+
+    save_thumbnails(user_file, image)
+
+
+def generate_dxf_preview(user_file_id):
+    """store the metadata of the DXF drawing of a user_file and thumbnails
+    of its rendering, parsed and drawn in a worker process"""
+    user_file = User_File.objects.only('id', 'file').filter(
+        pk=user_file_id
+    ).first()
+    if user_file is None or not is_dxf(user_file.file.name):
+        return
+
+    metadata, image = workers.run_in_process(
+        dxf.analyze, user_file.file.path, thumbnail_sizes()[0]
+    )
+    extmin, extmax = metadata['extents'] or ((None, None), (None, None))
+    DxfMetadata.objects.update_or_create(
+        user_file=user_file,
+        defaults={
+            'version': metadata['version'],
+            'units': metadata['units'],
+            'layers': json.dumps(metadata['layers']),
+            'entity_counts': json.dumps(metadata['entity_counts']),
+            'extmin_x': extmin[0],
+            'extmin_y': extmin[1],
+            'extmax_x': extmax[0],
+            'extmax_y': extmax[1],
+        }
+    )
+    save_thumbnails(user_file, image)
+
+
+def thumbnail_sizes():
+    """return the thumbnail sizes, largest first"""
+    return sorted(settings.USER_FILES_THUMBNAIL_SIZES, reverse=True)
+
+
+def save_thumbnails(user_file, image):
+    """store thumbnails of image for every size, largest first"""
+    image_format, ext = output_format()
+    for size in thumbnail_sizes():
+        # each thumbnail is reduced from the previous, larger one
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=80)
+        save_derivative(
+            user_file, Derivative.THUMBNAIL, size, image.size,
+            ContentFile(buffer.getvalue(), name=f'thumbnail.{ext}')
+        )
+
+
+def save_derivative(user_file, kind, size, dimensions, content):
+    """store content as the derivative kind/size of user_file"""
+    Derivative.objects.filter(
+        user_file=user_file, kind=kind, size=size
+    ).delete()
+    derivative = Derivative(
+        user_file=user_file,
+        kind=kind,
+        size=size,
+        width=dimensions[0],
+        height=dimensions[1]
+    )
+    derivative.file.save(content.name, content)
+
+    return derivative
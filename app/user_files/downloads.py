@@ -0,0 +1,129 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from core.storage import content_storage, parse_blob_name
+
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """the requested range lies outside of the file"""
+
+
+def file_etag(name, stat):
+    """return the ETag of a stored file
+
+    blobs are named after the sha256 of their content which makes a strong
+    validator, other files fall back to a weak one from size and mtime
+    """
+    digest = parse_blob_name(name)
+    if digest:
+        return quote_etag(digest)
+
+    return 'W/' + quote_etag(f'{stat.st_size:x}-{int(stat.st_mtime):x}')
+
+
+def parse_range(header, size):
+    """return the (start, end) inclusive bounds of a single byte range,
+    None when there is no range or it is not a single byte range"""
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix range, the last n bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise RangeNotSatisfiable()
+
+    return start, end
+
+
+def iter_range(f, start, length):
+    """yield length bytes of the open file f starting at start"""
+    with f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve_file(request, name, storage=content_storage):
+    """return a response sending the stored file name
+
+    honours If-None-Match/If-Modified-Since with a 304 and single byte
+    Range requests with a 206; full downloads use FileResponse so the WSGI
+    server can send the file with sendfile, and when
+    USER_FILES_ACCEL_REDIRECT_PREFIX is set the transfer is handed off to
+    the front proxy with an X-Accel-Redirect header instead
+    """
+    path = storage.path(name)
+    stat = os.stat(path)
+    etag = file_etag(name, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = build_response(request, name, path, stat.st_size, etag)
+    for header, value in headers.items():
+        response[header] = value
+
+    return response
+
+
+def build_response(request, name, path, size, etag):
+    """return the response carrying the file or the requested range"""
+    prefix = settings.USER_FILES_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        # the proxy serves ranges and conditional requests on its own
+        response = HttpResponse(content_type='')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+        return response
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    try:
+        if if_range and if_range not in parse_etags(etag):
+            byte_range = None
+        else:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'))
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        iter_range(open(path, 'rb'), start, length),
+        status=206,
+        content_type=mimetypes.guess_type(name)[0] or
+        'application/octet-stream'
+    )
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    return response
@@ -0,0 +1,123 @@
+"""Metadata extraction and preview rendering of DXF drawings
+
+this module does not touch Django so it can run in worker processes
+"""
+import math
+from collections import Counter
+
+import ezdxf
+from PIL import Image, ImageDraw
+
+
+# entities drawn on the preview, larger drawings are truncated
+MAX_PREVIEW_ENTITIES = 200000
+ARC_SEGMENTS = 32
+# header extents of drawings never zoomed to extents
+UNSET_EXTENT = 1e20
+
+
+def arc_points(center, radius, start_angle=0, end_angle=360):
+    """return the points of an arc, angles in degrees counterclockwise"""
+    if end_angle <= start_angle:
+        end_angle += 360
+    step = (end_angle - start_angle) / ARC_SEGMENTS
+
+    return [
+        (center[0] + radius * math.cos(math.radians(start_angle + i * step)),
+         center[1] + radius * math.sin(math.radians(start_angle + i * step)))
+        for i in range(ARC_SEGMENTS + 1)
+    ]
+
+
+def entity_paths(entity):
+    """return the polylines drawing an entity of the modelspace"""
+    kind = entity.dxftype()
+    if kind == 'LINE':
+        return [[entity.dxf.start[:2], entity.dxf.end[:2]]]
+    if kind == 'LWPOLYLINE':
+        points = [point[:2] for point in entity.get_points('xy')]
+        if entity.closed and points:
+            points.append(points[0])
+        return [points]
+    if kind == 'POLYLINE':
+        points = [point[:2] for point in entity.points()]
+        if entity.is_closed and points:
+            points.append(points[0])
+        return [points]
+    if kind == 'CIRCLE':
+        return [arc_points(entity.dxf.center, entity.dxf.radius)]
+    if kind == 'ARC':
+        return [arc_points(
+            entity.dxf.center, entity.dxf.radius,
+            entity.dxf.start_angle, entity.dxf.end_angle
+        )]
+
+    return []
+
+
+def header_extents(doc):
+    """return the (min, max) 2d extents recorded in the header, None when
+    they were never computed; used for drawings without drawn entities"""
+    extmin = doc.header.get('$EXTMIN')
+    extmax = doc.header.get('$EXTMAX')
+    if not extmin or not extmax:
+        return None
+    if any(abs(value) >= UNSET_EXTENT for value in (*extmin, *extmax)):
+        return None
+    if extmin[0] > extmax[0] or extmin[1] > extmax[1]:
+        return None
+
+    return tuple(extmin[:2]), tuple(extmax[:2])
+
+
+def paths_extents(paths):
+    """return the (min, max) 2d extents of paths, None when empty"""
+    xs = [point[0] for path in paths for point in path]
+    ys = [point[1] for path in paths for point in path]
+    if not xs:
+        return None
+
+    return (min(xs), min(ys)), (max(xs), max(ys))
+
+
+def render(paths, extents, size):
+    """draw paths fitted in a size x size white image"""
+    image = Image.new('RGB', (size, size), 'white')
+    if extents is None:
+        return image
+    (min_x, min_y), (max_x, max_y) = extents
+    span = max(max_x - min_x, max_y - min_y) or 1
+    scale = (size - 1) / span
+    draw = ImageDraw.Draw(image)
+    for path in paths:
+        if len(path) < 2:
+            continue
+        # the y axis of the image points down
+        draw.line([
+            ((x - min_x) * scale, (size - 1) - (y - min_y) * scale)
+            for x, y in path
+        ], fill='black')
+
+    return image
+
+
+def analyze(path, size):
+    """return the metadata of the DXF drawing at path and its preview as
+    a size x size image"""
+    doc = ezdxf.readfile(path)
+    counts = Counter()
+    paths = []
+    for entity in doc.modelspace():
+        counts[entity.dxftype()] += 1
+        if len(paths) < MAX_PREVIEW_ENTITIES:
+            paths.extend(entity_paths(entity))
+
+    extents = paths_extents(paths) or header_extents(doc)
+
+    return {
+        'version': doc.dxfversion,
+        'units': doc.header.get('$INSUNITS', 0),
+        'layers': sorted(layer.dxf.name for layer in doc.layers),
+        'entity_counts': dict(counts),
+        'extents': extents,
+    }, render(paths, extents, size)
@@ -0,0 +1,88 @@
+"""Sparse fieldsets of the user_files responses
+
+`?fields=id,title` keeps only the named fields of the objects of a list
+or retrieve response and `?expand=tags` nests the named relations as
+objects rather than ids, an empty `?expand=` renders them all as ids; the
+views load only the columns and prefetch only the relations the response
+needs
+"""
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(query_params, name, choices):
+    """return a comma separated list of names of choices as a tuple, None
+    when the parameter is missing"""
+    value = query_params.get(name)
+    if value is None:
+        return None
+    names = tuple(dict.fromkeys(
+        item.strip() for item in value.split(',') if item.strip()
+    ))
+    unknown = [item for item in names if item not in choices]
+    if unknown:
+        raise ValidationError(
+            {name: _('Unknown fields: {}.').format(', '.join(unknown))}
+        )
+
+    return names
+
+
+class SparseFieldsMixin:
+    """serializer keeping the fields named by the `fields` entry of its
+    context and nesting the relations named by its `expand` entry"""
+    # relations that can be nested mapped to the serializer of their
+    # objects, and the ones nested when `expand` is not given
+    expandable = {}
+    expanded = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields:
+                    del self.fields[name]
+        expand = self.context.get('expand')
+        if expand is None:
+            return
+        for name, serializer_class in self.expandable.items():
+            if name not in self.fields or \
+                    (name in expand) == (name in self.expanded):
+                continue
+            if name in expand:
+                self.fields[name] = serializer_class(many=True, read_only=True)
+            else:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=True, read_only=True
+                )
+
+
+class SparseFieldsetMixin:
+    """hand the `fields` and `expand` query parameters of the actions of
+    fieldset_actions to the serializer, see get_fieldset"""
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        """return the names of the fields and of the expanded relations
+        of the response, either is None when the serializer defaults apply"""
+        if getattr(self, 'action', None) not in self.fieldset_actions:
+            return None, None
+        if not hasattr(self, '_fieldset'):
+            serializer_class = self.get_serializer_class()
+            params = self.request.query_params
+            self._fieldset = (
+                parse_names(params, 'fields', serializer_class.Meta.fields)
+                or None,
+                parse_names(params, 'expand', serializer_class.expandable),
+            )
+
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_fieldset()
+
+        return context
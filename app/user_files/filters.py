@@ -0,0 +1,69 @@
+from django.db.models import Count, Exists, OuterRef
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework.exceptions import ValidationError
+
+
+def parse_flag(query_params, name):
+    """return a 0/1 query parameter as a bool, False when it is missing"""
+    value = query_params.get(name, '0')
+    if value not in ('0', '1'):
+        raise ValidationError({name: _('Must be 0 or 1.')})
+
+    return value == '1'
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+
+def parse_choice(query_params, name, choices, default):
+    """return a query parameter restricted to choices"""
+    value = query_params.get(name, default)
+    if value not in choices:
+        raise ValidationError(
+            {name: _('Must be one of: {}.').format(', '.join(choices))}
+        )
+
+    return value
+
+
+def parse_ids(query_params, name):
+    """return a comma separated list of ids as a sorted list of ints"""
+    value = query_params.get(name)
+    if not value:
+        return []
+    try:
+        return sorted({int(str_id) for str_id in value.split(',')})
+    except ValueError:
+        raise ValidationError(
+            {name: _('Must be a comma separated list of ids.')}
+        )
+
+
+def filter_assigned(queryset, through, field):
+    """keep the objects referenced by at least one row of the m2m through
+    model, as an EXISTS semi-join rather than a join followed by DISTINCT"""
+    assigned = through.objects.filter(**{field: OuterRef('pk')})
+
+    return queryset.annotate(assigned=Exists(assigned)).filter(assigned=True)
+
+
+def filter_related(queryset, through, field, ids, match=MATCH_ANY):
+    """keep the user_files linked to any or all of ids by the m2m through
+    model
+
+    the links are resolved in a subquery on the through table, so every
+    user_file is returned once whatever the number of ids; for MATCH_ALL
+    the links are grouped per user_file and the ones holding every id are
+    kept, rather than joining the through table once per id
+    """
+    links = through.objects.filter(**{f'{field}_id__in': ids})
+    if match == MATCH_ALL:
+        # (user_file, field) pairs are unique so a plain count is enough
+        links = links.values('user_file_id').annotate(
+            matched=Count(f'{field}_id')
+        ).filter(matched=len(ids))
+
+    return queryset.filter(id__in=links.values('user_file_id'))
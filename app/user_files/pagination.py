@@ -0,0 +1,35 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """keyset pagination for user owned objects
+
+    pages are fetched with a `WHERE <ordering> < <cursor position>` filter
+    instead of an OFFSET, so the cost of a page does not depend on how deep
+    the client has paged and rows inserted meanwhile never shift a page
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class UserFileCursorPagination(BaseCursorPagination):
+    """paginate user_files newest first, search results best match first"""
+    ordering = ('-created_on', '-id')
+    search_ordering = ('-search_rank', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return self.search_ordering
+
+        return super().get_ordering(request, queryset, view)
+
+
+class TagCursorPagination(BaseCursorPagination):
+    """paginate tags by name"""
+    ordering = ('-name', '-id')
+
+
+class File_typeCursorPagination(BaseCursorPagination):
+    """paginate file_types by type"""
+    ordering = ('-type', '-id')
@@ -0,0 +1,136 @@
+import re
+
+from django.db import connections, router
+from django.db.models import BooleanField, Case, FloatField, IntegerField, \
+    Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from core.models import Tag, File_type, User_File
+
+
+# terms of a query beyond this are ignored
+MAX_TERMS = 10
+TERM_RE = re.compile(r'[^\W_]+')
+# the 'simple' configuration does not stem words, titles and tags are names
+# in any language and prefix matching must see them as typed
+VECTOR_SQL = """
+UPDATE core_user_file SET search_vector =
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_tag t
+        JOIN core_user_file_tags ut ON ut.tag_id = t.id
+        WHERE ut.user_file_id = core_user_file.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(f.type, ' ') FROM core_file_type f
+        JOIN core_user_file_file_types uf ON uf.file_type_id = f.id
+        WHERE uf.user_file_id = core_user_file.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('simple', regexp_replace(
+        coalesce(link, ''), '[^[:alnum:]]+', ' ', 'g'
+    )), 'C')
+"""
+THROUGH_COLUMNS = {
+    Tag: ('core_user_file_tags', 'tag_id'),
+    File_type: ('core_user_file_file_types', 'file_type_id'),
+}
+
+
+def uses_postgres():
+    """return whether user_files live in PostgreSQL, where the search
+    vectors are maintained"""
+    alias = router.db_for_write(User_File)
+
+    return connections[alias].vendor == 'postgresql'
+
+
+def update_vectors(model, ids):
+    """recompute the search vector of the user_files of ids, or of the
+    user_files related to the tags or file_types of ids"""
+    ids = list(ids)
+    if not ids or not uses_postgres():
+        return
+    if model is User_File:
+        where = 'WHERE id = ANY(%s)'
+    else:
+        table, column = THROUGH_COLUMNS[model]
+        where = (f'WHERE id IN (SELECT user_file_id FROM {table} '
+                 f'WHERE {column} = ANY(%s))')
+    with connections[router.db_for_write(User_File)].cursor() as cursor:
+        cursor.execute(VECTOR_SQL + where, [ids])
+
+
+def related_user_file_ids(instance):
+    """return the ids of the user_files related to a tag or file_type"""
+    return list(instance.user_file_set.values_list('id', flat=True))
+
+
+def query_terms(q):
+    """return the words of a search query"""
+    return TERM_RE.findall(q.lower())[:MAX_TERMS]
+
+
+def search(queryset, q):
+    """filter user_files matching every term of q as a prefix of a word
+    of their title, link, tags or file_types, best matches first
+
+    the result is annotated with search_rank, a higher rank is a better
+    match
+    """
+    terms = query_terms(q)
+    if not terms:
+        return queryset.none()
+    if uses_postgres():
+        queryset = postgres_search(queryset, q, terms)
+    else:
+        queryset = fallback_search(queryset, terms)
+
+    return queryset.order_by('-search_rank', '-id')
+
+
+def postgres_search(queryset, q, terms):
+    """match the search vector with a prefix tsquery, typos of the title
+    and link are matched by trigram similarity; both use GIN indexes"""
+    tsquery = ' & '.join(f"'{term}':*" for term in terms)
+    match = RawSQL(
+        "(core_user_file.search_vector @@ to_tsquery('simple', %s) "
+        "OR core_user_file.title %% %s OR core_user_file.link %% %s)",
+        (tsquery, q, q),
+        output_field=BooleanField()
+    )
+    rank = RawSQL(
+        "(ts_rank_cd(core_user_file.search_vector, "
+        "to_tsquery('simple', %s)) + similarity(core_user_file.title, %s)"
+        ")::double precision",
+        (tsquery, q),
+        output_field=FloatField()
+    )
+
+    # filtering on the annotation keeps the condition a plain WHERE clause
+    return queryset.annotate(
+        search_match=match, search_rank=rank
+    ).filter(search_match=True)
+
+
+def fallback_search(queryset, terms):
+    """match every term as a substring with LIKE, for the databases
+    without full-text search such as the SQLite test database"""
+    rank = Value(0, output_field=IntegerField())
+    for term in terms:
+        tagged = Q(id__in=User_File.tags.through.objects.filter(
+            tag__name__icontains=term
+        ).values('user_file_id'))
+        typed = Q(id__in=User_File.file_types.through.objects.filter(
+            file_type__type__icontains=term
+        ).values('user_file_id'))
+        title = Q(title__icontains=term)
+        link = Q(link__icontains=term)
+        queryset = queryset.filter(title | tagged | typed | link)
+        rank = rank + Case(
+            When(title, then=Value(4)),
+            When(tagged | typed, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+
+    return queryset.annotate(search_rank=rank)
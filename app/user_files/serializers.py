@@ -1,50 +1,157 @@
+from django.urls import reverse
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from core.models import Tag, File_type, User_File, User_FileUpload, \
+    DxfMetadata
 
-from core.models import Tag, File_type, User_File
+from user_files.fieldsets import SparseFieldsMixin
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for tag object"""
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'usage_count')
         read_only_Fields = ('id',)
 
 
-class File_typeSerializer(serializers.ModelSerializer):
+class File_typeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """serailizer for file_type objects"""
 
     class Meta:
         model = File_type
-        fields = ('id', 'type')
+        fields = ('id', 'type', 'usage_count')
         read_only_Fields = ('id',)
 
 
-class User_FileSerializer(serializers.ModelSerializer):
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """resolve all the submitted ids with a single query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        ids = []
+        for item in data:
+            try:
+                ids.append(int(item))
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        ids = list(dict.fromkeys(ids))
+        objects = child.get_queryset().in_bulk(ids)
+        missing = [pk for pk in ids if pk not in objects]
+        if missing:
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ])
+
+        # the fetched objects are handed to the m2m set() as they are
+        return [objects[pk] for pk in ids]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """primary key field accepting objects of the request user only"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        queryset = super().get_queryset()
+        if request is None:
+            return queryset.none()
+
+        return queryset.filter(user=request.user)
+
+
+class User_FileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """serialize uesr files"""
-    file_types = serializers.PrimaryKeyRelatedField(
+    file_types = UserPrimaryKeyRelatedField(
         many=True,
         queryset=File_type.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
+    derivatives = serializers.SerializerMethodField()
+    expandable = {'tags': TagSerializer, 'file_types': File_typeSerializer}
 
     class Meta:
         model = User_File
         fields = (
             'id', 'title',
-            'file_types', 'tags', 'created_on', 'link'
+            'file_types', 'tags', 'created_on', 'link', 'derivatives'
         )
         read_only_Fields = ('id',)
 
+    def get_derivatives(self, obj):
+        """return the URLs of the thumbnails by size"""
+        return {
+            str(derivative.size): reverse(
+                'user_files:user_file-derivative',
+                args=[obj.id, derivative.size]
+            )
+            for derivative in obj.derivatives.all()
+        }
+
+
+class User_FileBulkSerializer(User_FileSerializer):
+    """validate a user_file of a bulk request, tags and file_types are
+    checked for all the items at once"""
+    file_types = serializers.ListField(
+        child=serializers.IntegerField(min_value=1)
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1)
+    )
+
+
+class DxfMetadataSerializer(serializers.ModelSerializer):
+    """serializer for the metadata of DXF drawings"""
+    layers = serializers.ListField(source='layer_names', read_only=True)
+    entity_counts = serializers.DictField(
+        source='entity_count_by_type',
+        read_only=True
+    )
+
+    class Meta:
+        model = DxfMetadata
+        fields = (
+            'version', 'units', 'layers', 'entity_counts',
+            'extmin_x', 'extmin_y', 'extmax_x', 'extmax_y'
+        )
+
 
 class UserFileDetailSerializer(User_FileSerializer):
     """serialize a user_file detail"""
     file_types = File_typeSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    dxf_metadata = serializers.SerializerMethodField()
+    expanded = ('tags', 'file_types')
+
+    class Meta(User_FileSerializer.Meta):
+        fields = User_FileSerializer.Meta.fields + ('dxf_metadata',)
+
+    def get_dxf_metadata(self, obj):
+        """return the metadata of a DXF file, None for other files"""
+        try:
+            return DxfMetadataSerializer(obj.dxf_metadata).data
+        except DxfMetadata.DoesNotExist:
+            return None
 
 
 class UserFile_FilesSerializer(serializers.ModelSerializer):
@@ -54,3 +161,20 @@ class UserFile_FilesSerializer(serializers.ModelSerializer):
         model = User_File
         fields = ('id', 'file')
         read_only_Fields = ('id')
+
+
+class User_FileUploadSerializer(serializers.ModelSerializer):
+    """serializer for chunked uploads of userfile files"""
+    checksum = serializers.RegexField(
+        r'^[0-9a-fA-F]{64}$',
+        write_only=True,
+        required=False
+    )
+
+    class Meta:
+        model = User_FileUpload
+        fields = (
+            'id', 'filename', 'size', 'checksum', 'offset', 'completed'
+        )
+        read_only_fields = ('id', 'offset', 'completed')
+        extra_kwargs = {'size': {'min_value': 0}}
@@ -0,0 +1,101 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, \
+    m2m_changed
+from django.dispatch import receiver
+
+from core.models import Tag, File_type, User_File, Derivative, DxfMetadata
+from user_files import search
+from user_files.cache import get_cache, invalidate_user
+
+
+SEARCH_FIELDS = {'title', 'link'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=File_type)
+@receiver(post_delete, sender=File_type)
+@receiver(post_save, sender=User_File)
+@receiver(post_delete, sender=User_File)
+def invalidate_owner(sender, instance, **kwargs):
+    """invalidate the cached responses of the owner of a changed object"""
+    invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User_File.tags.through)
+@receiver(m2m_changed, sender=User_File.file_types.through)
+def invalidate_relation_owner(sender, instance, action, **kwargs):
+    """invalidate the cached responses after tags or file_types of a
+    user_file changed, instance is the user_file or, when the relation is
+    changed from the other side, the tag or file_type"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Derivative)
+@receiver(post_delete, sender=Derivative)
+@receiver(post_save, sender=DxfMetadata)
+@receiver(post_delete, sender=DxfMetadata)
+def invalidate_user_file_owner(sender, instance, **kwargs):
+    """invalidate the cached responses showing derivatives or metadata"""
+    if get_cache() is None:
+        return
+    invalidate_user(User_File.objects.filter(
+        pk=instance.user_file_id
+    ).values_list('user_id', flat=True).first())
+
+
+@receiver(post_save, sender=User_File)
+def update_search_vector(sender, instance, update_fields=None, **kwargs):
+    """index the new title and link of a user_file"""
+    if update_fields is None or SEARCH_FIELDS.intersection(update_fields):
+        search.update_vectors(User_File, [instance.id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=File_type)
+def update_related_search_vectors(sender, instance, created, **kwargs):
+    """index the new name of a tag or file_type in its user_files"""
+    if not created:
+        search.update_vectors(sender, [instance.id])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=File_type)
+def remember_related_user_files(sender, instance, **kwargs):
+    """keep the user_files of a deleted tag or file_type to reindex them"""
+    if search.uses_postgres():
+        instance._search_user_file_ids = search.related_user_file_ids(
+            instance
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=File_type)
+def update_unrelated_search_vectors(sender, instance, **kwargs):
+    """drop the name of a deleted tag or file_type from its user_files"""
+    search.update_vectors(
+        User_File, getattr(instance, '_search_user_file_ids', ())
+    )
+
+
+@receiver(m2m_changed, sender=User_File.tags.through)
+@receiver(m2m_changed, sender=User_File.file_types.through)
+def update_relation_search_vectors(sender, instance, action, reverse,
+                                   pk_set, **kwargs):
+    """index the tags and file_types assigned to user_files, instance is
+    the tag or file_type and pk_set user_file ids when reverse"""
+    if not search.uses_postgres():
+        return
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.update_vectors(User_File, [instance.id])
+    elif action == 'pre_clear':
+        instance._search_user_file_ids = search.related_user_file_ids(
+            instance
+        )
+    elif action in ('post_add', 'post_remove'):
+        search.update_vectors(User_File, pk_set)
+    elif action == 'post_clear':
+        search.update_vectors(
+            User_File, getattr(instance, '_search_user_file_ids', ())
+        )
@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, File_type, User_File, UserUsage
+
+
+TAGS_BULK_URL = reverse('user_files:tag-bulk')
+USER_FILES_BULK_URL = reverse('user_files:user_file-bulk')
+
+
+class BulkApiTests(TestCase):
+    """Test the bulk create, update and delete endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='room')
+        self.file_type = File_type.objects.create(user=self.user, type='DWG')
+
+    def test_bulk_create_user_files(self):
+        """test creating user_files with their tags and file_types"""
+        payload = [
+            {'title': f'plan {i}', 'tags': [self.tag.id],
+             'file_types': [self.file_type.id]}
+            for i in range(3)
+        ]
+
+        res = self.client.post(USER_FILES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User_File.objects.filter(user=self.user).count(), 3)
+        for item in res.data:
+            self.assertEqual(item['status'], status.HTTP_201_CREATED)
+            self.assertEqual(item['data']['tags'], [self.tag.id])
+            user_file = User_File.objects.get(id=item['data']['id'])
+            self.assertEqual(list(user_file.file_types.all()),
+                             [self.file_type])
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.usage_count, 3)
+        self.assertEqual(UserUsage.objects.get(user=self.user).file_count, 3)
+
+    def test_bulk_create_checks_related_ids_at_once(self):
+        """test related ids are looked up with one query per relation
+        and ids of other users are reported per item"""
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        other_tag = Tag.objects.create(user=other, name='private')
+        payload = [
+            {'title': 'ok', 'tags': [self.tag.id], 'file_types': []},
+            {'title': 'bad', 'tags': [other_tag.id], 'file_types': []},
+            {'tags': [], 'file_types': []},
+        ]
+
+        res = self.client.post(USER_FILES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data[0]['status'], status.HTTP_201_CREATED)
+        self.assertEqual(res.data[1]['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data[1]['errors'])
+        self.assertIn('title', res.data[2]['errors'])
+        self.assertFalse(other_tag.user_file_set.exists())
+        self.assertEqual(User_File.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_tags(self):
+        """test creating tags for the authenticated user"""
+        payload = [{'name': f'tag {i}'} for i in range(20)]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 21)
+
+    def test_bulk_update_user_files(self):
+        """test partially updating user_files and replacing their tags"""
+        first = User_File.objects.create(user=self.user, title='first')
+        second = User_File.objects.create(user=self.user, title='second')
+        second.tags.add(self.tag)
+        kitchen = Tag.objects.create(user=self.user, name='kitchen')
+        payload = [
+            {'id': first.id, 'title': 'first plan'},
+            {'id': second.id, 'tags': [kitchen.id]},
+            {'id': 0, 'title': 'missing'},
+        ]
+
+        res = self.client.patch(USER_FILES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data[0]['data']['title'], 'first plan')
+        self.assertEqual(res.data[2]['status'], status.HTTP_404_NOT_FOUND)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, 'first plan')
+        self.assertEqual(second.title, 'second')
+        self.assertEqual(list(second.tags.all()), [kitchen])
+
+    def test_bulk_delete(self):
+        """test deleting tags by id leaves other users' tags alone"""
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        other_tag = Tag.objects.create(user=other, name='private')
+
+        res = self.client.delete(
+            TAGS_BULK_URL, [self.tag.id, other_tag.id], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data[0]['status'], status.HTTP_204_NO_CONTENT)
+        self.assertEqual(res.data[1]['status'], status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Tag.objects.filter(id=self.tag.id).exists())
+        self.assertTrue(Tag.objects.filter(id=other_tag.id).exists())
+
+    def test_bulk_requires_list(self):
+        """test the body of a bulk request must be a list"""
+        res = self.client.post(
+            TAGS_BULK_URL, {'name': 'room'}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
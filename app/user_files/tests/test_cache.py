@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, User_File
+
+
+TAGS_URL = reverse('user_files:tag-list')
+USER_FILES_URL = reverse('user_files:user_file-list')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'user-files-tests',
+    },
+}
+
+
+def detail_url(user_file_id):
+    """return userfile detail url"""
+    return reverse('user_files:user_file-detail', args=[user_file_id])
+
+
+@override_settings(CACHES=CACHES, USER_FILES_CACHE_ALIAS='default')
+class ResponseCacheTests(TestCase):
+    """Test caching the list and detail responses per user"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='room')
+        self.user_file = User_File.objects.create(
+            user=self.user, title='plan'
+        )
+
+    def test_list_is_cached(self):
+        """test a repeated list request runs no query"""
+        res = self.client.get(TAGS_URL)
+        with self.assertNumQueries(0):
+            cached = self.client.get(TAGS_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_query_params_are_cached_apart(self):
+        """test each query string has its own cached response"""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_create_invalidates_list(self):
+        """test creating a tag shows up in the next list response"""
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'kitchen'})
+
+        res = self.client.get(TAGS_URL)
+
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['room', 'kitchen'])
+
+    def test_m2m_change_invalidates_detail(self):
+        """test assigning a tag shows up in the next detail response"""
+        self.client.get(detail_url(self.user_file.id))
+        self.user_file.tags.add(self.tag)
+
+        res = self.client.get(detail_url(self.user_file.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'room')
+
+    def test_reverse_m2m_change_invalidates_list(self):
+        """test assigning from the tag side invalidates the user_files"""
+        self.client.get(USER_FILES_URL)
+        self.tag.user_file_set.add(self.user_file)
+
+        res = self.client.get(USER_FILES_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'], [self.tag.id])
+
+    def test_users_are_cached_apart(self):
+        """test a user never gets the cached response of another"""
+        self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_if_none_match_returns_not_modified(self):
+        """test a current ETag gets a 304 without any query"""
+        res = self.client.get(USER_FILES_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                USER_FILES_URL, HTTP_IF_NONE_MATCH=res['ETag']
+            )
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_stale_etag_returns_response(self):
+        """test an ETag from before a change gets the new response"""
+        res = self.client.get(USER_FILES_URL)
+        self.user_file.title = 'new plan'
+        self.user_file.save()
+
+        res = self.client.get(USER_FILES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['title'], 'new plan')
+
+    def test_if_modified_since_returns_not_modified(self):
+        """test a current Last-Modified gets a 304"""
+        res = self.client.get(TAGS_URL)
+
+        res = self.client.get(
+            TAGS_URL, HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_errors_are_not_cached(self):
+        """test invalid requests are answered without caching"""
+        res = self.client.get(TAGS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', res)
+
+    @override_settings(USER_FILES_CACHE_ALIAS=None)
+    def test_disabled_cache(self):
+        """test every request runs its queries when caching is disabled"""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('ETag', res)
@@ -0,0 +1,197 @@
+import io
+import tempfile
+
+import ezdxf
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import User_File, Derivative, DxfMetadata
+
+from user_files import derivatives, dxf
+
+USER_FILES_URL = reverse('user_files:user_file-list')
+
+
+def derivative_url(user_file_id, size):
+    """return URL of the thumbnail of a userfile"""
+    return reverse(
+        'user_files:user_file-derivative', args=[user_file_id, size]
+    )
+
+
+def sample_image(width=1000, height=750, format='JPEG'):
+    """return the content of a sample image"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color='red').save(buffer, format)
+
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    USER_FILES_THUMBNAIL_SIZES=(128, 512)
+)
+class DerivativeTests(TestCase):
+    """Test generating thumbnails of userfile images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.user_file = User_File.objects.create(
+            user=self.user, title='photo'
+        )
+
+    def test_generate_thumbnails(self):
+        """test a thumbnail is generated for every size"""
+        self.user_file.file.save('photo.jpg', sample_image())
+
+        derivatives.generate_thumbnails(self.user_file.id)
+
+        thumbnails = self.user_file.derivatives.order_by('size')
+        self.assertEqual(
+            [(d.size, d.width, d.height) for d in thumbnails],
+            [(128, 128, 96), (512, 512, 384)]
+        )
+        with thumbnails[0].file.open('rb') as f:
+            self.assertEqual(Image.open(f).size, (128, 96))
+
+    def test_generate_thumbnails_png(self):
+        """test thumbnails are generated for images other than JPEG"""
+        self.user_file.file.save(
+            'photo.png', sample_image(300, 300, format='PNG')
+        )
+
+        derivatives.generate_thumbnails(self.user_file.id)
+
+        self.assertEqual(self.user_file.derivatives.count(), 2)
+
+    def test_no_thumbnails_for_other_files(self):
+        """test no thumbnail is generated for files that are not images"""
+        self.user_file.file.save('drawing.dxf', ContentFile(b'0\nEOF\n'))
+
+        derivatives.generate_thumbnails(self.user_file.id)
+
+        self.assertFalse(self.user_file.derivatives.exists())
+
+    def test_list_exposes_thumbnail_urls(self):
+        """test the userfile list links to the thumbnails"""
+        self.user_file.file.save('photo.jpg', sample_image())
+        derivatives.generate_thumbnails(self.user_file.id)
+
+        res = self.client.get(USER_FILES_URL)
+
+        self.assertEqual(res.data['results'][0]['derivatives'], {
+            '128': derivative_url(self.user_file.id, 128),
+            '512': derivative_url(self.user_file.id, 512),
+        })
+
+    def test_download_thumbnail(self):
+        """test downloading a thumbnail"""
+        self.user_file.file.save('photo.jpg', sample_image())
+        derivatives.generate_thumbnails(self.user_file.id)
+
+        res = self.client.get(derivative_url(self.user_file.id, 128))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        content = b''.join(res.streaming_content)
+        res.close()
+        self.assertEqual(Image.open(io.BytesIO(content)).size, (128, 96))
+
+    def test_delete_derivative_removes_file(self):
+        """test deleting a derivative removes its file"""
+        self.user_file.file.save('photo.jpg', sample_image())
+        derivatives.generate_thumbnails(self.user_file.id)
+        derivative = Derivative.objects.first()
+        storage, name = derivative.file.storage, derivative.file.name
+
+        derivative.delete()
+
+        self.assertFalse(storage.exists(name))
+
+    def test_upload_without_file_keeps_thumbnails(self):
+        """test a request leaving the file unchanged keeps its thumbnails"""
+        self.user_file.file.save('photo.jpg', sample_image())
+        derivatives.generate_thumbnails(self.user_file.id)
+        url = reverse('user_files:user_file-upload-file',
+                      args=[self.user_file.id])
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        res = self.client.post(url, {}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_file.derivatives.count(), 2)
+
+
+def sample_dxf(path):
+    """write a sample DXF drawing to path"""
+    doc = ezdxf.new('R2010')
+    doc.header['$INSUNITS'] = 6
+    doc.layers.new('WALLS')
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (10, 0), dxfattribs={'layer': 'WALLS'})
+    msp.add_line((10, 0), (10, 5), dxfattribs={'layer': 'WALLS'})
+    msp.add_circle((5, 2), 1)
+    doc.saveas(path)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), USER_FILES_PROCESSES=0)
+class DxfTests(TestCase):
+    """Test extracting the metadata and preview of DXF drawings"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.user_file = User_File.objects.create(
+            user=self.user, title='plan'
+        )
+        with tempfile.NamedTemporaryFile(suffix='.dxf') as ntf:
+            sample_dxf(ntf.name)
+            self.user_file.file.save('plan.dxf', ContentFile(ntf.read()))
+
+    def test_analyze_dxf(self):
+        """test reading the metadata of a drawing"""
+        metadata, image = dxf.analyze(self.user_file.file.path, 64)
+
+        self.assertEqual(metadata['units'], 6)
+        self.assertIn('WALLS', metadata['layers'])
+        self.assertEqual(metadata['entity_counts'], {'LINE': 2, 'CIRCLE': 1})
+        self.assertEqual(metadata['extents'], ((0, 0), (10, 5)))
+        self.assertEqual(image.size, (64, 64))
+
+    def test_generate_dxf_preview(self):
+        """test the metadata and thumbnails of a drawing are stored"""
+        derivatives.generate_dxf_preview(self.user_file.id)
+
+        metadata = DxfMetadata.objects.get(user_file=self.user_file)
+        self.assertEqual(metadata.entity_count_by_type['LINE'], 2)
+        self.assertEqual(
+            (metadata.extmax_x, metadata.extmax_y), (10, 5)
+        )
+        self.assertEqual(self.user_file.derivatives.count(), 2)
+
+    def test_detail_exposes_dxf_metadata(self):
+        """test the userfile detail includes the drawing metadata"""
+        derivatives.generate_dxf_preview(self.user_file.id)
+
+        res = self.client.get(
+            reverse('user_files:user_file-detail', args=[self.user_file.id])
+        )
+
+        self.assertEqual(res.data['dxf_metadata']['units'], 6)
+        self.assertIn('WALLS', res.data['dxf_metadata']['layers'])
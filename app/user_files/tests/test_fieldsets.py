@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, File_type, User_File
+
+
+TAGS_URL = reverse('user_files:tag-list')
+USER_FILES_URL = reverse('user_files:user_file-list')
+
+
+def detail_url(user_file_id):
+    """return userfile detail url"""
+    return reverse('user_files:user_file-detail', args=[user_file_id])
+
+
+class SparseFieldsetTests(TestCase):
+    """Test selecting the fields of the user_files responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='room')
+        self.file_type = File_type.objects.create(user=self.user, type='DWG')
+        self.user_file = User_File.objects.create(
+            user=self.user, title='plan', link='/plan'
+        )
+        self.user_file.tags.add(self.tag)
+        self.user_file.file_types.add(self.file_type)
+
+    def get(self, url, params):
+        """return the response to a GET and the SQL it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+
+        return res, [query['sql'] for query in queries.captured_queries]
+
+    def test_list_fields(self):
+        """Test a list keeps the requested fields and skips the columns
+        and prefetches of the others"""
+        res, queries = self.get(USER_FILES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'], [{'id': self.user_file.id, 'title': 'plan'}]
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"link"', queries[0])
+
+    def test_list_expand(self):
+        """Test a list nests the expanded relations"""
+        res, queries = self.get(
+            USER_FILES_URL, {'fields': 'id,tags,file_types', 'expand': 'tags'}
+        )
+
+        item, = res.data['results']
+        self.assertEqual(item['tags'], [
+            {'id': self.tag.id, 'name': 'room', 'usage_count': 1}
+        ])
+        self.assertEqual(item['file_types'], [self.file_type.id])
+        self.assertEqual(len(queries), 3)
+
+    def test_detail_fields(self):
+        """Test a detail skips the relations not requested"""
+        res, queries = self.get(
+            detail_url(self.user_file.id), {'fields': 'title,dxf_metadata'}
+        )
+
+        self.assertEqual(res.data, {'title': 'plan', 'dxf_metadata': None})
+        self.assertEqual(len(queries), 2)
+
+    def test_detail_collapse(self):
+        """Test an empty expand renders the relations of a detail as ids"""
+        res = self.client.get(
+            detail_url(self.user_file.id), {'fields': 'tags', 'expand': ''}
+        )
+
+        self.assertEqual(res.data, {'tags': [self.tag.id]})
+
+    def test_defaults(self):
+        """Test the responses are unchanged without fields and expand"""
+        res = self.client.get(detail_url(self.user_file.id))
+
+        self.assertEqual(res.data['tags'], [
+            {'id': self.tag.id, 'name': 'room', 'usage_count': 1}
+        ])
+        self.assertIn('link', res.data)
+
+    def test_tag_list_fields(self):
+        """Test the tag list keeps the requested fields"""
+        res, queries = self.get(TAGS_URL, {'fields': 'name'})
+
+        self.assertEqual(res.data['results'], [{'name': 'room'}])
+        self.assertNotIn('"usage_count"', queries[0])
+
+    def test_unknown_field(self):
+        """Test unknown fields are rejected"""
+        res = self.client.get(USER_FILES_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+    def test_writes_ignore_fields(self):
+        """Test fields do not apply to the data of a create"""
+        res = self.client.post(
+            f'{USER_FILES_URL}?fields=id',
+            {'title': 'new', 'tags': [self.tag.id], 'file_types': []}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['tags'], [self.tag.id])
+        self.assertEqual(
+            User_File.objects.get(id=res.data['id']).tags.count(), 1
+        )
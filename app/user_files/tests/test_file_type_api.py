@@ -47,7 +47,7 @@ class PrivateFileTypeApiTests(TestCase):
         file_type = File_type.objects.all().order_by('-type')
         serializer = File_typeSerializer(file_type, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_file_type_limited_to_user(self):
         """test that the file_type for the authenticated user are returned"""
@@ -62,8 +62,8 @@ class PrivateFileTypeApiTests(TestCase):
         res = self.client.get(FILE_TYPE_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['type'], file_type.type)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['type'], file_type.type)
 
     def test_create_file_type_successful(self):
         """test create a new type"""
@@ -95,7 +95,17 @@ class PrivateFileTypeApiTests(TestCase):
 
         res = self.client.get(FILE_TYPE_URL, {'assigned_only': 1})
 
+        file_type1.refresh_from_db()
         serializer1 = File_typeSerializer(file_type1)
         serializer2 = File_typeSerializer(file_type2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+
+    def test_retrieve_file_types_assigned_only_zero(self):
+        """test assigned_only=0 returns every file_type"""
+        File_type.objects.create(user=self.user, type='DWG')
+
+        res = self.client.get(FILE_TYPE_URL, {'assigned_only': 0})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
@@ -0,0 +1,224 @@
+import io
+import shutil
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import User_File, Tag, File_type, Derivative
+from core.testing import QueryBudgetMixin
+
+from user_files import uploads
+
+
+CONTENT = b'0123456789'
+BULK_ITEMS = 10
+# tags and file_types of the user_file of the detail endpoints at most,
+# Django deletes m2m rows having signal receivers 100 at a time so
+# replacing more relations takes a query per 100 of them
+DETAIL_RELATIONS = 100
+
+
+def sample_image():
+    """return an uploadable JPEG image"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, 'JPEG')
+    buffer.name = 'photo.jpg'
+    buffer.seek(0)
+
+    return buffer
+
+
+class UserFilesQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the query count of every user_files endpoint
+
+    the budgets are counted on PostgreSQL, where saves and relation
+    changes also update the search vectors of user_files; bulk deletions
+    of tags and file_types reindex the user_files of each of them
+    """
+    namespace = 'user_files'
+    query_budgets = {
+        ('api-root', 'GET'): 0,
+        ('tag-list', 'GET'): 1,
+        ('tag-list', 'POST'): 1,
+        ('tag-bulk', 'POST'): 14,
+        ('tag-bulk', 'PATCH'): 6,
+        ('tag-bulk', 'DELETE'): 27,
+        ('file_type-list', 'GET'): 1,
+        ('file_type-list', 'POST'): 1,
+        ('file_type-bulk', 'POST'): 14,
+        ('file_type-bulk', 'PATCH'): 6,
+        ('file_type-bulk', 'DELETE'): 27,
+        ('user_file-list', 'GET'): 4,
+        ('user_file-list', 'POST'): 18,
+        ('user_file-bulk', 'POST'): 48,
+        ('user_file-bulk', 'PATCH'): 10,
+        ('user_file-bulk', 'DELETE'): 63,
+        ('user_file-detail', 'GET'): 5,
+        ('user_file-detail', 'PUT'): 21,
+        ('user_file-detail', 'PATCH'): 21,
+        ('user_file-detail', 'DELETE'): 14,
+        ('user_file-upload-file', 'POST'): 12,
+        ('user_file-uploads', 'POST'): 2,
+        ('user_file-upload-chunk', 'GET'): 2,
+        ('user_file-upload-chunk', 'PUT'): 6,
+        ('user_file-upload-complete', 'POST'): 17,
+        ('user_file-download', 'GET'): 1,
+        ('user_file-derivative', 'GET'): 2,
+    }
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.user_file = User_File.objects.create(
+            user=self.user, title='drawing'
+        )
+        self.seeded = 0
+
+    def grow(self, size):
+        """add tags, file_types and user_files up to size of each, every
+        user_file gets a tag and a file_type and the one requested by the
+        detail endpoints up to DETAIL_RELATIONS of them"""
+        new = range(self.seeded, size)
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'tag {i}') for i in new
+        )
+        File_type.objects.bulk_create(
+            File_type(user=self.user, type=f'type {i}') for i in new
+        )
+        User_File.objects.bulk_create(
+            User_File(user=self.user, title=f'file {i}') for i in new
+        )
+        tags = list(Tag.objects.order_by('id')[self.seeded:size])
+        file_types = list(File_type.objects.order_by('id')[self.seeded:size])
+        user_files = list(
+            User_File.objects.exclude(id=self.user_file.id)
+            .order_by('id')[self.seeded:size]
+        )
+        User_File.tags.through.objects.bulk_create(
+            User_File.tags.through(user_file_id=user_file.id, tag_id=tag.id)
+            for user_file, tag in zip(user_files, tags)
+        )
+        User_File.file_types.through.objects.bulk_create(
+            User_File.file_types.through(
+                user_file_id=user_file.id, file_type_id=file_type.id
+            )
+            for user_file, file_type in zip(user_files, file_types)
+        )
+        detail = DETAIL_RELATIONS - self.seeded
+        self.user_file.tags.add(*tags[:detail])
+        self.user_file.file_types.add(*file_types[:detail])
+        self.seeded = size
+
+    def ids(self, model):
+        """return the ids of BULK_ITEMS rows of model, the user_file of the
+        detail endpoints aside"""
+        queryset = model.objects.order_by('id')
+        if model is User_File:
+            queryset = queryset.exclude(id=self.user_file.id)
+
+        return list(queryset.values_list('id', flat=True)[:BULK_ITEMS])
+
+    def send(self, method, url, payload=None):
+        """return a function sending payload to url as JSON"""
+        if method == 'GET':
+            return lambda: self.client.get(url)
+
+        return lambda: getattr(self.client, method.lower())(
+            url, payload, format='json'
+        )
+
+    def endpoint_request(self, name, method):
+        client = self.client
+        user_file = self.user_file
+        url = f'user_files:{name}'
+        tag_ids = self.ids(Tag)[:2]
+        file_type_ids = self.ids(File_type)[:2]
+
+        if name == 'api-root':
+            return self.send(method, reverse(url))
+        if name == 'tag-list':
+            return self.send(method, reverse(url), {'name': 'new'})
+        if name == 'file_type-list':
+            return self.send(method, reverse(url), {'type': 'new'})
+        if name.endswith('-bulk'):
+            model, field = {
+                'tag-bulk': (Tag, 'name'),
+                'file_type-bulk': (File_type, 'type'),
+                'user_file-bulk': (User_File, 'title'),
+            }[name]
+            if method == 'POST':
+                payload = [{field: f'bulk {i}'} for i in range(BULK_ITEMS)]
+                if model is User_File:
+                    for item in payload:
+                        item.update(tags=tag_ids, file_types=file_type_ids)
+            elif method == 'PATCH':
+                payload = [{'id': id, field: f'bulk {id}'}
+                           for id in self.ids(model)]
+            else:
+                payload = self.ids(model)
+            return self.send(method, reverse(url), payload)
+        if name == 'user_file-list':
+            return self.send(method, reverse(url), {
+                'title': 'new', 'tags': tag_ids, 'file_types': file_type_ids
+            })
+
+        args = [user_file.id]
+        if name == 'user_file-detail':
+            payload = {'title': 'renamed', 'tags': tag_ids,
+                       'file_types': file_type_ids}
+            return self.send(method, reverse(url, args=args), payload)
+        if name == 'user_file-upload-file' and method == 'POST':
+            return lambda: client.post(
+                reverse(url, args=args), {'file': sample_image()},
+                format='multipart'
+            )
+        if name == 'user_file-uploads':
+            return self.send(method, reverse(url, args=args), {
+                'filename': 'drawing.dxf', 'size': len(CONTENT)
+            })
+        if name in ('user_file-upload-chunk', 'user_file-upload-complete'):
+            upload = uploads.start_upload(
+                user_file, 'drawing.dxf', len(CONTENT)
+            )
+            args.append(upload.id)
+            if name == 'user_file-upload-complete':
+                uploads.write_chunk(
+                    upload, 0, len(CONTENT), io.BytesIO(CONTENT)
+                )
+                return self.send(method, reverse(url, args=args), {})
+            if method == 'GET':
+                return self.send(method, reverse(url, args=args))
+            return lambda: client.put(
+                reverse(url, args=args), CONTENT,
+                content_type='application/octet-stream',
+                HTTP_UPLOAD_OFFSET='0'
+            )
+        if name == 'user_file-download':
+            # the requests uploading files replace or delete it
+            user_file.file.save('drawing.dxf', ContentFile(CONTENT))
+        if name == 'user_file-derivative':
+            Derivative.objects.create(
+                user_file=user_file, kind=Derivative.THUMBNAIL,
+                size=128, width=128, height=96,
+                file=ContentFile(CONTENT, name='thumbnail.jpg')
+            )
+            args.append(128)
+
+        return self.send(method, reverse(url, args=args))
@@ -0,0 +1,130 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, File_type, User_File
+
+
+USER_FILES_URL = reverse('user_files:user_file-list')
+
+
+class UserFileSearchTests(TestCase):
+    """Test searching userfiles with the q parameter"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.kitchen = User_File.objects.create(
+            user=self.user, title='Kitchen plan', link='/projects/villa'
+        )
+        self.garden = User_File.objects.create(
+            user=self.user, title='Garden', link='/projects/kitchen-garden'
+        )
+        self.tagged = User_File.objects.create(user=self.user, title='Annex')
+        self.tagged.tags.add(Tag.objects.create(user=self.user, name='villa'))
+        self.tagged.file_types.add(
+            File_type.objects.create(user=self.user, type='DWG')
+        )
+
+    def search_ids(self, q, **params):
+        """return the ids of the userfiles found for q"""
+        res = self.client.get(USER_FILES_URL, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [item['id'] for item in res.data['results']]
+
+    def test_search_ranks_title_first(self):
+        """test a title match ranks before a link match"""
+        ids = self.search_ids('kitch')
+
+        self.assertEqual(ids, [self.kitchen.id, self.garden.id])
+
+    def test_search_tag_and_file_type_names(self):
+        """test user_files are found by their tag and file_type names"""
+        self.assertEqual(self.search_ids('dwg'), [self.tagged.id])
+        self.assertEqual(
+            self.search_ids('villa'), [self.tagged.id, self.kitchen.id]
+        )
+
+    def test_search_matches_every_term(self):
+        """test every term of the query must match"""
+        ids = self.search_ids('kitchen villa')
+
+        self.assertEqual(ids, [self.kitchen.id])
+
+    def test_search_other_users_files(self):
+        """test the files of other users are never found"""
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        User_File.objects.create(user=other, title='Kitchen')
+
+        ids = self.search_ids('kitchen')
+
+        self.assertEqual(ids, [self.kitchen.id, self.garden.id])
+
+    def test_search_paginates_by_rank(self):
+        """test the pages of a search follow the ranking"""
+        res = self.client.get(USER_FILES_URL, {'q': 'kitchen', 'page_size': 1})
+        first = res.data['results'][0]['id']
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(first, self.kitchen.id)
+        self.assertEqual(res.data['results'][0]['id'], self.garden.id)
+        self.assertIsNone(res.data['next'])
+
+    def test_search_without_terms(self):
+        """test a query without any word finds nothing"""
+        self.assertEqual(self.search_ids('%!'), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL full-text search')
+class SearchVectorTests(TestCase):
+    """Test the search vectors follow the user_files and their tags"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.user_file = User_File.objects.create(
+            user=self.user, title='Kitchen plan'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='villa')
+        self.user_file.tags.add(self.tag)
+
+    def vector(self):
+        """return the search vector of the user_file"""
+        return User_File.objects.values_list(
+            'search_vector', flat=True
+        ).get(id=self.user_file.id)
+
+    def test_vector_has_title_and_tags(self):
+        """test the title and tag names are indexed"""
+        self.assertIn("'kitchen'", self.vector())
+        self.assertIn("'villa'", self.vector())
+
+    def test_renamed_tag_is_reindexed(self):
+        """test renaming a tag updates the vectors of its user_files"""
+        self.tag.name = 'cottage'
+        self.tag.save()
+
+        self.assertIn("'cottage'", self.vector())
+        self.assertNotIn("'villa'", self.vector())
+
+    def test_cleared_tags_are_reindexed(self):
+        """test clearing the user_files of a tag updates their vectors"""
+        self.tag.user_file_set.clear()
+
+        self.assertNotIn("'villa'", self.vector())
@@ -46,7 +46,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for authenticated user"""
@@ -60,8 +60,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tag_successful(self):
         """test creating a new tag"""
@@ -93,7 +93,27 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
+        tag1.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+
+    def test_retrieve_tags_assigned_unique(self):
+        """test filtering tags by assigned returns unique items"""
+        tag = Tag.objects.create(user=self.user, name='tag1')
+        Tag.objects.create(user=self.user, name='tag2')
+        user_file1 = User_File.objects.create(title='house', user=self.user)
+        user_file1.tags.add(tag)
+        user_file2 = User_File.objects.create(title='room', user=self.user)
+        user_file2.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_tags_assigned_only_invalid(self):
+        """test assigned_only only accepts 0 or 1"""
+        res = self.client.get(TAGS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
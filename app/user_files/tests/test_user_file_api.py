@@ -1,17 +1,21 @@
+import hashlib
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import User_File, Tag, File_type
+from core.models import User_File, Tag, File_type, User_FileUpload
+from core.testing import QueryCountMixin, count_queries
 
+from user_files import filters, uploads
 from user_files.serializers import User_FileSerializer, UserFileDetailSerializer
 
 USER_FILES_URL = reverse('user_files:user_file-list')
@@ -64,7 +68,7 @@ class PublicUserFileApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateUserFileApiTests(TestCase):
+class PrivateUserFileApiTests(QueryCountMixin, TestCase):
     """Test authenticated recipe API access"""
 
     def setUp(self):
@@ -86,7 +90,7 @@ class PrivateUserFileApiTests(TestCase):
         serializer = User_FileSerializer(userfiles, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         # there is an error of order of dict assertion error commented for the time being
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_userfiles_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -102,8 +106,8 @@ class PrivateUserFileApiTests(TestCase):
         userfiles = User_File.objects.filter(user=self.user)
         serializer = User_FileSerializer(userfiles, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_userfile_detail(self):
         """test viewing a user_file detail"""
@@ -117,6 +121,70 @@ class PrivateUserFileApiTests(TestCase):
         serializer = UserFileDetailSerializer(user_file)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_userfiles_paginated(self):
+        """test userfiles are listed page by page, newest first"""
+        user_files = [sample_user_files(user=self.user) for _ in range(3)]
+
+        res = self.client.get(USER_FILES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [user_files[2].id, user_files[1].id]
+        )
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [user_files[0].id]
+        )
+        self.assertIsNone(res.data['next'])
+
+    def test_pagination_stable_under_inserts(self):
+        """test rows created between two pages do not shift the next page"""
+        user_files = [sample_user_files(user=self.user) for _ in range(4)]
+
+        res = self.client.get(USER_FILES_URL, {'page_size': 2})
+        sample_user_files(user=self.user, title='created meanwhile')
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [user_files[1].id, user_files[0].id]
+        )
+
+    def test_list_userfiles_query_count_is_constant(self):
+        """test listing userfiles does not issue a query per row"""
+        tag = sample_tag(user=self.user)
+        file_type = sample_file_type(user=self.user)
+
+        def grow(size):
+            for _ in range(size):
+                user_file = sample_user_files(user=self.user)
+                user_file.tags.add(tag)
+                user_file.file_types.add(file_type)
+
+        self.assertConstantQueries(
+            lambda: self.client.get(USER_FILES_URL), grow
+        )
+
+    def test_userfile_detail_query_count_is_constant(self):
+        """test the userfile detail does not issue a query per tag"""
+        user_file = sample_user_files(user=self.user)
+
+        def grow(size):
+            for i in range(size):
+                user_file.tags.add(sample_tag(self.user, name=f'tag {i}'))
+                user_file.file_types.add(
+                    sample_file_type(self.user, type=f'type {i}')
+                )
+
+        self.assertConstantQueries(
+            lambda: self.client.get(detail_url(user_file.id)), grow
+        )
+
     def test_create_basic_userfile(self):
         """test creating userfile"""
         payload = {
@@ -197,6 +265,40 @@ class PrivateUserFileApiTests(TestCase):
         tags = user_file.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_create_userfile_with_other_users_tags(self):
+        """test tags of other users and unknown tags are rejected at once"""
+        other = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        own_tag = sample_tag(user=self.user)
+        other_tag = sample_tag(user=other, name='private')
+        payload = {
+            'title': 'HOTEL',
+            'tags': [own_tag.id, other_tag.id, other_tag.id + 100],
+            'file_types': [],
+        }
+
+        res = self.client.post(USER_FILES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertIn(str(other_tag.id), res.data['tags'][0])
+        self.assertFalse(User_File.objects.exists())
+
+    def test_create_userfile_tags_query_count(self):
+        """test the queries of a create do not grow with its tags"""
+        tags = [sample_tag(user=self.user, name=f'tag {i}') for i in range(20)]
+
+        def create(count):
+            self.client.post(USER_FILES_URL, {
+                'title': 'HOTEL',
+                'tags': [tag.id for tag in tags[:count]],
+                'file_types': [],
+            }, format='json')
+
+        self.assertEqual(count_queries(create, 1), count_queries(create, 20))
+
 
 class UserFileUploadTests(TestCase):
 
@@ -251,9 +353,9 @@ class UserFileUploadTests(TestCase):
         serializer1 = User_FileSerializer(userfile1)
         serializer2 = User_FileSerializer(userfile2)
         serializer3 = User_FileSerializer(userfile3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_userfile_by_filetype(self):
         """test returning usefile with specific tags"""
@@ -273,6 +375,365 @@ class UserFileUploadTests(TestCase):
         serializer1 = User_FileSerializer(userfile1)
         serializer2 = User_FileSerializer(userfile2)
         serializer3 = User_FileSerializer(userfile3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+class UserFileFilterTests(TestCase):
+    """Test filtering userfiles by tags and file_types"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = sample_tag(user=self.user, name='my room')
+        self.tag2 = sample_tag(user=self.user, name='my house')
+        self.both = sample_user_files(user=self.user, title='room')
+        self.both.tags.add(self.tag1, self.tag2)
+        self.one = sample_user_files(user=self.user, title='house')
+        self.one.tags.add(self.tag1)
+
+    def get_ids(self, params):
+        """return the ids of the userfiles listed with params"""
+        res = self.client.get(USER_FILES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [item['id'] for item in res.data['results']]
+
+    def test_filter_any_tag_returns_unique_userfiles(self):
+        """test a userfile matching several tags is returned once"""
+        ids = self.get_ids({'tags': f'{self.tag1.id},{self.tag2.id}'})
+
+        self.assertEqual(ids, [self.one.id, self.both.id])
+
+    def test_filter_all_tags(self):
+        """test match=all returns the userfiles having every tag"""
+        ids = self.get_ids({
+            'tags': f'{self.tag1.id},{self.tag2.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_filter_tags_and_file_types(self):
+        """test filtering by tags and file_types does not duplicate rows"""
+        file_type1 = sample_file_type(user=self.user, type='DWG')
+        file_type2 = sample_file_type(user=self.user, type='DXF')
+        self.both.file_types.add(file_type1, file_type2)
+
+        ids = self.get_ids({
+            'tags': f'{self.tag1.id},{self.tag2.id}',
+            'file_types': f'{file_type1.id},{file_type2.id}',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_filter_queryset_is_one_query(self):
+        """test the filtered userfiles are fetched in a single query"""
+        queryset = filters.filter_related(
+            User_File.objects.all(), User_File.tags.through, 'tag',
+            [self.tag1.id, self.tag2.id], filters.MATCH_ALL
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(list(queryset), [self.both])
+
+    def test_filter_invalid_match(self):
+        """test an unknown match mode is rejected"""
+        res = self.client.get(
+            USER_FILES_URL, {'tags': self.tag1.id, 'match': 'some'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_ids(self):
+        """test ids that are not integers are rejected"""
+        res = self.client.get(USER_FILES_URL, {'tags': '1,a'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def upload_start_url(user_file_id):
+    """return URL to start a chunked upload to a userfile"""
+    return reverse('user_files:user_file-uploads', args=[user_file_id])
+
+
+def upload_chunk_url(user_file_id, upload_id):
+    """return URL to send the chunks of an upload"""
+    return reverse(
+        'user_files:user_file-upload-chunk', args=[user_file_id, upload_id]
+    )
+
+
+def upload_complete_url(user_file_id, upload_id):
+    """return URL to complete an upload"""
+    return reverse(
+        'user_files:user_file-upload-complete',
+        args=[user_file_id, upload_id]
+    )
+
+
+class UserFileChunkedUploadTests(TestCase):
+    """Test resumable chunked uploads of userfile files"""
+
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.user_file = sample_user_files(user=self.user)
+        res = self.client.post(
+            upload_start_url(self.user_file.id),
+            {'filename': 'drawing.dxf', 'size': len(self.content)}
+        )
+        self.upload_id = res.data['id']
+        self.chunk_url = upload_chunk_url(self.user_file.id, self.upload_id)
+
+    def tearDown(self):
+        self.user_file.refresh_from_db()
+        self.user_file.file.delete()
+        upload = User_FileUpload.objects.get(id=self.upload_id)
+        if os.path.exists(uploads.part_path(upload)):
+            os.remove(uploads.part_path(upload))
+
+    def put_chunk(self, offset, data, checksum=None):
+        """send a chunk of the upload"""
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = checksum
+        return self.client.put(
+            self.chunk_url, data,
+            content_type='application/octet-stream', **headers
+        )
+
+    def test_upload_in_chunks(self):
+        """test uploading a file in chunks attaches it to the userfile"""
+        res = self.put_chunk(0, self.content[:60])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['offset'], 60)
+        self.put_chunk(60, self.content[60:])
+
+        res = self.client.post(
+            upload_complete_url(self.user_file.id, self.upload_id),
+            {'checksum': hashlib.sha256(self.content).hexdigest()}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['completed'])
+        self.user_file.refresh_from_db()
+        self.assertTrue(self.user_file.file.name.endswith('.dxf'))
+        with self.user_file.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(self.user_file.file_size, len(self.content))
+
+    def test_resume_upload(self):
+        """test the state of an upload tells where to resume"""
+        self.put_chunk(0, self.content[:30])
+
+        res = self.client.get(self.chunk_url)
+
+        self.assertEqual(res.data['offset'], 30)
+
+    def test_upload_chunk_wrong_offset(self):
+        """test a chunk not continuing the upload is rejected"""
+        self.put_chunk(0, self.content[:30])
+
+        res = self.put_chunk(10, self.content[10:40])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 30)
+
+    def test_upload_chunk_bad_checksum(self):
+        """test a chunk with a wrong checksum is discarded"""
+        res = self.put_chunk(0, self.content[:30], checksum='0' * 64)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(self.chunk_url)
+        self.assertEqual(res.data['offset'], 0)
+
+    def test_complete_incomplete_upload(self):
+        """test completing an upload missing bytes fails"""
+        self.put_chunk(0, self.content[:30])
+
+        res = self.client.post(
+            upload_complete_url(self.user_file.id, self.upload_id)
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_complete_upload_retried(self):
+        """test completing an upload again with the state read before the
+        first completion fails cleanly"""
+        self.put_chunk(0, self.content)
+        upload = User_FileUpload.objects.get(id=self.upload_id)
+        uploads.complete_upload(upload)
+
+        with self.assertRaises(uploads.UploadError):
+            uploads.complete_upload(upload)
+
+    def test_upload_known_content_completes_right_away(self):
+        """test uploading content the user already stores sends no bytes"""
+        self.put_chunk(0, self.content)
+        self.client.post(
+            upload_complete_url(self.user_file.id, self.upload_id)
+        )
+        other = sample_user_files(user=self.user)
+
+        res = self.client.post(upload_start_url(other.id), {
+            'filename': 'copy.dxf',
+            'size': len(self.content),
+            'checksum': hashlib.sha256(self.content).hexdigest(),
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(res.data['completed'])
+        other.refresh_from_db()
+        self.user_file.refresh_from_db()
+        self.assertEqual(other.file.name, self.user_file.file.name)
+
+    def test_upload_content_of_other_user_is_transferred(self):
+        """test a checksum of another user's content is not trusted"""
+        self.put_chunk(0, self.content)
+        self.client.post(
+            upload_complete_url(self.user_file.id, self.upload_id)
+        )
+        user2 = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user2)
+        other = sample_user_files(user=user2)
+
+        res = self.client.post(upload_start_url(other.id), {
+            'filename': 'copy.dxf',
+            'size': len(self.content),
+            'checksum': hashlib.sha256(self.content).hexdigest(),
+        })
+
+        upload = User_FileUpload.objects.get(id=res.data['id'])
+        self.addCleanup(os.remove, uploads.part_path(upload))
+        self.assertFalse(res.data['completed'])
+        self.assertEqual(res.data['offset'], 0)
+
+
+def download_url(user_file_id):
+    """return URL to download the file of a userfile"""
+    return reverse('user_files:user_file-download', args=[user_file_id])
+
+
+class UserFileDownloadTests(TestCase):
+    """Test downloading userfile files"""
+
+    content = b'0123456789abcdef'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.user_file = sample_user_files(user=self.user)
+        self.user_file.file.save('drawing.dxf', ContentFile(self.content))
+        self.url = download_url(self.user_file.id)
+
+    def tearDown(self):
+        os.remove(self.user_file.file.path)
+
+    def read(self, res):
+        """return the content of a streamed response"""
+        content = b''.join(res.streaming_content)
+        res.close()
+
+        return content
+
+    def test_download_file(self):
+        """test downloading the whole file with a strong ETag"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.read(res), self.content)
+        self.assertEqual(
+            res['ETag'], f'"{hashlib.sha256(self.content).hexdigest()}"'
+        )
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_download_not_modified(self):
+        """test a conditional GET on the current ETag returns 304"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_download_range(self):
+        """test downloading a byte range of the file"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(self.read(res), self.content[2:6])
+        self.assertEqual(res['Content-Range'], 'bytes 2-5/16')
+        self.assertEqual(res['Content-Length'], '4')
+
+    def test_download_suffix_range(self):
+        """test downloading the last bytes of the file"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+
+        self.assertEqual(self.read(res), self.content[-4:])
+
+    def test_download_range_not_satisfiable(self):
+        """test a range past the end of the file is rejected"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(res['Content-Range'], 'bytes */16')
+
+    def test_download_range_outdated_if_range(self):
+        """test a range with an outdated If-Range returns the whole file"""
+        res = self.client.get(
+            self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.read(res), self.content)
+
+    @override_settings(USER_FILES_ACCEL_REDIRECT_PREFIX='/protected/')
+    def test_download_accel_redirect(self):
+        """test downloads are handed off to the front proxy"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected/{self.user_file.file.name}'
+        )
+        self.assertEqual(res.content, b'')
+
+    def test_download_limited_to_user(self):
+        """test the files of other users cannot be downloaded"""
+        user2 = get_user_model().objects.create_user(
+            'other@pashadev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_download_without_file(self):
+        """test downloading a userfile without file returns 404"""
+        user_file = sample_user_files(user=self.user)
+
+        res = self.client.get(download_url(user_file.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,157 @@
+import hashlib
+import os
+
+from django.db import transaction
+
+from core.models import Blob, User_File, User_FileUpload, userfile_file_path
+from core.storage import blob_name, content_storage, file_digest, \
+    normalized_ext
+
+
+# bytes read from the request and written to disk at a time, the memory
+# used by an upload does not depend on the size of the chunk or the file
+BLOCK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class UploadError(Exception):
+    """a chunk or upload was rejected"""
+
+
+class OffsetMismatch(UploadError):
+    """a chunk does not start where the upload currently ends"""
+
+
+def part_path(upload):
+    """return the path of the file chunks are appended to"""
+    return content_storage.path(upload.name) + '.part'
+
+
+def find_known_blob(user_file, filename, size, checksum):
+    """return the name of the blob of checksum when the owner of user_file
+    already stores that content, None otherwise
+
+    only the user's own files are considered, a digest alone must not give
+    access to the content of other users
+    """
+    name = blob_name(checksum.lower(), normalized_ext(filename))
+    known = User_File.objects.filter(user=user_file.user, file=name).exists()
+    if known and Blob.objects.filter(name=name, size=size).exists():
+        return name
+
+    return None
+
+
+def start_upload(user_file, filename, size, checksum=None):
+    """create an upload session for the file of user_file
+
+    when checksum is the sha256 of content the user already stores, the
+    upload is completed right away without transferring any byte
+    """
+    name = checksum and find_known_blob(user_file, filename, size, checksum)
+    if name:
+        with transaction.atomic():
+            upload = User_FileUpload.objects.create(
+                user_file=user_file,
+                filename=filename,
+                name=name,
+                size=size,
+                offset=size,
+                completed=True,
+            )
+            user_file.file.name = name
+            user_file.save(update_fields=['file', 'file_size'])
+
+        return upload
+
+    upload = User_FileUpload.objects.create(
+        user_file=user_file,
+        filename=filename,
+        name=userfile_file_path(user_file, filename),
+        size=size,
+    )
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+    return upload
+
+
+def write_chunk(upload, offset, length, stream, checksum=None):
+    """append length bytes read from stream at offset of the upload
+
+    the chunk is discarded when the stream ends early or the sha256 of
+    what was read does not match checksum, so the client can send it again
+    """
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks are limited to {MAX_CHUNK_SIZE} bytes.')
+
+    with transaction.atomic():
+        upload = User_FileUpload.objects.select_for_update().get(
+            pk=upload.pk
+        )
+        if upload.completed:
+            raise UploadError('The upload is already completed.')
+        if offset != upload.offset:
+            raise OffsetMismatch(f'The upload continues at {upload.offset}.')
+        if offset + length > upload.size:
+            raise UploadError('The chunk overflows the size of the upload.')
+
+        digest = hashlib.sha256()
+        remaining = length
+        with open(part_path(upload), 'r+b') as f:
+            f.seek(offset)
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                f.write(block)
+                digest.update(block)
+                remaining -= len(block)
+
+            if remaining:
+                f.truncate(offset)
+                raise UploadError('The chunk is shorter than announced.')
+            if checksum and checksum.lower() != digest.hexdigest():
+                f.truncate(offset)
+                raise UploadError('The chunk checksum does not match.')
+
+        upload.offset += length
+        upload.save(update_fields=['offset'])
+
+    return upload
+
+
+def complete_upload(upload, checksum=None):
+    """move the uploaded file in place and attach it to the user_file
+
+    the upload is locked like in write_chunk, so a client retrying after a
+    dropped connection waits for the first call and finds it completed
+    """
+    with transaction.atomic():
+        upload = User_FileUpload.objects.select_for_update().get(
+            pk=upload.pk
+        )
+        if upload.completed:
+            raise UploadError('The upload is already completed.')
+        if upload.offset != upload.size:
+            raise UploadError(
+                f'{upload.size - upload.offset} bytes are still missing.'
+            )
+
+        path = part_path(upload)
+        digest = file_digest(path)
+        if checksum and checksum.lower() != digest:
+            raise UploadError('The file checksum does not match.')
+
+        name = content_storage.adopt(
+            path, normalized_ext(upload.name), digest
+        )
+        user_file = upload.user_file
+        user_file.file.name = name
+        user_file.save(update_fields=['file', 'file_size'])
+        upload.name = name
+        upload.completed = True
+        upload.save(update_fields=['name', 'completed'])
+
+    return upload
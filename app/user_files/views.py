@@ -1,119 +1,176 @@
+from django.db.models import Prefetch
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, File_type, User_File
+from core.authentication import CachedTokenAuthentication
+from core.metrics import SerializerTimingMixin
+from core.routers import ReplicaReadMixin
+from core.models import Tag, File_type, User_File, User_FileUpload, \
+    Derivative
 
 from user_files import serializers
+from user_files import pagination
+from user_files import filters
+from user_files import uploads
+from user_files import downloads
+from user_files import derivatives
+from user_files import search
+from user_files.bulk import BulkModelMixin
+from user_files.cache import CachedListMixin, CachedRetrieveMixin
+from user_files.fieldsets import SparseFieldsetMixin
 
 
-# class BaseFilesAttrViewSet(viewsets.GenericViewSet,
-#                            mixins.ListModelMixin,
-#                            mixins.CreateModelMixin):
-#     """base viewsets for user owned files attributes"""
-#     authentication_classes = (TokenAuthentication,)
-#     permissions_classes = (IsAuthenticated,)
-#
-#     def get_queryset(self):
-#         """return objects for the current authenticated user only"""
-#         return self.queryset.filter(user=self.request.user).order_by('-name')
-#
-#     def perform_create(self, serializer):
-#         """create a new object"""
-#         serializer.save(user=self.request.user)
-
-
-class TagViewSet(viewsets.GenericViewSet,
-                 mixins.ListModelMixin,
-                 mixins.CreateModelMixin):
-    """Manage tags in the database"""
-    authentication_classes = (TokenAuthentication,)
+class BaseFilesAttrViewSet(SerializerTimingMixin,
+                           ReplicaReadMixin,
+                           SparseFieldsetMixin,
+                           CachedListMixin,
+                           BulkModelMixin,
+                           viewsets.GenericViewSet,
+                           mixins.ListModelMixin,
+                           mixins.CreateModelMixin):
+    """base viewsets for user owned files attributes"""
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-    queryset = Tag.objects.all()
-    serializer_class = serializers.TagSerializer
+    # m2m through model linking user_files to the attribute and the name
+    # of its foreign key to the attribute, used by assigned_only
+    through = None
+    through_field = None
+    ordering = None
 
     def get_queryset(self):
-        """Return objects for the current authenticated user only"""
-        assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(user_file__isnull=False)
+        """return objects for the current authenticated user only"""
+        queryset = self.queryset.filter(user=self.request.user)
+        if filters.parse_flag(self.request.query_params, 'assigned_only'):
+            queryset = filters.filter_assigned(
+                queryset, self.through, self.through_field
+            )
+        fields = self.get_fieldset()[0]
+        if fields is not None:
+            # the pagination reads the ordering column of the page
+            queryset = queryset.only(
+                'id', self.ordering.lstrip('-'), *fields
+            )
 
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+        return queryset.order_by(self.ordering)
 
     def perform_create(self, serializer):
-        """create a new tag"""
+        """create a new object"""
         serializer.save(user=self.request.user)
 
 
-class File_typeViewSet(viewsets.GenericViewSet,
-                       mixins.ListModelMixin,
-                       mixins.CreateModelMixin):
-    """manage file_type in the database"""
+class TagViewSet(BaseFilesAttrViewSet):
+    """Manage tags in the database"""
+    queryset = Tag.objects.all()
+    serializer_class = serializers.TagSerializer
+    bulk_serializer_class = serializers.TagSerializer
+    pagination_class = pagination.TagCursorPagination
+    through = User_File.tags.through
+    through_field = 'tag'
+    ordering = '-name'
 
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (IsAuthenticated,)
+
+class File_typeViewSet(BaseFilesAttrViewSet):
+    """manage file_type in the database"""
     queryset = File_type.objects.all()
     serializer_class = serializers.File_typeSerializer
+    bulk_serializer_class = serializers.File_typeSerializer
+    pagination_class = pagination.File_typeCursorPagination
+    through = User_File.file_types.through
+    through_field = 'file_type'
+    ordering = '-type'
 
-    def get_queryset(self):
-        """return object for the current authenticated user"""
-        assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(user_file__isnull=False)
 
-        return queryset.filter(user=self.request.user).order_by('-type').distinct()
+UPLOAD_ACTIONS = ('start_upload', 'upload_chunk', 'complete_upload')
 
-    def perform_create(self, serializer):
-        """create a new file_Type"""
-        serializer.save(user=self.request.user)
 
-
-class User_FileViewSet(viewsets.ModelViewSet):
+class User_FileViewSet(SerializerTimingMixin,
+                       ReplicaReadMixin,
+                       SparseFieldsetMixin,
+                       CachedListMixin,
+                       CachedRetrieveMixin,
+                       BulkModelMixin,
+                       viewsets.ModelViewSet):
     """manage user_files in database"""
 
     serializer_class = serializers.User_FileSerializer
+    bulk_serializer_class = serializers.User_FileBulkSerializer
+    bulk_relations = {'tags': Tag, 'file_types': File_type}
     queryset = User_File.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    pagination_class = pagination.UserFileCursorPagination
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
-    def _params_to_ints(self, qs):
-        """convert a list of string ids to a list of integers"""
-        # our_string = '1,2,3'
-        # our_string_list = ['1','2','3']
-        # converting params to Integers
-        return [int(str_id) for str_id in qs.split(',')]
-
     def get_queryset(self):
         """retrive the user_files for the authenticated user"""
-        tags = self.request.query_params.get('tags')
-        file_types = self.request.query_params.get('file_types')
+        params = self.request.query_params
+        match = filters.parse_choice(
+            params, 'match', filters.MATCH_MODES, filters.MATCH_ANY
+        )
+        tag_ids = filters.parse_ids(params, 'tags')
+        file_type_ids = filters.parse_ids(params, 'file_types')
         queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if file_types:
-            file_type_ids = self._params_to_ints(file_types)
-            queryset = queryset.filter(file_types__id__in=file_type_ids)
-
-        return queryset.filter(user=self.request.user)
-
-        # tags = self.request.query_params.get('tags')
-        # file_types = self.request.query_params.get('file_types')
-        # queryset = self.queryset
-        # if tags:
-        #     tag_ids = self._params_to_ints(tags)
-        #     #for filtering a ForeignKey id then we do "__" i.e tags__id_in
-        #     queryset = queryset.filter(tags__id__in=tag_ids)
-        # if file_types:
-        #     file_type_ids = self._params_to_ints(file_types)
-        #     #for filtering a ForeignKey id then we do "__" i.e tags__id_in
-        #     queryset = queryset.filter(file_types__id__in=file_type_ids)
-        # return self.queryset.filter(user=self.request.user)
+        if tag_ids:
+            queryset = filters.filter_related(
+                queryset, User_File.tags.through, 'tag', tag_ids, match
+            )
+        if file_type_ids:
+            queryset = filters.filter_related(
+                queryset, User_File.file_types.through, 'file_type',
+                file_type_ids, match
+            )
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+        q = params.get('q', '').strip()
+        if q:
+            queryset = search.search(queryset, q)
+
+        return self._optimize_queryset(queryset)
+
+    def _optimize_queryset(self, queryset):
+        """prefetch the m2m relations and load only the columns the
+        serializer of the current action needs, for the fields requested
+        by `fields` and `expand`"""
+        if self.action in ('download', 'derivative'):
+            return queryset.only('id', 'file')
+        if self.action not in ('list', 'bulk', 'retrieve'):
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        fields, expand = self.get_fieldset()
+        if fields is None:
+            fields = serializer_class.Meta.fields
+        if expand is None:
+            expand = serializer_class.expanded
+        columns = [name for name in ('title', 'created_on', 'link')
+                   if name in fields]
+        if self.action != 'retrieve':
+            # the pagination reads the ordering column of the page
+            columns.append('created_on')
+        prefetches = []
+        for name, related in serializer_class.expandable.items():
+            if name in fields:
+                related_fields = related.Meta.fields if name in expand \
+                    else ('id',)
+                prefetches.append(Prefetch(
+                    name, queryset=related.Meta.model.objects.only(
+                        *related_fields
+                    )
+                ))
+        if 'derivatives' in fields:
+            prefetches.append(Prefetch(
+                'derivatives',
+                queryset=Derivative.objects.only('id', 'user_file', 'size')
+            ))
+        if 'dxf_metadata' in fields:
+            prefetches.append('dxf_metadata')
+
+        return queryset.only('id', *columns).prefetch_related(*prefetches)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -121,6 +178,8 @@ class User_FileViewSet(viewsets.ModelViewSet):
             return serializers.UserFileDetailSerializer
         elif self.action == 'upload_file':
             return serializers.UserFile_FilesSerializer
+        elif self.action in UPLOAD_ACTIONS:
+            return serializers.User_FileUploadSerializer
 
         return self.serializer_class
 
@@ -128,17 +187,21 @@ class User_FileViewSet(viewsets.ModelViewSet):
         """create a new user user_File"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST', 'GET'], detail=True, url_path='upload-file')
+    @action(methods=['POST'], detail=True, url_path='upload-file')
     def upload_file(self, request, pk=None):
         """upload an file/image to a userfile"""
         user_file = self.get_object()
+        name = user_file.file.name
         serializer = self.get_serializer(
             user_file,
             data=request.data
         )
 
         if serializer.is_valid():
-            serializer.save()
+            user_file = serializer.save()
+            # a request leaving the file as it was keeps its derivatives
+            if user_file.file.name != name:
+                derivatives.schedule(user_file)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -148,3 +211,118 @@ class User_FileViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    def _get_upload(self, upload_id):
+        """return an upload of the requested userfile"""
+        return get_object_or_404(
+            User_FileUpload, pk=upload_id, user_file=self.get_object()
+        )
+
+    @action(methods=['POST'], detail=True, url_path='uploads',
+            url_name='uploads')
+    def start_upload(self, request, pk=None):
+        """start a resumable chunked upload of a file to a userfile, an
+        upload of content the user already stores completes right away"""
+        user_file = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = uploads.start_upload(
+            user_file,
+            serializer.validated_data['filename'],
+            serializer.validated_data['size'],
+            checksum=serializer.validated_data.get('checksum')
+        )
+        if upload.completed:
+            derivatives.schedule(user_file)
+
+        return Response(
+            self.get_serializer(upload).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(methods=['GET', 'PUT'], detail=True,
+            url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)',
+            url_name='upload-chunk')
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """return the state of an upload or append a chunk to it
+
+        the chunk is the raw request body, the `Upload-Offset` header
+        gives its position and the optional `Upload-Checksum` header its
+        sha256 hex digest
+        """
+        upload = self._get_upload(upload_id)
+        if request.method == 'GET':
+            return Response(self.get_serializer(upload).data)
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Upload-Offset and Content-Length are required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            upload = uploads.write_chunk(
+                upload, offset, length, request.stream,
+                checksum=request.META.get('HTTP_UPLOAD_CHECKSUM')
+            )
+        except uploads.OffsetMismatch as exc:
+            upload.refresh_from_db()
+            return Response(
+                {'detail': str(exc), 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        except uploads.UploadError as exc:
+            return Response(
+                {'detail': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(self.get_serializer(upload).data)
+
+    @action(methods=['POST'], detail=True,
+            url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/complete',
+            url_name='upload-complete')
+    def complete_upload(self, request, pk=None, upload_id=None):
+        """attach the file of a fully received upload to the userfile"""
+        upload = self._get_upload(upload_id)
+        try:
+            upload = uploads.complete_upload(
+                upload, checksum=request.data.get('checksum')
+            )
+        except uploads.UploadError as exc:
+            return Response(
+                {'detail': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        derivatives.schedule(upload.user_file)
+        return Response(self.get_serializer(upload).data)
+
+    @action(methods=['GET'], detail=True, url_path='download')
+    def download(self, request, pk=None):
+        """download the file of a userfile, supports Range requests and
+        conditional requests on the ETag"""
+        user_file = self.get_object()
+        if not user_file.file:
+            raise Http404
+
+        return downloads.serve_file(request, user_file.file.name)
+
+    @action(methods=['GET'], detail=True,
+            url_path=r'derivatives/(?P<size>[0-9]+)',
+            url_name='derivative')
+    def derivative(self, request, pk=None, size=None):
+        """download a thumbnail of the file of a userfile"""
+        derivative = get_object_or_404(
+            Derivative.objects.only('file'),
+            user_file=self.get_object(),
+            kind=Derivative.THUMBNAIL,
+            size=size
+        )
+
+        return downloads.serve_file(
+            request, derivative.file.name, derivative.file.storage
+        )
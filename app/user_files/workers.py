@@ -0,0 +1,70 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_process_pool = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """return the pool running background jobs, created on first use so
+    worker processes forked by the server each get their own"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.USER_FILES_WORKERS,
+                thread_name_prefix='user-files'
+            )
+
+    return _executor
+
+
+def get_process_pool():
+    """return the pool of processes running CPU bound work"""
+    global _process_pool
+    with _executor_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.USER_FILES_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+    return _process_pool
+
+
+def run_in_process(func, *args):
+    """return func(*args) computed in a worker process, or inline when
+    USER_FILES_PROCESSES is 0
+
+    the processes are spawned without setting up Django, func must be a
+    module level function that does not use it
+    """
+    if not settings.USER_FILES_PROCESSES:
+        return func(*args)
+
+    return get_process_pool().submit(func, *args).result()
+
+
+def run_job(func, *args):
+    """run a job, logging its failure, on a fresh database connection"""
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background job %s failed', func.__name__)
+    finally:
+        connection.close()
+
+
+def submit(func, *args):
+    """run func(*args) in the background once the current transaction is
+    committed, so the job sees the rows it is about"""
+    transaction.on_commit(lambda: get_executor().submit(run_job, func, *args))